@@ -1,37 +1,62 @@
 import functools
 import os
-import cv2
 import math
-import natsort
+import time
 
-import numpy as np
 import os.path as osp
 
 from PyQt5.QtWidgets import *
-from PyQt5.QtGui import QIcon, QImage, QPixmap, QImageReader
-from PyQt5.QtCore import Qt, QSize, QCoreApplication
-from widgets.brightness_contrast_dialog import BrightnessContrastDialog
-
-from PIL import Image
-from widgets.brushsize import BrushDialog
+from PyQt5.QtGui import QIcon, QImage, QPixmap, QImageReader, QColor
+from PyQt5.QtCore import Qt, QSize, QRect, QCoreApplication
 
 from widgets.canvas import *
-from widgets.file_dialog_preview import FileDialogPreview
+from widgets.utils import new_icon
 from widgets.output_widget import OutputBlock
 from widgets.zoom_widget import ZoomWidget
 from widgets.toolbar import LabelingToolBar
+from widgets.workers import run_in_background
+from widgets.thumbnail_loader import ThumbnailLoader
+from widgets.frame_dispatcher import FrameDispatcher
+from widgets.inspector import InspectorWidget
 
+from utils.lazy import lazy_import
 from utils.basic import __appname__, fmtShortcut
+from utils.cache import LRUCache
+from utils.memory import MemoryBudget, array_buffers
+from utils.config import get_config
+from utils.session import SessionStore
+from utils.stats import LabelStats
+from utils.mask_diff import load_mask_diff
+from utils.thumbnails import ThumbnailCache
+from utils.display import read_image, auto_window, min_window_width, to_display, build_pyramid
+from utils.profiling import timed, profiler, startup
+from utils.superpixels import load_superpixels
+from utils.tiling import export_tiles
+from utils.augment import RotationAugmenter
+from utils.tile_writers import create_tile_writer, tile_labels
+from utils.tile_encoders import create_tile_encoder, write_tile
+from utils.mask_codecs import create_mask_path, load_mask, save_mask, class_palette, classes_to_rgb, rgb_to_classes
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
 
 
 class LabelData:
     FIT_WINDOW, FIT_WIDTH, MANUAL_ZOOM = 0, 1, 2
 
     def __init__(self, image_path, mask_path):
+        self.image_pyramid = None
+        self.mask_pyramid = None
+        self.stats = None
         self.load_images(image_path, mask_path)
         self.load_qimages()
 
+    def build_pyramids(self):
+        return build_pyramid(self.image), build_pyramid(self.mask)
+
     def load_qimages(self):
+        if self.is_null():
+            return
         height, width = self.image.shape[:2]
 
         self.qimage = self.to_qimage(self.image, height, width)
@@ -41,15 +66,30 @@ class LabelData:
         self.image_path = image_path
         self.mask_path = mask_path
 
-        self.image = cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2RGB)
-        
+        # the native image keeps its bit depth for export, the display image is 8-bit RGB
+        self.native = read_image(image_path)
+        if self.native is None:
+            self.image = None
+            return
+        self.window = auto_window(self.native)
+        self.image = to_display(self.native, self.window)
+
         self.load_mask(mask_path)
 
+    def set_window(self, window):
+        self.window = window
+        self.image = to_display(self.native, window)
+        self.image_pyramid = None
+        self.load_qimages()
+
     def load_mask(self, mask_path):
         self.height, self.width = self.image.shape[:2]
-        if osp.exists(mask_path):
-            self.mask = cv2.cvtColor(cv2.imread(mask_path), cv2.COLOR_BGR2RGB)
+        classes = load_mask(mask_path)
+        if classes is not None and classes.shape == (self.height, self.width):
+            self.classes = classes
+            self.mask = classes_to_rgb(classes)
         else:
+            self.classes = np.zeros((self.height, self.width), dtype=np.uint8)
             self.mask = np.ones_like(self.image) * 255
 
     def to_qimage(self, image, height, width):
@@ -59,21 +99,57 @@ class LabelData:
     def is_null(self):
         return self.image is None
 
+    def buffers(self):
+        # the QImages wrap image and mask without a copy
+        stats_classes = None if self.stats is None else self.stats.classes
+        return array_buffers(self.native, self.image, getattr(self, 'mask', None), getattr(self, 'classes', None),
+                             self.image_pyramid, self.mask_pyramid, stats_classes)
+
+
+def load_label_data(image_path, mask_path):
+    image_data = LabelData(image_path, mask_path)
+    if not image_data.is_null():
+        image_data.image_pyramid, image_data.mask_pyramid = image_data.build_pyramids()
+        image_data.stats = LabelStats(image_data.image, image_data.classes)
+    return image_data
+
+
+class ImageTab:
+    # an open image; in the background only the classes of the region edited since it was loaded are kept
+    def __init__(self, filename):
+        self.filename = filename
+        self.dirty = False
+        self.edits = None       # (x0, y0, classes)
+
+    def buffers(self):
+        return array_buffers(None if self.edits is None else self.edits[2])
+
 
 class MainWindow(QMainWindow):
     FIT_WINDOW, FIT_WIDTH, MANUAL_ZOOM = 0, 1, 2
     BRUSH_MODE, ERASER_MODE = 0, 1
     DRAWING_MODE, SPLITTING_MODE = 0, 1
 
-    def __init__(self):
+    def __init__(self, config=None, profile=False, trace_file=None):
         super(MainWindow, self).__init__()
 
+        self.config = get_config() if config is None else config
         self.set_config()
+        self.trace_file = trace_file
+        startup.mark('config')
         self.create_actions()
+        startup.mark('actions')
         self.create_menu()
         self.create_widgets()
+        startup.mark('widgets')
         self.set_other_settings()
         self.init_toolbar()
+        self.update_recent_file_menu()
+        startup.mark('toolbar')
+
+        if profile or trace_file:
+            self.perf_overlay_action.setChecked(True)
+            self.toggle_perf_overlay(True)
 
     def create_menu(self):
         self.main_menu = self.menuBar()
@@ -84,10 +160,18 @@ class MainWindow(QMainWindow):
         self.recent_file_menu = QMenu('&Recent files')
 
         self.image_menu.addAction(self.brush_size_action)
+        self.image_menu.addAction(self.segment_brush_action)
         self.image_menu.addAction(self.brightness_contrast_action)
+        self.image_menu.addAction(self.window_level_action)
+        self.image_menu.addSeparator()
+        self.image_menu.addAction(self.compare_action)
+        self.image_menu.addAction(self.next_diff_action)
+        self.image_menu.addAction(self.prev_diff_action)
 
         self.file_menu.addAction(self.open_action)
         self.file_menu.addAction(self.opendir_action)
+        self.file_menu.addAction(self.new_tab_action)
+        self.file_menu.addAction(self.close_tab_action)
         self.file_menu.addAction(self.save_action)
         self.file_menu.addAction(self.exit_action)
         self.file_menu.addMenu(self.recent_file_menu)
@@ -97,90 +181,143 @@ class MainWindow(QMainWindow):
         self.edit_menu.addAction(self.zoom_in_action)
         self.edit_menu.addAction(self.zoom_out_action)
         self.edit_menu.addAction(self.zoom_original_action)
+        self.edit_menu.addSeparator()
+        self.edit_menu.addAction(self.thumbnails_action)
+        self.edit_menu.addAction(self.perf_overlay_action)
 
     def create_actions(self):
-        self.open_action = QAction(QIcon('./icons/open.png'), '&Open', self)        
+        self.open_action = QAction(new_icon('open'), '&Open', self)        
         self.open_action.setShortcut('Ctrl+O')
         self.open_action.setStatusTip('Open')
         self.open_action.triggered.connect(self.open_call)
 
-        self.opendir_action = QAction(QIcon('./icons/opened-folder.png'), 'Open &Dir', self)        
+        self.opendir_action = QAction(new_icon('opened-folder'), 'Open &Dir', self)        
         self.opendir_action.setShortcut('Ctrl+D')
         self.opendir_action.setStatusTip('Open folder')
         self.opendir_action.triggered.connect(self.opendir_call)
 
-        self.open_next_action = QAction(QIcon('./icons/next.png'), '&Next Image', self)        
+        self.open_next_action = QAction(new_icon('next'), '&Next Image', self)        
         self.open_next_action.setShortcut('Ctrl+Right')
         self.open_next_action.setStatusTip('Open the next image')
         self.open_next_action.setEnabled(False)
         self.open_next_action.triggered.connect(self.open_next_call)
 
-        self.open_prev_action = QAction(QIcon('./icons/prev.png'), '&Prev Image', self)        
+        self.open_prev_action = QAction(new_icon('prev'), '&Prev Image', self)        
         self.open_prev_action.setShortcut('Ctrl+Left')
         self.open_prev_action.setStatusTip('Open the previous image')
         self.open_prev_action.setEnabled(False)
         self.open_prev_action.triggered.connect(self.open_prev_call)
 
-        self.save_action = QAction(QIcon('./icons/save.png'), '&Save', self)        
+        self.new_tab_action = QAction('Open in New &Tab', self)
+        self.new_tab_action.setShortcut('Ctrl+T')
+        self.new_tab_action.setStatusTip('Open the next image in a new tab')
+        self.new_tab_action.setEnabled(False)
+        self.new_tab_action.triggered.connect(self.open_tab_call)
+
+        self.close_tab_action = QAction('&Close Tab', self)
+        self.close_tab_action.setShortcut('Ctrl+W')
+        self.close_tab_action.setStatusTip('Close the current tab')
+        self.close_tab_action.setEnabled(False)
+        self.close_tab_action.triggered.connect(self.close_tab_call)
+
+        self.save_action = QAction(new_icon('save'), '&Save', self)        
         self.save_action.setShortcut('Ctrl+S')
         self.save_action.setStatusTip('Save mask')
         self.save_action.setEnabled(False)
         self.save_action.triggered.connect(self.save_file_call)
 
-        self.exit_action = QAction(QIcon('./icons/exit.png'), '&Exit', self)        
+        self.exit_action = QAction(new_icon('exit'), '&Exit', self)        
         self.exit_action.setShortcut('Ctrl+Q')
         self.exit_action.setStatusTip('Exit application')
         self.exit_action.triggered.connect(self.exit_call)
 
-        self.brush_size_action = QAction(QIcon('./icons/brush_size.png'), 'Brush size', self)
+        self.brush_size_action = QAction(new_icon('brush_size'), 'Brush size', self)
         self.brush_size_action.triggered.connect(self.brush_size_call)
 
-        self.brush_action = QAction(QIcon('./icons/brush.png'), 'Brush', self)
+        self.brush_action = QAction(new_icon('brush'), 'Brush', self)
         self.brush_action.triggered.connect(self.update_brush)
 
-        self.app_mode_action = QAction(QIcon('./icons/drawing.png'), 'Drawing', self)
+        self.segment_brush_action = QAction('Segment Brush', self)
+        self.segment_brush_action.setCheckable(True)
+        self.segment_brush_action.setWhatsThis('Label whole superpixels under the brush')
+        self.segment_brush_action.triggered.connect(self.update_segment_brush)
+
+        self.app_mode_action = QAction(new_icon('drawing'), 'Drawing', self)
         self.app_mode_action.triggered.connect(self.update_app_mode)
 
-        self.split_action = QAction(QIcon('./icons/split.png'), 'Split', self)
+        self.split_action = QAction(new_icon('split'), 'Split', self)
         self.split_action.triggered.connect(self.split_images)
 
-        self.fit_window_action = QAction(QIcon('./icons/fit-to-page.png'), '&Fit Window', self)
+        self.fit_window_action = QAction(new_icon('fit-to-page'), '&Fit Window', self)
         self.fit_window_action.setCheckable(True)
         self.fit_window_action.setEnabled(False)
         self.fit_window_action.setWhatsThis('Zoom follows window size')
         self.fit_window_action.triggered.connect(self.set_fit_window)
 
-        self.fit_width_action = QAction(QIcon('./icons/fit-width.png'), '&Fit &Width', self)
+        self.fit_width_action = QAction(new_icon('fit-width'), '&Fit &Width', self)
         self.fit_width_action.setCheckable(True)
         self.fit_width_action.setEnabled(False)
         self.fit_width_action.setWhatsThis('Zoom follows window width')
         self.fit_width_action.triggered.connect(self.set_fit_width)
 
-        self.zoom_in_action = QAction(QIcon('./icons/zoom-in.png'), 'Zoom &In', self)
+        self.zoom_in_action = QAction(new_icon('zoom-in'), 'Zoom &In', self)
         self.zoom_in_action.setWhatsThis('Increase zoom level')
         self.zoom_in_action.setEnabled(False)
         self.zoom_in_action.triggered.connect(functools.partial(self.add_zoom, 1.1))
 
-        self.zoom_out_action = QAction(QIcon('./icons/zoom-out.png'), '&Zoom Out', self)
+        self.zoom_out_action = QAction(new_icon('zoom-out'), '&Zoom Out', self)
         self.zoom_out_action.setWhatsThis('Decrease zoom level')
         self.zoom_out_action.setEnabled(False)
         self.zoom_out_action.triggered.connect(functools.partial(self.add_zoom, 0.9))
 
-        self.zoom_original_action = QAction(QIcon('./icons/zoom-to-actual-size.png'), '&Original size', self)
+        self.zoom_original_action = QAction(new_icon('zoom-to-actual-size'), '&Original size', self)
         self.zoom_original_action.setWhatsThis('Zoom to original size')
         self.zoom_original_action.setEnabled(False)
         self.zoom_original_action.triggered.connect(functools.partial(self.set_zoom, 100))
 
-        self.brightness_contrast_action = QAction(QIcon('./icons/brightness.png'), 'Brightness &&\n&Contrast', self)
+        self.thumbnails_action = QAction('Show &Thumbnails', self)
+        self.thumbnails_action.setCheckable(True)
+        self.thumbnails_action.setWhatsThis('Show image thumbnails in the file list')
+        self.thumbnails_action.triggered.connect(self.toggle_thumbnails)
+
+        self.perf_overlay_action = QAction('&Performance Overlay', self)
+        self.perf_overlay_action.setShortcut('F12')
+        self.perf_overlay_action.setCheckable(True)
+        self.perf_overlay_action.setWhatsThis('Show frame times and hot-path timings')
+        self.perf_overlay_action.triggered.connect(self.toggle_perf_overlay)
+
+        self.compare_action = QAction('Co&mpare Masks...', self)
+        self.compare_action.setCheckable(True)
+        self.compare_action.setWhatsThis('Show where the mask disagrees with the masks of another directory')
+        self.compare_action.triggered.connect(self.toggle_compare)
+
+        self.next_diff_action = QAction('Next Disagreement', self)
+        self.next_diff_action.setShortcut('Ctrl+]')
+        self.next_diff_action.setEnabled(False)
+        self.next_diff_action.triggered.connect(functools.partial(self.goto_disagreement, 1))
+
+        self.prev_diff_action = QAction('Previous Disagreement', self)
+        self.prev_diff_action.setShortcut('Ctrl+[')
+        self.prev_diff_action.setEnabled(False)
+        self.prev_diff_action.triggered.connect(functools.partial(self.goto_disagreement, -1))
+
+        self.brightness_contrast_action = QAction(new_icon('brightness'), 'Brightness &&\n&Contrast', self)
         self.brightness_contrast_action.setWhatsThis('Modify the brightness/contrast of the image')
         self.brightness_contrast_action.setEnabled(False)
         self.brightness_contrast_action.triggered.connect(self.modify_brightness_contrast)
 
+        self.window_level_action = QAction('&Window/Level', self)
+        self.window_level_action.setWhatsThis('Choose the range of pixel values shown from black to white')
+        self.window_level_action.setEnabled(False)
+        self.window_level_action.triggered.connect(self.modify_window_level)
+
     def create_widgets(self):
         self.file_list_widget = QListWidget()
         self.file_list_widget.itemSelectionChanged.connect(self.file_selection_changed)
 
         self.canvas = Canvas(self.brush_size, self.set_dirty)
+        self.canvas.render_quality = self.performance['render_quality']
+        self.canvas.memory = self.memory
 
         self.zoom_action = QWidgetAction(self)
         self.zoom_widget = ZoomWidget()
@@ -201,9 +338,30 @@ class MainWindow(QMainWindow):
         self.zoom_widget.setEnabled(False)
         self.zoom_widget.valueChanged.connect(self.paint_canvas)
 
+        self.class_combobox = QComboBox()
+        self.class_combobox.setToolTip(self.tr('Class painted by the brush'))
+        for k, name in enumerate(self.class_names, start=1):
+            swatch = QPixmap(16, 16)
+            swatch.fill(QColor(*(int(c) for c in class_palette()[k])))
+            self.class_combobox.addItem(QIcon(swatch), name, k)
+        self.class_combobox.currentIndexChanged.connect(self.update_label_class)
+        self.class_action = QWidgetAction(self)
+        self.class_action.setDefaultWidget(self.class_combobox)
+        self.class_action.setVisible(len(self.class_names) > 1)
+
         self.scroll_area = QScrollArea()
+        if self.performance['render_backend'] == 'opengl':
+            from widgets.gl_view import GLView, opengl_available
+            if opengl_available():
+                self.canvas.gl_view = GLView(self.canvas)
+                self.scroll_area.setViewport(self.canvas.gl_view)
+            else:
+                print('OpenGL is not available, falling back to QPainter rendering')
         self.scroll_area.setWidget(self.canvas)
         self.scroll_area.setWidgetResizable(True)
+        if self.canvas.gl_view is not None:
+            # setWidget turns the background on, the canvas must stay transparent over the GL viewport
+            self.canvas.setAutoFillBackground(False)
         self.scroll_bars = {
             Qt.Vertical: self.scroll_area.verticalScrollBar(),
             Qt.Horizontal: self.scroll_area.horizontalScrollBar(),
@@ -211,14 +369,43 @@ class MainWindow(QMainWindow):
         self.canvas.scroll_request.connect(self.scroll_request)
         self.canvas.zoom_request.connect(self.zoom_request)
         self.canvas.location_request.connect(self.mouse_move_in_canvas)
-            
-        self.setCentralWidget(self.scroll_area)
+
+        # every tab is drawn by the one canvas, the tabs in the background only keep what was edited in them
+        self.tab_bar = QTabBar()
+        self.tab_bar.setDocumentMode(True)
+        self.tab_bar.setTabsClosable(True)
+        self.tab_bar.setMovable(True)
+        self.tab_bar.setExpanding(False)
+        self.tab_bar.setVisible(False)
+        self.tab_bar.currentChanged.connect(self.switch_tab)
+        self.tab_bar.tabCloseRequested.connect(self.close_tab_call)
+        self.active_tab = None
+
+        self.central_layout = QVBoxLayout()
+        self.central_layout.setContentsMargins(0, 0, 0, 0)
+        self.central_layout.setSpacing(0)
+        self.central_layout.addWidget(self.tab_bar)
+        self.central_layout.addWidget(self.scroll_area)
+        self.central_widget = QWidget()
+        self.central_widget.setLayout(self.central_layout)
+        self.setCentralWidget(self.central_widget)
+
+        self.perf_overlay = None
 
         self.file_search = QLineEdit()
         self.file_search.setPlaceholderText(self.tr("Search Filename"))
         self.file_search.textChanged.connect(self.file_search_changed)
         self.file_list_widget = QListWidget()
         self.file_list_widget.itemSelectionChanged.connect(self.file_selection_changed)
+        self.file_list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.file_list_widget.customContextMenuRequested.connect(self.file_list_menu)
+
+        self.file_list_widget.verticalScrollBar().valueChanged.connect(self.request_visible_thumbnails)
+
+        self.thumbnail_timer = QtCore.QTimer(self)
+        self.thumbnail_timer.setSingleShot(True)
+        self.thumbnail_timer.setInterval(100)
+        self.thumbnail_timer.timeout.connect(self.load_visible_thumbnails)
 
         self.file_list_layout = QVBoxLayout()
         self.file_list_layout.setContentsMargins(0, 0, 0, 0)
@@ -235,25 +422,79 @@ class MainWindow(QMainWindow):
         self.addDockWidget(Qt.RightDockWidgetArea, self.file_dock)
 
         self.output_block = OutputBlock(osp.abspath(self.mask_dir), osp.abspath(self.split_dir),
-                                        self.mask_dir_callback, self.split_dir_callback, self)
+                                        self.mask_dir_callback, self.split_dir_callback, self.config['split'], self)
         self.output_block_dock = QDockWidget(self.tr("Output Directories"), self)
         self.output_block_dock.setWidget(self.output_block)
         self.addDockWidget(Qt.TopDockWidgetArea, self.output_block_dock)
 
+        self.inspector = InspectorWidget(self)
+        self.inspector_dock = QDockWidget(self.tr("Inspector"), self)
+        self.inspector_dock.setObjectName("Inspector")
+        self.inspector_dock.setWidget(self.inspector)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.inspector_dock)
+        self.edit_menu.addAction(self.inspector_dock.toggleViewAction())
+        self.canvas.mask_edited.connect(self.on_mask_edited)
+
     def set_config(self):
         self.filename = ''
         self.mask_file = ''
         self.image_path = None
         self.image_data = None
-        self.mask_dir = './mask'
-        self.split_dir = './split'
+        self.mask_dir = self.config['mask_dir']
+        self.split_dir = self.config['split_dir']
         self.dirty = False
+        self.mask_codec = self.config['mask_codec']
+        self.class_names = tuple(self.config['classes'])
 
-        self.max_recent_files = 10
+        self.max_recent_files = self.config['max_recent_files']
         self.recent_files = []
         self.last_opendir = None
 
-        self.brush_size = 10
+        self.session = None
+        if self.config['session_file']:
+            self.session = SessionStore(osp.expanduser(self.config['session_file']))
+            self.recent_files = self.session.recent_files(self.max_recent_files)
+            self.last_opendir = self.session.get_setting('last_opendir')
+            QCoreApplication.instance().aboutToQuit.connect(self.session.close)
+
+        self.brush_size = self.config['brush_size']
+        self.superpixel_method = self.config['superpixel_method']
+        self.superpixel_worker = None
+        self.pyramid_worker = None
+        self.stats_worker = None
+        self.stats = None
+        self.stats_rect = QRect()
+        self.compare_dir = None
+        self.diff_worker = None
+        self.mask_diff = None
+        self.diff_rect = QRect()
+        self.diff_tile = -1
+        self.edit_rect = QRect()
+
+        self.performance = self.config['performance']
+        self.workers = self.performance['workers'] or None
+        if self.workers:
+            QtCore.QThreadPool.globalInstance().setMaxThreadCount(self.workers)
+        self.memory = MemoryBudget(self.performance['memory_budget_mb'] * 2 ** 20)
+        self.memory.add_listener(self.on_memory_changed)
+        # masks are written one at a time, in the order they were saved, whichever tab they come from
+        self.save_pool = QtCore.QThreadPool(self)
+        self.save_pool.setMaxThreadCount(1)
+        QCoreApplication.instance().aboutToQuit.connect(self.save_pool.waitForDone)
+        self.save_workers = {}
+        self.save_count = 0
+        self.image_cache = LRUCache(self.performance['image_cache_size'], memory=self.memory, category='images',
+                                    buffers=LabelData.buffers)
+        self.thumbnail_loader = ThumbnailLoader(
+            ThumbnailCache(osp.expanduser(self.config['thumbnail_dir']), self.config['thumbnail_size']), parent=self
+        )
+        self.thumbnail_loader.ready.connect(self.on_thumbnail_ready)
+        self.file_items = {}
+        self.prefetch_workers = {}
+
+        self.dispatcher = FrameDispatcher(self)
+        self.pending_scroll = {Qt.Horizontal: 0, Qt.Vertical: 0}
+
         self.drawing_mode = self.BRUSH_MODE
         self.app_mode = self.DRAWING_MODE
 
@@ -261,6 +502,8 @@ class MainWindow(QMainWindow):
         self.setMinimumSize(QSize(800, 600))
 
         self.statusBar().showMessage(str(self.tr("%s started.")) % __appname__)
+        self.memory_label = QLabel()
+        self.statusBar().addPermanentWidget(self.memory_label)
         self.statusBar().show()
 
     def set_other_settings(self):
@@ -295,6 +538,8 @@ class MainWindow(QMainWindow):
 
         self.list_drawing_actions = (
             self.brush_action,
+            self.class_action,
+            self.segment_brush_action,
             self.app_mode_action,
             self.brush_size_action,
             self.brightness_contrast_action,
@@ -334,16 +579,18 @@ class MainWindow(QMainWindow):
         return lst
 
     def brush_size_call(self):
+        from widgets.brushsize import BrushDialog
+
         dialog = BrushDialog(self.brush_size, self.on_new_brush_size, parent=self)
         dialog.exec_()
 
     def update_brush(self):
         self.drawing_mode = 1 - self.drawing_mode
         if self.drawing_mode == self.BRUSH_MODE:
-            self.brush_action.setIcon(QIcon('./icons/brush.png'))
+            self.brush_action.setIcon(new_icon('brush'))
             self.brush_action.setText('Brush')
         else:
-            self.brush_action.setIcon(QIcon('./icons/eraser.png'))
+            self.brush_action.setIcon(new_icon('eraser'))
             self.brush_action.setText('Eraser')
         self.update_drawing_mode()
 
@@ -354,119 +601,297 @@ class MainWindow(QMainWindow):
             self.canvas.drawing_mode = self.canvas.ERASER_MODE
         self.canvas.update()
 
+    def update_label_class(self, index):
+        self.canvas.label_class = self.class_combobox.itemData(index)
+
+    def update_segment_brush(self, value=True):
+        self.canvas.segment_brush = value
+        if value:
+            self.request_superpixels()
+
+    def request_superpixels(self):
+        if not self.canvas.segment_brush or self.image_data is None or self.canvas.superpixels is not None:
+            return
+
+        self.status(f'Computing superpixels for {osp.basename(self.filename)}...')
+        self.superpixel_worker = run_in_background(
+            load_superpixels, self.image_data.image, self.mask_file, self.superpixel_method,
+            on_result=functools.partial(self.on_superpixels_ready, self.filename),
+            on_error=self.on_superpixels_error,
+        )
+
+    def request_pyramid(self):
+        image_data = self.image_data
+        if image_data.image_pyramid is not None and image_data.mask_pyramid is not None:
+            self.canvas.set_pyramid(image_data.image_pyramid, image_data.mask_pyramid)
+            return
+
+        self.pyramid_worker = run_in_background(
+            image_data.build_pyramids,
+            on_result=functools.partial(self.on_pyramid_ready, image_data),
+            on_error=print,
+        )
+
+    def on_pyramid_ready(self, image_data, pyramids):
+        image_data.image_pyramid, image_data.mask_pyramid = pyramids
+        if image_data is self.image_data:
+            self.canvas.set_pyramid(*pyramids)
+            self.account_image()
+
+    def request_stats(self):
+        image_data = self.image_data
+        self.stats = None
+        self.stats_rect = QRect()
+        self.inspector.set_stats(None, self.class_names)
+        if image_data.stats is not None:
+            self.on_stats_ready(image_data, image_data.stats)
+            return
+
+        self.stats_worker = run_in_background(
+            LabelStats, image_data.image, image_data.classes,
+            on_result=functools.partial(self.on_stats_ready, image_data),
+            on_error=print,
+        )
+
+    def on_stats_ready(self, image_data, stats):
+        image_data.stats = stats
+        if image_data is self.image_data:
+            # the cached statistics stay as loaded, the working copy follows the strokes
+            self.stats = stats.copy()
+            self.memory.register(('stats', 'classes'), array_buffers(self.stats.classes), 'stats')
+            self.account_image()
+            self.update_stats()
+            self.inspector.set_stats(self.stats, self.class_names)
+
+    def on_mask_edited(self, x0, y0, x1, y1):
+        self.edit_rect |= QRect(x0, y0, x1 - x0, y1 - y0)
+        self.stats_rect |= QRect(x0, y0, x1 - x0, y1 - y0)
+        self.dispatcher.post('stats', self.update_stats)
+        if self.compare_dir:
+            self.diff_rect |= QRect(x0, y0, x1 - x0, y1 - y0)
+            self.dispatcher.post('diff', self.update_mask_diff)
+
+    def update_stats(self):
+        if self.stats is None or self.canvas.mask_pixmap is None:
+            return
+
+        rect = self.stats_rect & self.canvas.mask_pixmap.rect()
+        self.stats_rect = QRect()
+        if rect.isEmpty():
+            return
+
+        region = rgb_to_classes(self.canvas.qpixmap2image(self.canvas.mask_pixmap.copy(rect)))
+        self.stats.update(rect.x(), rect.y(), region)
+        self.inspector.refresh_counts()
+
+    def toggle_compare(self, value=True):
+        if value:
+            compare_dir = QFileDialog.getExistingDirectory(
+                self, self.tr('Masks to compare with'), self.compare_dir or self.mask_dir,
+                QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks,
+            )
+            if not compare_dir:
+                self.compare_action.setChecked(False)
+                return
+            self.compare_dir = compare_dir
+        else:
+            self.compare_dir = None
+        self.request_mask_diff()
+
+    def request_mask_diff(self):
+        self.mask_diff = None
+        self.memory.release(('compare', 'masks'))
+        self.diff_rect = QRect()
+        self.diff_tile = -1
+        self.canvas.set_diff_overlay(None)
+        self.inspector.set_diff(None)
+        self.next_diff_action.setEnabled(False)
+        self.prev_diff_action.setEnabled(False)
+        if not self.compare_dir or self.image_data is None or self.image_data.is_null():
+            return
+
+        # the comparison starts from the mask on the canvas, strokes made in the meantime are applied when it is ready
+        image_data = self.image_data
+        classes = rgb_to_classes(self.canvas.qpixmap2image(self.canvas.mask_pixmap))
+        self.diff_worker = run_in_background(
+            load_mask_diff, classes, create_mask_path(self.filename, self.compare_dir, self.mask_codec),
+            on_result=functools.partial(self.on_mask_diff_ready, image_data, self.compare_dir),
+            on_error=self.on_mask_diff_error,
+        )
+
+    def on_mask_diff_ready(self, image_data, compare_dir, mask_diff):
+        if image_data is not self.image_data or compare_dir != self.compare_dir:
+            return
+        if mask_diff is None:
+            self.status(self.tr('No mask to compare with in %s') % compare_dir)
+            return
+
+        self.mask_diff = mask_diff
+        self.memory.register(('compare', 'masks'), array_buffers(mask_diff.classes, mask_diff.reference), 'compare')
+        self.canvas.set_diff_overlay((image_data.width, image_data.height))
+        self.update_mask_diff()
+        self.inspector.set_diff(mask_diff)
+        self.next_diff_action.setEnabled(True)
+        self.prev_diff_action.setEnabled(True)
+
+    def on_mask_diff_error(self, message):
+        self.status(self.tr('Failed to compare masks'))
+        print(message)
+
+    def update_mask_diff(self):
+        if self.mask_diff is None or self.canvas.mask_pixmap is None:
+            return
+
+        rect = self.diff_rect & self.canvas.mask_pixmap.rect()
+        self.diff_rect = QRect()
+        if not rect.isEmpty():
+            region = rgb_to_classes(self.canvas.qpixmap2image(self.canvas.mask_pixmap.copy(rect)))
+            self.mask_diff.update(rect.x(), rect.y(), region)
+
+        self.canvas.update_diff_overlay(
+            (x0, y0, self.mask_diff.overlay(x0, y0, x1, y1)) for x0, y0, x1, y1 in self.mask_diff.stale_tiles()
+        )
+        self.inspector.refresh_diff()
+
+    def goto_disagreement(self, step, _value=False):
+        if self.mask_diff is None:
+            return
+        self.update_mask_diff()
+
+        tiles = self.mask_diff.disagreement_tiles()
+        if not len(tiles):
+            self.canvas.set_diff_focus(None)
+            self.status(self.tr('The masks agree'))
+            return
+
+        # tiles are visited in reading order, so fixing one does not change the order of the others
+        if step > 0:
+            k = int(np.searchsorted(tiles, self.diff_tile, side='right')) % len(tiles)
+        else:
+            k = (int(np.searchsorted(tiles, self.diff_tile, side='left')) - 1) % len(tiles)
+        self.diff_tile = int(tiles[k])
+
+        x0, y0, x1, y1 = self.mask_diff.tile_rect(self.diff_tile)
+        self.canvas.set_diff_focus(QRect(x0, y0, x1 - x0, y1 - y0))
+        viewport = self.scroll_area.viewport()
+        scale = self.canvas.scale
+        self.set_scroll(Qt.Horizontal, int((x0 + x1) / 2 * scale - viewport.width() / 2))
+        self.set_scroll(Qt.Vertical, int((y0 + y1) / 2 * scale - viewport.height() / 2))
+
+        row, col = divmod(self.diff_tile, self.mask_diff.disagreement.shape[1])
+        self.status(f'Disagreement {k + 1}/{len(tiles)}: '
+                    f'{int(self.mask_diff.disagreement[row, col]):,} px at ({x0}, {y0})')
+
+    def on_superpixels_ready(self, filename, superpixels):
+        if filename != self.filename or self.image_data is None:
+            return
+        self.canvas.set_superpixels(superpixels)
+        self.status(f'Superpixels ready for {osp.basename(filename)}')
+
+    def account_image(self):
+        # the current image is never evicted; its cache entry is registered again as pyramids and stats arrive
+        key = (self.filename, self.mask_file)
+        if key in self.image_cache:
+            self.image_cache.put(key, self.image_data)
+        self.memory.register(('current', 'image'), self.image_data.buffers(), 'images')
+
+    def on_memory_changed(self):
+        self.dispatcher.post('memory', self.show_memory)
+
+    def show_memory(self):
+        usage = self.memory.usage()
+        total = sum(usage.values())
+        text = f'{total / 2 ** 20:.0f} MB'
+        if self.memory.budget:
+            text += f' / {self.memory.budget / 2 ** 20:.0f} MB'
+        self.memory_label.setText(text)
+        self.memory_label.setToolTip('\n'.join(
+            f'{category}: {nbytes / 2 ** 20:.1f} MB' for category, nbytes in sorted(usage.items())
+        ))
+
+    def on_superpixels_error(self, message):
+        self.status(self.tr('Failed to compute superpixels'))
+        print(message)
+
+    def toggle_perf_overlay(self, value=True):
+        if self.perf_overlay is None:
+            from widgets.perf_overlay import PerfOverlay
+            self.perf_overlay = PerfOverlay(self.scroll_area)
+
+        if value:
+            profiler.enable(self.trace_file)
+        else:
+            profiler.disable()
+        self.perf_overlay.set_active(value)
+
     def update_app_mode(self):
         self.app_mode = 1 - self.app_mode
         if self.app_mode == self.DRAWING_MODE:
-            self.app_mode_action.setIcon(QIcon('./icons/drawing.png'))
+            self.app_mode_action.setIcon(new_icon('drawing'))
             self.app_mode_action.setText('Draw Mode')
             self.canvas.update_app_mode(self.canvas.DRAWING_MODE)
         else:
-            self.app_mode_action.setIcon(QIcon('./icons/irregular-quadrilateral.png'))
+            self.app_mode_action.setIcon(new_icon('irregular-quadrilateral'))
             self.app_mode_action.setText('Split Mode')
             self.canvas.update_app_mode(self.canvas.SPLITTING_MODE)
 
-    def split_images(self):
+    @timed('split_images')
+    def split_images(self, _value=False):
         if self.app_mode == self.DRAWING_MODE:
-            if self.split_dir and not osp.exists(osp.join(self.split_dir, 'defect')):
-                os.mkdir(osp.join(self.split_dir, 'defect'))
-
-            if self.split_dir and not osp.exists(osp.join(self.split_dir, 'normal')):
-                os.mkdir(osp.join(self.split_dir, 'normal'))
-
             base_file = osp.basename(self.filename).split('.')[0]
 
-            image = cv2.cvtColor(self.image_data.image, cv2.COLOR_RGB2BGR)
-            mask = cv2.cvtColor(self.canvas.qpixmap2image(self.canvas.mask_pixmap), cv2.COLOR_RGB2BGR)
-
-            height, width = image.shape[:2]
-            
-            patch_size = self.output_block.size_spinbox.value()
-            half_patch_size = patch_size // 2
-            rotation_range = int(math.ceil(patch_size / math.sqrt(2))) + 1
-            step = self.output_block.stride_spinbox.value()
-            for i in range(0, height, step):
-                for j in range(0, width, step):
-                    y = i + half_patch_size
-                    x = j + half_patch_size
-                    str_y = f'{y}'.zfill(4)
-                    str_x = f'{x}'.zfill(4)
-
-                    patch = image[i:i+patch_size, j:j+patch_size]
-                    mask_patch = mask[i:i+patch_size, j:j+patch_size]
-                    itype = 'defect' if (mask_patch[:, :, 0] == 0).any() else 'normal'
-                    split_file = osp.join(self.split_dir, f'{itype}/{base_file}-{str_y}-{str_x}-000.png')
-                    cv2.imwrite(split_file, patch)
-
-                    """
-                    if rotation_range < y < height - rotation_range - 1 and rotation_range < x < width - rotation_range - 1:
-                        istart = i + half_patch_size - rotation_range
-                        iend = i + half_patch_size + rotation_range
-                        jstart = j + half_patch_size - rotation_range
-                        jend = j + half_patch_size + rotation_range
-
-                        mask_patch = mask[i:i+patch_size, j:j+patch_size]
-                        angle = 15 if (mask_patch[:, :, 0] == 0).any() else 60
-
-                        rot_patch = image[istart:iend,jstart:jend]
-                        rot_mask_patch = mask[istart:iend,jstart:jend]
-                        for k in range(0, 360, angle):
-                            str_k = f'{k}'.zfill(3)
-                            rot_mat = cv2.getRotationMatrix2D((rotation_range, rotation_range), k, 1.0)
-
-                            rotated = cv2.warpAffine(src=rot_patch, M=rot_mat, dsize=(2 * rotation_range, 2 * rotation_range))
-                            rotated_mask = cv2.warpAffine(src=rot_mask_patch, M=rot_mat, dsize=(2 * rotation_range, 2 * rotation_range))
-
-                            patch = rotated[rotation_range-half_patch_size:rotation_range+half_patch_size,
-                                            rotation_range-half_patch_size:rotation_range+half_patch_size]
-
-                            mask_patch = rotated_mask[rotation_range-half_patch_size:rotation_range+half_patch_size,
-                                                      rotation_range-half_patch_size:rotation_range+half_patch_size]
-
-                            itype = 'defect' if (mask_patch[:, :, 0] == 0).any() else 'normal'
-                            split_file = osp.join(self.split_dir, f'{itype}/{base_file}-{str_y}-{str_x}-{str_k}.png')
-
-                            cv2.imwrite(split_file, patch)
-                    else:
-                        patch = image[i:i+patch_size, j:j+patch_size]
-                        rot90 = cv2.rotate(patch, cv2.ROTATE_90_CLOCKWISE)
-                        rot180 = cv2.rotate(patch, cv2.ROTATE_180)
-                        rot270 = cv2.rotate(patch, cv2.ROTATE_90_COUNTERCLOCKWISE)
-
-                        mask_patch = mask[i:i+patch_size, j:j+patch_size]
-                        mask_rot90 = cv2.rotate(mask_patch, cv2.ROTATE_90_CLOCKWISE)
-                        mask_rot180 = cv2.rotate(mask_patch, cv2.ROTATE_180)
-                        mask_rot270 = cv2.rotate(mask_patch, cv2.ROTATE_90_COUNTERCLOCKWISE)
-
-                        itype = 'defect' if (mask_patch[:, :, 0] == 0).any() else 'normal'
-                        split_file = osp.join(self.split_dir, f'{itype}/{base_file}-{str_y}-{str_x}-000.png')
-                        cv2.imwrite(split_file, patch)
-
-                        itype = 'defect' if (mask_rot270[:, :, 0] == 0).any() else 'normal'
-                        split_file = osp.join(self.split_dir, f'{itype}/{base_file}-{str_y}-{str_x}-090.png')
-                        cv2.imwrite(split_file, rot90)
-
-                        itype = 'defect' if (mask_rot180[:, :, 0] == 0).any() else 'normal'
-                        split_file = osp.join(self.split_dir, f'{itype}/{base_file}-{str_y}-{str_x}-180.png')
-                        cv2.imwrite(split_file, rot180)
-
-                        itype = 'defect' if (mask_rot270[:, :, 0] == 0).any() else 'normal'
-                        split_file = osp.join(self.split_dir, f'{itype}/{base_file}-{str_y}-{str_x}-270.png')
-                        cv2.imwrite(split_file, rot270)
-                    """
+            image = self.image_data.native
+            if image.ndim == 3:
+                image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            classes = rgb_to_classes(self.canvas.qpixmap2image(self.canvas.mask_pixmap))
+
+            output_mode = self.output_block.output_mode()
+            tile_format = self.config['split']['file_format' if output_mode == 'files' else 'shard_format']
+            if tile_format == 'webp' and image.dtype != np.uint8:
+                # lossless WebP is 8-bit only
+                print(f'WebP tiles must be 8-bit, exporting the {image.dtype} tiles of {base_file} as png')
+                tile_format = 'png'
+
+            policy = self.output_block.tiling_policy()
+            augmenter = None
+            if self.output_block.augment_checkbox.isChecked():
+                augmenter = RotationAugmenter(policy.patch_size, workers=self.workers)
+
+            writer = create_tile_writer(output_mode, self.split_dir, base_file, self.filename,
+                                        compression_level=self.performance['compression_level'],
+                                        labels=tile_labels(self.class_names), tile_format=tile_format,
+                                        dedup=self.config['split']['dedup'],
+                                        dedup_hash=self.config['split']['dedup_hash'],
+                                        incremental=self.config['split']['incremental'])
+            counts = export_tiles(image, classes, policy, writer, augmenter, key=base_file,
+                                  class_names=self.class_names, source=self.filename)
+            writer.close()
+
+            message = 'Exported ' + ', '.join(f'{count} {label}' for label, count in counts.items()) + ' tiles'
+            if writer.duplicates:
+                message += f' ({writer.duplicates} duplicates)'
+            self.status(message)
         else:
             pts1, height, width = self.canvas.points.get_points()
             pts2 = np.float32([[0, 0],[width, 0], [height, width],[0, height]])
             transform = cv2.getPerspectiveTransform(pts1, pts2)
 
-            dst = cv2.warpPerspective(self.image_data.image, transform, (height, width))
-            dst = cv2.cvtColor(dst, cv2.COLOR_RGB2BGR)
+            dst = cv2.warpPerspective(self.image_data.native, transform, (height, width))
+            if dst.ndim == 3:
+                dst = cv2.cvtColor(dst, cv2.COLOR_RGB2BGR)
 
-            split_file = f'{osp.splitext(self.filename)[0]}.png'
+            tile_format = self.config['split']['file_format']
+            if tile_format == 'webp' and dst.dtype != np.uint8:
+                print(f'WebP tiles must be 8-bit, exporting the {dst.dtype} split of {osp.basename(self.filename)} as png')
+                tile_format = 'png'
+            encoder = create_tile_encoder(tile_format, self.performance['compression_level'])
+
+            split_file = f'{osp.splitext(self.filename)[0]}.{encoder.extension}'
             if self.split_dir and osp.exists(self.split_dir):
                 split_file_without_path = osp.basename(split_file)
                 split_file = osp.join(self.split_dir, split_file_without_path)
 
-            cv2.imwrite(split_file, dst)
+            write_tile(split_file, encoder.encode(dst))
 
     def on_new_brush_size(self, brush_size):
         self.brush_size = brush_size
@@ -535,6 +960,9 @@ class MainWindow(QMainWindow):
         return default_opendir_path
 
     def modify_brightness_contrast(self):
+        from PIL import Image
+        from widgets.brightness_contrast_dialog import BrightnessContrastDialog
+
         # set brightness contrast values
         dialog = BrightnessContrastDialog(Image.fromarray(self.image_data.image), self.on_new_brightness_contrast, parent=self)
         brightness, contrast = self.brightness_contrast_values.get(self.filename, (None, None))
@@ -551,19 +979,64 @@ class MainWindow(QMainWindow):
         contrast = dialog.slider_contrast.value()
 
         self.brightness_contrast_values[self.filename] = (brightness, contrast)
+        self.remember_view_state(brightness=brightness, contrast=contrast)
+
+    def modify_window_level(self, _value=False):
+        from widgets.window_level_dialog import WindowLevelDialog
+
+        native = self.image_data.native
+        minimum, maximum = native.min().item(), native.max().item()
+        dialog = WindowLevelDialog(minimum, maximum, self.image_data.window, auto_window(native), self.on_new_window,
+                                   min_width=min_window_width(native.dtype, minimum, maximum), parent=self)
+        dialog.exec_()
+
+    def on_new_window(self, window):
+        self.dispatcher.post('window', self.apply_window, window)
+
+    def apply_window(self, window):
+        if self.image_data is None or self.image_data.window is None:
+            return
+        self.image_data.set_window(window)
+        self.canvas.update_image(self.image_data.image)
+        # the canvas rebuilt the levels of the new display image, the cached copy shares them
+        self.image_data.image_pyramid = self.canvas.image_levels
+        self.account_image()
 
     def mouse_move_in_canvas(self, x, y):
-        self.status(f'({x}, {y})')
+        self.dispatcher.post('location', self.show_location, x, y)
+
+    def show_location(self, x, y):
+        value = ''
+        if self.image_data is not None and not self.image_data.is_null():
+            native = self.image_data.native
+            if 0 <= y < native.shape[0] and 0 <= x < native.shape[1]:
+                raw = native[y, x].tolist()
+                value = f' = {raw}'
+                if self.inspector_dock.isVisible():
+                    self.inspector.set_value(x, y, raw, self.image_data.image[y, x].tolist())
+        self.status(f'({x}, {y}){value}')
 
     def scroll_request(self, delta, orientation):
-        units = -delta * 0.1  # natural scroll
-        bar = self.scroll_bars[orientation]
-        value = bar.value() + bar.singleStep() * units
-        self.set_scroll(orientation, int(value))
+        # wheel deltas are summed and applied once per frame
+        self.pending_scroll[orientation] += delta
+        self.dispatcher.post('scroll', self.flush_scroll)
+
+    def flush_scroll(self):
+        for orientation, delta in self.pending_scroll.items():
+            if delta:
+                units = -delta * 0.1  # natural scroll
+                bar = self.scroll_bars[orientation]
+                value = bar.value() + bar.singleStep() * units
+                self.set_scroll(orientation, int(value))
+        self.pending_scroll = {Qt.Horizontal: 0, Qt.Vertical: 0}
 
     def set_scroll(self, orientation, value):
         self.scroll_bars[orientation].setValue(value)
         self.scroll_values[orientation][self.filename] = value
+        if orientation == Qt.Horizontal:
+            self.remember_view_state(scroll_h=value)
+        else:
+            self.remember_view_state(scroll_v=value)
 
     def set_zoom(self, value):
         self.fit_width_action.setChecked(False)
@@ -571,6 +1044,7 @@ class MainWindow(QMainWindow):
         self.zoom_mode = self.MANUAL_ZOOM
         self.zoom_widget.setValue(value)
         self.zoom_values[self.filename] = (self.zoom_mode, value)
+        self.remember_view_state(zoom_mode=self.zoom_mode, zoom_value=value)
 
     def add_zoom(self, increment=1.1):
         zoom_value = self.zoom_widget.value() * increment
@@ -607,21 +1081,24 @@ class MainWindow(QMainWindow):
         if not self.may_continue():
             return
 
+        from widgets.file_dialog_preview import FileDialogPreview
+
         path = osp.dirname(str(self.filename)) if self.filename else "."
         formats = self.supported_image_formats()
         filters = f'Image & Label files {formats}'
         
-        fileDialog = FileDialogPreview(self)
+        fileDialog = FileDialogPreview(self, thumbnail_loader=self.thumbnail_loader)
         fileDialog.setFileMode(FileDialogPreview.ExistingFile)
         fileDialog.setNameFilter(filters)
         fileDialog.setWindowTitle('{__appname__} - Choose Image or Label file')
         fileDialog.setWindowFilePath(path)
         fileDialog.setViewMode(FileDialogPreview.Detail)
         
-        if fileDialog.exec_():
-            filename = fileDialog.selectedFiles()[0]
-            if filename:
-                self.load_file(filename)
+        accepted = fileDialog.exec_()
+        filename = fileDialog.selectedFiles()[0] if accepted else None
+        fileDialog.deleteLater()
+        if filename:
+            self.load_file(filename)
 
     def mask_dir_callback(self, mask_dir):
         if len(self.mask_file) > 0:
@@ -641,10 +1118,14 @@ class MainWindow(QMainWindow):
             z.setEnabled(value)
 
         self.brightness_contrast_action.setEnabled(value)
+        # 8-bit images are shown as they are, without a window
+        self.window_level_action.setEnabled(value and self.image_data is not None and self.image_data.window is not None)
+        self.new_tab_action.setEnabled(value)
 
     def on_new_brightness_contrast(self, image):
         self.canvas.update_image(image)
 
+    @timed('load_file')
     def load_file(self, filename):
         filename = str(filename)
         if filename in self.image_list and (
@@ -654,7 +1135,13 @@ class MainWindow(QMainWindow):
             self.file_list_widget.repaint()
             return
 
+        tab = self.find_tab(filename)
+        if tab is not None and tab is not self.active_tab:
+            self.tab_bar.setCurrentIndex(self.tab_index(tab))
+            return
+
         self.reset_state()
+        self.edit_rect = QRect()
         self.canvas.setEnabled(False)
 
         if not QtCore.QFile.exists(filename):
@@ -670,7 +1157,13 @@ class MainWindow(QMainWindow):
         self.mask_file = self.create_mask_path(filename)
         
         self.filename = filename
-        self.image_data = LabelData(filename, self.mask_file)
+        if any(saved == filename for saved, _ in self.save_workers.values()):
+            # the mask on disk is only read once its queued saves are written
+            self.save_pool.waitForDone()
+        self.image_data = self.image_cache.get((filename, self.mask_file))
+        if self.image_data is None:
+            self.image_data = LabelData(filename, self.mask_file)
+            self.image_cache.put((filename, self.mask_file), self.image_data)
     
         if self.image_data.is_null():
             self.errorMessage(
@@ -685,12 +1178,18 @@ class MainWindow(QMainWindow):
 
         self.canvas.loadPixmap(self.image_data.image, QPixmap.fromImage(self.image_data.qimage),
                                QPixmap.fromImage(self.image_data.qmask))
+        self.account_image()
 
         self.set_clean()
         self.canvas.setEnabled(True)
         self.update_drawing_mode()
+        self.request_superpixels()
+        self.request_pyramid()
+        self.request_stats()
+        self.request_mask_diff()
 
         is_initial_load = not self.zoom_values
+        self.restore_view_state(self.filename)
         if self.filename in self.zoom_values:
             self.zoom_mode = self.zoom_values[self.filename][0]
             self.set_zoom(self.zoom_values[self.filename][1])
@@ -702,13 +1201,36 @@ class MainWindow(QMainWindow):
                 self.set_scroll(orientation, self.scroll_values[orientation][self.filename])
 
         self.paint_canvas()
+        self.restore_tab(self.open_tab(filename))
         self.add_recent_file(self.filename)
         self.toggle_actions(True)
 
         self.canvas.setFocus()
         self.status(str(self.tr("Loaded %s")) % osp.basename(str(filename)))
+        self.prefetch_images()
         return True
 
+    def prefetch_images(self):
+        if self.performance['prefetch_depth'] <= 0 or self.filename not in self.image_list:
+            return
+
+        curr_index = self.image_list.index(self.filename)
+        for filename in self.image_list[curr_index + 1:curr_index + 1 + self.performance['prefetch_depth']]:
+            key = (filename, self.create_mask_path(filename))
+            if key in self.image_cache or key in self.prefetch_workers:
+                continue
+            self.prefetch_workers[key] = run_in_background(
+                load_label_data, *key, on_result=functools.partial(self.on_prefetched, key),
+                on_error=functools.partial(self.on_prefetch_failed, key),
+            )
+
+    def on_prefetched(self, key, image_data):
+        self.prefetch_workers.pop(key, None)
+        self.image_cache.put(key, image_data)
+
+    def on_prefetch_failed(self, key, message):
+        self.prefetch_workers.pop(key, None)
+
     def paint_canvas(self):
         assert not self.image_data.is_null(), "cannot paint null image"
         self.canvas.scale = 0.01 * self.zoom_widget.value()
@@ -716,11 +1238,7 @@ class MainWindow(QMainWindow):
         self.canvas.update()
 
     def create_mask_path(self, filename):
-        mask_file = f'{osp.splitext(filename)[0]}-m.png'
-        if self.mask_dir:
-            mask_file_without_path = osp.basename(mask_file)
-            mask_file = osp.join(self.mask_dir, mask_file_without_path)
-        return mask_file
+        return create_mask_path(filename, self.mask_dir, self.mask_codec)
 
     def file_search_changed(self):
         self.import_dir_images(
@@ -735,6 +1253,12 @@ class MainWindow(QMainWindow):
             return
         item = items[0]
 
+        # an image open in another tab is switched to, its strokes and the current ones both stay
+        tab = self.find_tab(str(item.text()))
+        if tab is not None and tab is not self.active_tab:
+            self.tab_bar.setCurrentIndex(self.tab_index(tab))
+            return
+
         if not self.may_continue():
             return
 
@@ -744,11 +1268,183 @@ class MainWindow(QMainWindow):
             if filename:
                 self.load_file(filename)
 
-    def save_file_call(self):
-        mask = self.canvas.qpixmap2image(self.canvas.mask_pixmap)
-        cv2.imwrite(self.mask_file, mask)
+    @timed('save_file_call')
+    def save_file_call(self, _value=False):
+        # the mask is copied here and written by the save queue, the canvas is free as soon as this returns
+        classes = rgb_to_classes(self.canvas.qpixmap2image(self.canvas.mask_pixmap))
+        self.save_count += 1
+        key = self.save_count
+        self.save_workers[key] = (self.filename, run_in_background(
+            save_mask, self.mask_file, classes, self.mask_codec,
+            on_result=functools.partial(self.on_mask_saved, key, self.filename),
+            on_error=functools.partial(self.on_save_failed, key, self.filename, classes),
+            pool=self.save_pool,
+        ))
+        # the cached copy still holds the mask as it was loaded
+        self.image_cache.pop((self.filename, self.mask_file))
+        self.edit_rect = QRect()
+        self.remember_view_state(saved=time.time())
         self.set_clean()
 
+    def on_mask_saved(self, key, filename, mask_file):
+        self.save_workers.pop(key, None)
+        # a prefetch may have read the previous mask while the save was queued
+        self.image_cache.pop((filename, mask_file))
+        if filename == self.filename:
+            self.mask_file = mask_file
+
+    def on_save_failed(self, key, filename, classes, message):
+        self.save_workers.pop(key, None)
+        print(message)
+        self.errorMessage(self.tr('Error saving mask'), self.tr('Could not save the mask of <b>%s</b>') % filename)
+
+        # the mask that failed to save is not on disk, the whole of it counts as edited again
+        if filename == self.filename:
+            self.edit_rect = self.canvas.mask_pixmap.rect()
+            self.set_dirty()
+            return
+
+        tab = self.find_tab(filename) or self.insert_tab(filename)
+        if tab.edits is not None:
+            x0, y0, edits = tab.edits
+            classes = classes.copy()
+            classes[y0:y0+edits.shape[0], x0:x0+edits.shape[1]] = edits
+        tab.edits = (0, 0, classes)
+        tab.dirty = True
+        self.memory.register(('tabs', tab.filename), tab.buffers(), 'tabs')
+        self.label_tab(tab)
+
+    def open_tab_call(self, _value=False, filename=None):
+        # the next image by default, so adjacent frames sit side by side
+        if filename is None:
+            if self.filename not in self.image_list:
+                return
+            index = self.image_list.index(self.filename) + 1
+            if index >= len(self.image_list):
+                return
+            filename = self.image_list[index]
+
+        tab = self.find_tab(filename) or self.insert_tab(filename)
+        self.tab_bar.setCurrentIndex(self.tab_index(tab))
+
+    def insert_tab(self, filename):
+        # next to the current tab, in the background
+        tab = ImageTab(filename)
+        index = self.tab_bar.insertTab(self.tab_bar.currentIndex() + 1, osp.basename(filename))
+        self.tab_bar.setTabData(index, tab)
+        self.tab_bar.setTabToolTip(index, filename)
+        self.update_tab_bar()
+        return tab
+
+    def file_list_menu(self, position):
+        item = self.file_list_widget.itemAt(position)
+        if item is None:
+            return
+        menu = QMenu(self)
+        action = menu.addAction(self.tr('Open in New Tab'))
+        action.triggered.connect(functools.partial(self.open_tab_call, filename=str(item.text())))
+        menu.exec_(self.file_list_widget.mapToGlobal(position))
+
+    def close_tab_call(self, _value=False):
+        self.close_tab(self.tab_bar.currentIndex())
+
+    def close_tab(self, index):
+        if self.tab_bar.count() <= 1:
+            return
+
+        tab = self.tab_bar.tabData(index)
+        if tab is not self.active_tab:
+            if not tab.dirty:
+                self.remove_tab(index)
+                return
+            # unsaved strokes are shown before asking about them
+            self.tab_bar.setCurrentIndex(index)
+        if not self.may_continue():
+            return
+
+        # the tab taking its place is loaded without storing this one
+        self.active_tab = None
+        self.dirty = False
+        self.remove_tab(index)
+
+    def remove_tab(self, index):
+        self.memory.release(('tabs', self.tab_bar.tabData(index).filename))
+        self.tab_bar.removeTab(index)
+        self.update_tab_bar()
+
+    def update_tab_bar(self):
+        self.tab_bar.setVisible(self.tab_bar.count() > 1)
+        self.close_tab_action.setEnabled(self.tab_bar.count() > 1)
+
+    def tab_index(self, tab):
+        for index in range(self.tab_bar.count()):
+            if self.tab_bar.tabData(index) is tab:
+                return index
+        return -1
+
+    def find_tab(self, filename):
+        for index in range(self.tab_bar.count()):
+            if self.tab_bar.tabData(index).filename == filename:
+                return self.tab_bar.tabData(index)
+        return None
+
+    def label_tab(self, tab):
+        index = self.tab_index(tab)
+        if index >= 0:
+            self.tab_bar.setTabText(index, osp.basename(tab.filename) + (' *' if tab.dirty else ''))
+            self.tab_bar.setTabToolTip(index, tab.filename)
+
+    def switch_tab(self, index):
+        tab = self.tab_bar.tabData(index)
+        if tab is None or tab is self.active_tab:
+            return
+
+        if self.active_tab is not None:
+            self.store_tab(self.active_tab)
+        # the strokes of the tab left behind stay with it, there is nothing to save before switching
+        self.dirty = False
+        self.active_tab = tab
+        self.load_file(tab.filename)
+
+    def open_tab(self, filename):
+        # the first image opens the first tab, the others replace the image of the active tab
+        if self.active_tab is None:
+            self.active_tab = ImageTab(filename)
+            self.tab_bar.blockSignals(True)
+            self.tab_bar.setTabData(self.tab_bar.addTab(''), self.active_tab)
+            self.tab_bar.blockSignals(False)
+        elif self.active_tab.filename != filename:
+            self.active_tab.filename = filename
+            self.active_tab.edits = None
+        self.label_tab(self.active_tab)
+        return self.active_tab
+
+    def store_tab(self, tab):
+        # only the edited region is kept, as class indices; the pixmaps are dropped when the canvas loads the next tab
+        tab.dirty = self.dirty
+        tab.edits = None
+        if self.dirty and self.canvas.mask_pixmap is not None:
+            rect = self.edit_rect & self.canvas.mask_pixmap.rect()
+            if rect.isEmpty():
+                rect = self.canvas.mask_pixmap.rect()
+            classes = rgb_to_classes(self.canvas.qpixmap2image(self.canvas.mask_pixmap.copy(rect)))
+            tab.edits = (rect.x(), rect.y(), classes)
+            self.memory.register(('tabs', tab.filename), tab.buffers(), 'tabs')
+        self.label_tab(tab)
+
+    def restore_tab(self, tab):
+        if tab.edits is None:
+            return
+        x0, y0, classes = tab.edits
+        tab.edits = None
+        self.memory.release(('tabs', tab.filename))
+        height, width = classes.shape
+        if y0 + height > self.image_data.height or x0 + width > self.image_data.width:
+            return
+        # stats, pyramid and comparison pick the strokes up through mask_edited, as for any other stroke
+        self.canvas.paste_mask(x0, y0, classes_to_rgb(classes))
+        self.set_dirty()
+
     def exit_call(self):
         QCoreApplication.quit()
 
@@ -762,6 +1458,8 @@ class MainWindow(QMainWindow):
         answer = QMessageBox.question(self, title, msg, QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel, QMessageBox.Save)
         
         if answer == QMessageBox.Discard:
+            # a tab switch that follows must not keep the discarded strokes
+            self.set_clean()
             return True
         elif answer == QMessageBox.Save:
             self.save_file_call()
@@ -792,11 +1490,12 @@ class MainWindow(QMainWindow):
         value = int(100 * value)
         self.zoom_widget.setValue(value)
         self.zoom_values[self.filename] = (self.zoom_mode, value)
+        self.remember_view_state(zoom_mode=self.zoom_mode, zoom_value=value)
 
     def scale_fit_window(self):
         e = 2.0  # So that no scrollbars are generated.
-        w1 = self.centralWidget().width() - e
-        h1 = self.centralWidget().height() - e
+        w1 = self.scroll_area.width() - e
+        h1 = self.scroll_area.height() - e
         a1 = w1 / h1
 
         # Calculate a new scale value based on the pixmap's aspect ratio.
@@ -806,18 +1505,26 @@ class MainWindow(QMainWindow):
         return w1 / w2 if a2 >= a1 else h1 / h2
 
     def scale_fit_width(self):
-        w = self.centralWidget().width() - 2.0
+        w = self.scroll_area.width() - 2.0
         return w / self.canvas.pixmap.width()
 
     def set_clean(self):
         self.dirty = False
         self.save_action.setEnabled(False)
         self.set_title_with_filename()
+        self.mark_tab()
 
     def set_dirty(self):
         self.dirty = True
         self.save_action.setEnabled(True)
         self.set_title_with_filename()
+        self.mark_tab()
+
+    def mark_tab(self):
+        tab = self.active_tab
+        if tab is not None and tab.dirty != self.dirty:
+            tab.dirty = self.dirty
+            self.label_tab(tab)
 
     def add_recent_file(self, filename):
         if filename in self.recent_files:
@@ -826,6 +1533,41 @@ class MainWindow(QMainWindow):
             self.recent_files.pop()
         self.recent_files.insert(0, filename)
 
+        if self.session is not None:
+            self.session.add_recent(filename)
+        self.update_recent_file_menu()
+
+    def update_recent_file_menu(self):
+        self.recent_file_menu.clear()
+        for filename in self.recent_files:
+            action = self.recent_file_menu.addAction(osp.basename(filename))
+            action.setStatusTip(filename)
+            action.triggered.connect(functools.partial(self.open_recent_file, filename))
+        self.recent_file_menu.setEnabled(bool(self.recent_files))
+
+    def open_recent_file(self, filename, _value=False):
+        if self.may_continue():
+            self.load_file(filename)
+
+    def remember_view_state(self, **fields):
+        if self.session is not None and self.filename:
+            self.session.update_image(self.filename, **fields)
+
+    def restore_view_state(self, filename):
+        # only the rows of images that are actually opened are read from the session store
+        if self.session is None or filename in self.zoom_values:
+            return
+
+        state = self.session.get_image(filename)
+        if 'zoom_value' in state:
+            self.zoom_values[filename] = (state.get('zoom_mode', self.MANUAL_ZOOM), state['zoom_value'])
+        if 'scroll_h' in state:
+            self.scroll_values[Qt.Horizontal][filename] = state['scroll_h']
+        if 'scroll_v' in state:
+            self.scroll_values[Qt.Vertical][filename] = state['scroll_v']
+        if 'brightness' in state:
+            self.brightness_contrast_values[filename] = (state['brightness'], state.get('contrast'))
+
     def import_dir_images(self, dirpath, pattern=None, load=True):
         self.open_next_action.setEnabled(True)
         self.open_prev_action.setEnabled(True)
@@ -834,17 +1576,56 @@ class MainWindow(QMainWindow):
             return
 
         self.last_opendir = dirpath
+        if self.session is not None:
+            self.session.set_setting('last_opendir', dirpath)
         self.filename = None
         self.file_list_widget.clear()
+        self.file_items = {}
         for filename in self.scan_all_images(dirpath):
             if pattern and pattern not in filename:
                 continue
             item = QListWidgetItem(filename)
             item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
             self.file_list_widget.addItem(item)
+            self.file_items[filename] = item
         self.open_next_call(load=load)
+        self.request_visible_thumbnails()
+
+    def toggle_thumbnails(self, value=True):
+        size = self.config['thumbnail_size'] // 2
+        self.file_list_widget.setIconSize(QSize(size, size) if value else QSize())
+        if not value:
+            for item in self.file_items.values():
+                item.setIcon(QIcon())
+        self.request_visible_thumbnails()
+
+    def request_visible_thumbnails(self):
+        if self.thumbnails_action.isChecked():
+            self.thumbnail_timer.start()
+
+    def load_visible_thumbnails(self):
+        # only rows on screen (plus a small margin) are decoded, so scrolling stays cheap
+        viewport = self.file_list_widget.viewport()
+        first = self.file_list_widget.indexAt(viewport.rect().topLeft()).row()
+        last = self.file_list_widget.indexAt(viewport.rect().bottomLeft()).row()
+        if first < 0:
+            return
+        if last < 0:
+            last = self.file_list_widget.count() - 1
+
+        margin = last - first + 1
+        rows = range(max(first - margin, 0), min(last + margin, self.file_list_widget.count() - 1) + 1)
+        paths = [self.file_list_widget.item(row).text() for row in rows]
+        self.thumbnail_loader.request_many([p for p in paths if self.file_items[p].icon().isNull()])
+
+    def on_thumbnail_ready(self, path, thumbnail_file):
+        item = self.file_items.get(path)
+        if item is not None and self.thumbnails_action.isChecked():
+            item.setIcon(QIcon(thumbnail_file))
 
     def scan_all_images(self, path):
+        import natsort
+
         extensions = [
             ".%s" % fmt.data().decode().lower()
             for fmt in QImageReader.supportedImageFormats()
@@ -866,6 +1647,11 @@ class MainWindow(QMainWindow):
         self.label_file = None
         self.other_data = None
         self.canvas.reset_state()
+        for key in (('current', 'image'), ('stats', 'classes'), ('compare', 'masks')):
+            self.memory.release(key)
+
+    def errorMessage(self, title, message):
+        return QMessageBox.critical(self, title, f'<p><b>{title}</b></p>{message}')
 
     def status(self, message, delay=5000):
         self.statusBar().showMessage(message, delay)
@@ -0,0 +1,48 @@
+import sys
+import json
+import argparse
+
+
+def compare(baseline, current, threshold, metric='median'):
+    rows, regressions = [], []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            rows.append((name, None, result[metric], None))
+            continue
+
+        old, new = baseline['results'][name][metric], result[metric]
+        change = (new - old) / old if old > 0 else 0.0
+        rows.append((name, old, new, change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('baseline', help='results of the reference run')
+    parser.add_argument('current', help='results of the run to check')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown, 0.10 = 10%%')
+    parser.add_argument('--metric', default='median', choices=('min', 'median', 'mean', 'max'))
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows, regressions = compare(baseline, current, args.threshold, args.metric)
+    for name, old, new, change in rows:
+        if old is None:
+            print(f'{name:<24} {"-":>12} {new * 1000:10.1f} ms   (new)')
+        else:
+            flag = '  REGRESSION' if name in regressions else ''
+            print(f'{name:<24} {old * 1000:10.1f} ms {new * 1000:10.1f} ms {change:+8.1%}{flag}')
+
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) slower than the {args.threshold:.0%} threshold')
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
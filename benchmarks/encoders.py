@@ -0,0 +1,81 @@
+import json
+import argparse
+
+import cv2
+import numpy as np
+
+from benchmarks.run import synthetic_image
+from benchmarks.timing import measure
+from utils.tile_encoders import create_tile_encoder
+
+
+DEFAULT_PNG_LEVELS = (0, 1, 3, 6, 9)
+
+
+def sample_tiles(images, patch_size, count, seed=0):
+    rng = np.random.default_rng(seed)
+    tiles = []
+    for k in range(count):
+        image = images[k % len(images)]
+        i = rng.integers(0, max(image.shape[0] - patch_size, 0) + 1)
+        j = rng.integers(0, max(image.shape[1] - patch_size, 0) + 1)
+        tiles.append(np.ascontiguousarray(image[i:i+patch_size, j:j+patch_size]))
+    return tiles
+
+
+def bench_encoder(tile_format, compression_level, tiles, repeat):
+    encoder = create_tile_encoder(tile_format, compression_level)
+    sizes = [len(encoder.encode(tile)) for tile in tiles]
+
+    def encode():
+        for tile in tiles:
+            encoder.encode(tile)
+
+    result = measure(encode, repeat=repeat, warmup=0)
+    raw_bytes = sum(tile.nbytes for tile in tiles)
+    result['mb_per_second'] = raw_bytes / result['median'] / 1e6
+    result['bytes_per_tile'] = sum(sizes) / len(tiles)
+    result['ratio'] = raw_bytes / sum(sizes)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the tile encoders on tiles sampled from real or synthetic images.')
+    parser.add_argument('images', nargs='*', help='images to sample tiles from, a synthetic 8 MP frame by default')
+    parser.add_argument('--patch-size', type=int, default=128, help='tile size in pixels')
+    parser.add_argument('--tiles', type=int, default=500, help='number of tiles encoded per repetition')
+    parser.add_argument('--png-levels', type=int, nargs='+', default=DEFAULT_PNG_LEVELS, help='PNG compression levels')
+    parser.add_argument('--repeat', type=int, default=3, help='timed repetitions per encoder')
+    parser.add_argument('--output', default=None, help='JSON file to write the results to')
+    args = parser.parse_args()
+
+    if args.images:
+        images = [cv2.imread(path, cv2.IMREAD_UNCHANGED) for path in args.images]
+        images = [image for image in images if image is not None]
+        if not images:
+            parser.error('none of the images could be read')
+    else:
+        images = [synthetic_image(8)]
+    tiles = sample_tiles(images, args.patch_size, args.tiles)
+
+    options = [('png', level) for level in args.png_levels] + [('npy', 0)]
+    # lossless WebP is 8-bit only
+    if all(tile.dtype == np.uint8 for tile in tiles):
+        options.insert(len(args.png_levels), ('webp', 0))
+
+    results = {}
+    for tile_format, level in options:
+        name = f'png-{level}' if tile_format == 'png' else tile_format
+        results[name] = bench_encoder(tile_format, level, tiles, args.repeat)
+        result = results[name]
+        print(f'{name:<8} {result["mb_per_second"]:8.1f} MB/s {result["bytes_per_tile"]:10.0f} bytes/tile '
+              f'{result["ratio"]:6.2f}x')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'patch_size': args.patch_size, 'tiles': len(tiles), 'results': results}, f, indent=2)
+        print(f'Results written to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
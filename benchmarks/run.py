@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import platform
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import cv2
+import numpy as np
+import os.path as osp
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtCore import Qt, QEvent, QPointF
+
+from benchmarks.timing import measure
+
+
+DEFAULT_SIZES = (1, 8, 40)
+
+
+def synthetic_image(megapixels, seed=0):
+    # 4:3 frame with smooth structure, so that encoders see realistic content instead of noise
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(megapixels * 1e6 / width))
+
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(max(height // 32, 2), max(width // 32, 2), 3), dtype=np.uint8)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def mouse_event(event_type, pos, buttons=Qt.LeftButton):
+    return QMouseEvent(event_type, QPointF(pos), Qt.LeftButton, buttons, Qt.NoModifier)
+
+
+class BenchmarkSession:
+    def __init__(self, window, work_dir, repeat):
+        self.window = window
+        self.work_dir = work_dir
+        self.repeat = repeat
+
+    def load_images(self, megapixels, count=3):
+        image_dir = osp.join(self.work_dir, f'{megapixels}mp')
+        os.makedirs(image_dir, exist_ok=True)
+        for k in range(count):
+            cv2.imwrite(osp.join(image_dir, f'image-{k}.png'), synthetic_image(megapixels, seed=k))
+
+        self.window.import_dir_images(image_dir)
+        return image_dir
+
+    def bench_load(self):
+        filename = self.window.image_list[0]
+
+        def load():
+            # measure a cold decode, not a hit in the decoded-image cache
+            self.window.image_cache.clear()
+            self.window.load_file(filename)
+
+        return measure(load, repeat=self.repeat)
+
+    def bench_paint(self, frames=10):
+        canvas = self.window.canvas
+
+        def paint():
+            for _ in range(frames):
+                canvas.repaint()
+
+        result = measure(paint, repeat=self.repeat)
+        result['frames'] = frames
+        return result
+
+    def bench_stroke(self, steps=50):
+        canvas = self.window.canvas
+        height, width = canvas.image.shape[:2]
+        scale = canvas.scale
+
+        def stroke():
+            start = QPointF(width * 0.25 * scale, height * 0.25 * scale)
+            canvas.mousePressEvent(mouse_event(QEvent.MouseButtonPress, start))
+            for k in range(steps):
+                t = (k + 1) / steps
+                pos = QPointF((0.25 + 0.5 * t) * width * scale, (0.25 + 0.3 * t) * height * scale)
+                canvas.mouseMoveEvent(mouse_event(QEvent.MouseMove, pos))
+                canvas.repaint()
+            canvas.mouseReleaseEvent(mouse_event(QEvent.MouseButtonRelease, pos, Qt.NoButton))
+
+        result = measure(stroke, repeat=self.repeat)
+        result['steps'] = steps
+        self.window.set_clean()
+        return result
+
+    def bench_navigation(self):
+        def navigate():
+            self.window.open_next_call()
+            self.window.open_prev_call()
+
+        return measure(navigate, repeat=self.repeat)
+
+    def bench_save(self):
+        def save():
+            # saves are queued, the mask has to be encoded and written before the call counts as done
+            self.window.save_file_call()
+            self.window.save_pool.waitForDone()
+
+        return measure(save, repeat=self.repeat)
+
+    def bench_split(self):
+        split_dir = self.window.split_dir
+
+        def split():
+            shutil.rmtree(split_dir, ignore_errors=True)
+            os.makedirs(split_dir)
+            self.window.split_images()
+
+        return measure(split, repeat=self.repeat, warmup=0)
+
+
+def run(sizes, repeat, frames, work_dir):
+    from app import MainWindow
+    from utils.config import get_default_config
+
+    # the shipped defaults, so that runs on different stations stay comparable
+    config = get_default_config(save=False)
+    config['session_file'] = osp.join(work_dir, 'session.db')
+
+    window = MainWindow(config=config)
+    window.resize(1280, 960)
+    window.show()
+
+    window.mask_dir_callback(osp.join(work_dir, 'mask'))
+    window.split_dir_callback(osp.join(work_dir, 'split'))
+
+    session = BenchmarkSession(window, work_dir, repeat)
+    results = {}
+    for megapixels in sizes:
+        session.load_images(megapixels)
+        QApplication.processEvents()
+
+        key = f'{megapixels}mp'
+        results[f'{key}/load'] = session.bench_load()
+        results[f'{key}/paint'] = session.bench_paint(frames)
+        results[f'{key}/stroke'] = session.bench_stroke()
+        results[f'{key}/save'] = session.bench_save()
+        results[f'{key}/navigation'] = session.bench_navigation()
+        results[f'{key}/split'] = session.bench_split()
+
+        for name in [n for n in results if n.startswith(key)]:
+            print(f'{name:<24} median {results[name]["median"] * 1000:10.1f} ms')
+
+    window.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the headless canvas, loading and splitting benchmarks.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES, help='image sizes in megapixels')
+    parser.add_argument('--repeat', type=int, default=5, help='timed repetitions per benchmark')
+    parser.add_argument('--frames', type=int, default=10, help='paint frames per repetition')
+    parser.add_argument('--output', default='bench_results.json', help='JSON file to write the results to')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+
+    work_dir = tempfile.mkdtemp(prefix='mask-labeling-bench-')
+    try:
+        sizes = [int(s) if float(s).is_integer() else s for s in args.sizes]
+        results = run(sizes, args.repeat, args.frames, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
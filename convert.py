@@ -1,6 +1,201 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+
 import cv2
+import numpy as np
+import os.path as osp
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from PIL import Image
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+MANIFEST_FILE = '.convert-manifest.json'
+
+# bytes per pixel of the decoded image, for the in-flight memory budget
+BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'LA': 2, 'RGB': 3, 'RGBA': 4, 'I;16': 2, 'I;16B': 2, 'I': 4, 'F': 4}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def decoded_size(path):
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            return width * height * BYTES_PER_PIXEL.get(image.mode, 4)
+    except Exception:
+        return osp.getsize(path) * 4
+
+
+def scan_images(src_dir, extensions):
+    # a generator, so that huge trees start converting before the walk is done
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(extensions):
+                yield osp.join(root, file)
+
+
+def convert_image(image, options):
+    if options['depth'] == 8 and image.dtype == np.uint16:
+        if options['scale'] == 'minmax':
+            image = cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+        else:
+            image = (image >> 8).astype(np.uint8)
+    elif options['depth'] == 16 and image.dtype == np.uint8:
+        image = image.astype(np.uint16) * 257
+
+    if options['channels'] == 'gray' and image.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        image = cv2.cvtColor(image, code)
+    elif options['channels'] == 'color':
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+
+    if options['swap_rb'] and image.ndim == 3:
+        code = cv2.COLOR_BGRA2RGBA if image.shape[2] == 4 else cv2.COLOR_BGR2RGB
+        image = cv2.cvtColor(image, code)
+    return image
+
+
+def write_atomic(path, image):
+    out_dir = osp.dirname(path)
+    os.makedirs(out_dir or '.', exist_ok=True)
+
+    fd, tmp_file = tempfile.mkstemp(suffix=osp.splitext(path)[1], dir=out_dir or '.')
+    os.close(fd)
+    try:
+        if not cv2.imwrite(tmp_file, image):
+            raise IOError(f'Failed to write {path}')
+        os.replace(tmp_file, path)
+    finally:
+        if osp.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def convert_file(src, dst, options, entry):
+    # returns (status, manifest entry, bytes read)
+    src_hash = file_hash(src)
+    nbytes = osp.getsize(src)
+    if entry is not None and entry['options'] == options:
+        if src == dst and src_hash == entry['output']:
+            return 'skipped', entry, nbytes
+        if src != dst and src_hash == entry['source'] and osp.exists(dst):
+            return 'skipped', entry, nbytes
+
+    image = cv2.imread(src, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return 'failed', None, nbytes
+
+    write_atomic(dst, convert_image(image, options))
+    return 'converted', {'options': options, 'source': src_hash, 'output': file_hash(dst)}, nbytes
+
+
+def load_manifest(dst_dir):
+    manifest_file = osp.join(dst_dir, MANIFEST_FILE)
+    if not osp.exists(manifest_file):
+        return {}
+    with open(manifest_file) as f:
+        return json.load(f)
+
+
+def save_manifest(dst_dir, manifest):
+    os.makedirs(dst_dir, exist_ok=True)
+    manifest_file = osp.join(dst_dir, MANIFEST_FILE)
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, manifest_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert the channel order and bit depth of a whole image tree.')
+    parser.add_argument('src_dir', help='directory to convert')
+    parser.add_argument('--dst-dir', default=None, help='output directory, the images are converted in place if omitted')
+    parser.add_argument('--swap-rb', action='store_true', help='swap the red and blue channels (BGR <-> RGB)')
+    parser.add_argument('--depth', type=int, choices=(8, 16), default=None, help='output bit depth')
+    parser.add_argument('--scale', choices=('shift', 'minmax'), default='shift',
+                        help='16 to 8 bit mapping: drop the low byte or stretch each image to its min/max')
+    parser.add_argument('--channels', choices=('keep', 'gray', 'color'), default='keep', help='output channels')
+    parser.add_argument('--ext', default=None, help='output extension, e.g. .png, defaults to the source extension')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--max-inflight-mb', type=float, default=1024, help='memory budget for images being converted')
+    args = parser.parse_args()
+
+    src_dir = osp.abspath(args.src_dir)
+    dst_dir = osp.abspath(args.dst_dir) if args.dst_dir else src_dir
+    if args.ext and not args.dst_dir:
+        parser.error('--ext needs --dst-dir, in-place conversion keeps the file names')
+
+    options = {'swap_rb': args.swap_rb, 'depth': args.depth, 'scale': args.scale, 'channels': args.channels}
+    budget = args.max_inflight_mb * 2 ** 20
+    manifest = load_manifest(dst_dir)
+
+    counts = {'converted': 0, 'skipped': 0, 'failed': 0}
+    total_bytes = 0
+    inflight, inflight_bytes = {}, 0
+    start = time.perf_counter()
+
+    def collect(done):
+        nonlocal inflight_bytes, total_bytes
+        for future in done:
+            relpath, estimate = inflight.pop(future)
+            inflight_bytes -= estimate
+            try:
+                status, entry, nbytes = future.result()
+            except Exception as e:
+                status, entry, nbytes = 'failed', None, 0
+                print(f'Failed to convert {relpath}: {e}', file=sys.stderr)
+            else:
+                if status == 'failed':
+                    print(f'Failed to read {relpath}', file=sys.stderr)
+            counts[status] += 1
+            total_bytes += nbytes
+            if entry is not None:
+                manifest[relpath] = entry
+
+    try:
+        with ProcessPoolExecutor(args.workers) as pool:
+            for src in scan_images(src_dir, IMAGE_EXTENSIONS):
+                relpath = osp.relpath(src, src_dir)
+                dst = osp.join(dst_dir, relpath)
+                if args.ext:
+                    dst = osp.splitext(dst)[0] + args.ext
+                    relpath = osp.relpath(dst, dst_dir)
+
+                # decoded input, converted copy and encoded output are alive at the same time
+                estimate = 3 * decoded_size(src)
+                while inflight and inflight_bytes + estimate > budget:
+                    done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                future = pool.submit(convert_file, src, dst, options, manifest.get(relpath))
+                inflight[future] = (relpath, estimate)
+                inflight_bytes += estimate
+
+            collect(list(inflight))
+    finally:
+        save_manifest(dst_dir, manifest)
+
+    elapsed = time.perf_counter() - start
+    processed = sum(counts.values())
+    print(f'{counts["converted"]} converted, {counts["skipped"]} skipped, {counts["failed"]} failed '
+          f'in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.1f} files/s, '
+          f'{total_bytes / 2 ** 20 / max(elapsed, 1e-9):.1f} MB/s)')
+
 
-filename = './samples/3.png'
-x = cv2.imread(filename)
-x = cv2.cvtColor(x, cv2.COLOR_BGR2RGB)
-cv2.imwrite(filename, x)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import argparse
+import functools
+
+import os.path as osp
+
+from multiprocessing import Pool
+
+from utils.mask_codecs import MASK_CODECS, MASK_EXTENSIONS, MASK_SUFFIX, convert_mask_file
+
+
+def scan_mask_files(mask_dir):
+    masks = []
+    for root, dirs, files in os.walk(mask_dir):
+        for file in files:
+            stem, ext = osp.splitext(file)
+            if stem.endswith(MASK_SUFFIX) and ext.lower() in MASK_EXTENSIONS:
+                masks.append(osp.join(root, file))
+    return sorted(masks)
+
+
+def convert_one(mask_file, codec, remove):
+    # a corrupt file is reported, it must not stop the other conversions
+    try:
+        return (*convert_mask_file(mask_file, codec, remove), None)
+    except Exception as e:
+        return mask_file, None, f'{type(e).__name__}: {e}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert mask files to another mask codec.')
+    parser.add_argument('mask_dir', help='directory containing the *-m.* mask files')
+    parser.add_argument('--codec', default='png1', choices=sorted(MASK_CODECS), help='target mask codec')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--remove', action='store_true', help='remove the original file when the extension changes')
+    args = parser.parse_args()
+
+    mask_files = scan_mask_files(args.mask_dir)
+    convert = functools.partial(convert_one, codec=args.codec, remove=args.remove)
+
+    start = time.perf_counter()
+    converted, failed = 0, []
+    with Pool(args.workers) as pool:
+        for mask_file, new_file, error in pool.imap_unordered(convert, mask_files, chunksize=64):
+            if new_file is None:
+                failed.append((mask_file, error or 'unreadable mask'))
+            else:
+                converted += 1
+    elapsed = time.perf_counter() - start
+
+    for mask_file, error in sorted(failed):
+        print(f'Failed to convert {mask_file}: {error}', file=sys.stderr)
+    print(f'Converted {converted} masks to {args.codec} in {elapsed:.1f}s ({len(failed)} failed)')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,40 @@
 import sys
+import argparse
+
+from utils.profiling import startup
 
 from PyQt5.QtWidgets import QApplication
-from app import MainWindow
+from PyQt5.QtCore import QTimer
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', action='store_true', help='show the performance overlay on startup')
+    parser.add_argument('--trace', default=None, help='write hot-path timings to this Chrome trace file')
+    parser.add_argument('--config', default=None, help='config file or YAML string overriding the defaults')
+    parser.add_argument('--startup-times', action='store_true', help='print a startup-time breakdown')
+    args, qt_args = parser.parse_known_args()
+    startup.mark('qt import')
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    startup.mark('qt application')
+
+    from app import MainWindow
+    from utils.config import get_config
+    startup.mark('app import')
 
-    window = MainWindow()
+    window = MainWindow(config=get_config(args.config), profile=args.profile, trace_file=args.trace)
     window.show()
+    startup.mark('show')
+
+    if args.startup_times:
+        def first_frame():
+            startup.mark('first frame')
+            print(startup.report())
+
+        QTimer.singleShot(0, first_frame)
 
     app.exec()
 
 # this main block is required to generate executable by pyinstaller
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,178 @@
+import os
+import csv
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+import os.path as osp
+
+from multiprocessing import Pool
+from PIL import Image
+
+from utils.config import get_config
+from utils.mask_codecs import MASK_EXTENSIONS, MASK_SUFFIX, create_mask_path, find_mask_file
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+STATUSES = ('ok', 'empty', 'missing_mask', 'size_mismatch', 'unreadable_image', 'unreadable_mask')
+
+
+def scan_images(image_dir, skip_dirs=()):
+    skip_dirs = {osp.abspath(d) for d in skip_dirs if d}
+    for root, dirs, files in os.walk(image_dir):
+        dirs[:] = sorted(d for d in dirs if osp.abspath(osp.join(root, d)) not in skip_dirs)
+        for file in sorted(files):
+            stem, ext = osp.splitext(file)
+            ext = ext.lower()
+            if ext not in IMAGE_EXTENSIONS or (stem.endswith(MASK_SUFFIX) and ext in MASK_EXTENSIONS):
+                continue
+            yield osp.join(root, file)
+
+
+def inspect_pair(pair):
+    image_file, mask_path = pair
+    record = {
+        'image': image_file, 'mask': '', 'status': 'ok', 'width': 0, 'height': 0, 'mask_width': 0, 'mask_height': 0,
+        'labeled_pixels': 0, 'labeled_fraction': 0.0, 'components': 0, 'class_areas': {},
+    }
+
+    try:
+        # only the header is read, the pixels are not needed
+        with Image.open(image_file) as image:
+            record['width'], record['height'] = image.size
+    except Exception:
+        record['status'] = 'unreadable_image'
+        return record
+
+    mask_file = find_mask_file(mask_path)
+    if mask_file is None:
+        record['status'] = 'missing_mask'
+        return record
+    record['mask'] = mask_file
+
+    try:
+        classes = MASK_EXTENSIONS[osp.splitext(mask_file)[1].lower()].load(mask_file)
+    except Exception:
+        classes = None
+    if classes is None:
+        record['status'] = 'unreadable_mask'
+        return record
+
+    record['mask_height'], record['mask_width'] = classes.shape
+    counts = np.bincount(classes.ravel(), minlength=2)
+    labeled = int(classes.size - counts[0])
+    record['labeled_pixels'] = labeled
+    record['labeled_fraction'] = round(labeled / max(classes.size, 1), 6)
+    record['class_areas'] = {k: int(c) for k, c in enumerate(counts.tolist()) if k > 0 and c}
+    if labeled:
+        record['components'] = cv2.connectedComponents((classes > 0).view(np.uint8), connectivity=8)[0] - 1
+
+    if classes.shape != (record['height'], record['width']):
+        record['status'] = 'size_mismatch'
+    elif not labeled:
+        record['status'] = 'empty'
+    return record
+
+
+def class_areas(record, num_classes):
+    # area per class index; classes missing from the config are counted together at index 0
+    areas = [0] * (num_classes + 1)
+    for k, area in record['class_areas'].items():
+        areas[k if k <= num_classes else 0] += area
+    return areas
+
+
+class Summary:
+    def __init__(self, class_names):
+        self.class_names = class_names
+        self.images = 0
+        self.statuses = dict.fromkeys(STATUSES, 0)
+        self.problems = {status: [] for status in STATUSES if status != 'ok'}
+        self.labeled_pixels = 0
+        self.total_pixels = 0
+        self.components = 0
+        self.class_areas = [0] * (len(class_names) + 1)
+        self.class_images = [0] * (len(class_names) + 1)
+
+    def add(self, record):
+        self.images += 1
+        self.statuses[record['status']] += 1
+        if record['status'] != 'ok':
+            self.problems[record['status']].append(record['image'])
+
+        self.labeled_pixels += record['labeled_pixels']
+        self.total_pixels += record['mask_width'] * record['mask_height']
+        self.components += record['components']
+        for k, area in enumerate(class_areas(record, len(self.class_names))):
+            if area:
+                self.class_areas[k] += area
+                self.class_images[k] += 1
+
+    def to_dict(self, elapsed):
+        names = ('<unknown>',) + tuple(self.class_names)
+        return {
+            'images': self.images,
+            'statuses': self.statuses,
+            'labeled_pixels': self.labeled_pixels,
+            'labeled_fraction': self.labeled_pixels / max(self.total_pixels, 1),
+            'components': self.components,
+            'classes': {
+                name: {'pixels': self.class_areas[k], 'images': self.class_images[k]}
+                for k, name in enumerate(names) if k > 0 or self.class_areas[0]
+            },
+            'elapsed': round(elapsed, 3),
+            'images_per_second': round(self.images / max(elapsed, 1e-9), 1),
+            'problems': self.problems,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit image/mask pairs and write a per-image QA report.')
+    parser.add_argument('image_dir', help='directory containing the images')
+    parser.add_argument('--config', default=None, help='config file or yaml string, for mask_dir, mask_codec and classes')
+    parser.add_argument('--mask-dir', default=None, help='mask directory, defaults to mask_dir from the config')
+    parser.add_argument('--output', default='qa_report', help='output prefix, writes <output>.csv and <output>.json')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--chunksize', type=int, default=256, help='image/mask pairs sent to a worker at a time')
+    args = parser.parse_args()
+
+    config = get_config(args.config)
+    mask_dir = args.mask_dir if args.mask_dir is not None else config['mask_dir']
+    class_names = config['classes']
+
+    # the same pairing as MainWindow.create_mask_path; masks and tiles inside the image tree are skipped
+    pairs = (
+        (image_file, create_mask_path(image_file, mask_dir, config['mask_codec']))
+        for image_file in scan_images(args.image_dir, skip_dirs=(mask_dir, config['split_dir']))
+    )
+
+    fields = ['image', 'mask', 'status', 'width', 'height', 'mask_width', 'mask_height',
+              'labeled_pixels', 'labeled_fraction', 'components'] + [f'area_{name}' for name in class_names] + \
+             ['area_<unknown>']
+    summary = Summary(class_names)
+
+    start = time.perf_counter()
+    with open(f'{args.output}.csv', 'w', newline='') as f, Pool(args.workers) as pool:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        for record in pool.imap_unordered(inspect_pair, pairs, chunksize=args.chunksize):
+            summary.add(record)
+            areas = class_areas(record, len(class_names))
+            writer.writerow([record[field] for field in fields[:10]] + areas[1:] + areas[:1])
+    elapsed = time.perf_counter() - start
+
+    report = summary.to_dict(elapsed)
+    with open(f'{args.output}.json', 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f'{summary.images} images in {elapsed:.1f}s ({report["images_per_second"]} images/s)')
+    for status, count in summary.statuses.items():
+        if count:
+            print(f'  {status:<18} {count}')
+    print(f'  labeled fraction   {report["labeled_fraction"]:.4%}, {summary.components} components')
+
+
+if __name__ == "__main__":
+    main()
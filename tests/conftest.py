@@ -0,0 +1,5 @@
+import sys
+import os.path as osp
+
+# the repository root holds the utils package, and has an __init__.py itself
+sys.path.insert(0, osp.dirname(osp.dirname(osp.abspath(__file__))))
@@ -0,0 +1,35 @@
+from utils.cache import LRUCache
+
+
+def test_least_recently_used_is_evicted():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert len(cache) == 2
+
+
+def test_get_default_and_pop():
+    cache = LRUCache(2)
+    assert cache.get('missing', 0) == 0
+    cache.put('a', 1)
+    assert cache.pop('a') == 1
+    assert cache.pop('a') is None
+    assert len(cache) == 0
+
+
+def test_zero_capacity_stores_nothing():
+    cache = LRUCache(0)
+    cache.put('a', 1)
+    assert 'a' not in cache
+
+
+def test_clear():
+    cache = LRUCache(3)
+    for key in 'abc':
+        cache.put(key, key)
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from utils.display import auto_window, to_display, window_rows
+
+
+def test_auto_window_of_narrow_float_image():
+    image = np.linspace(0.25, 0.75, 200 * 200, dtype=np.float32).reshape(200, 200)
+    low, high = auto_window(image)
+    assert 0.25 <= low < high <= 0.75
+
+    display = to_display(image, (low, high))
+    assert display.shape == (200, 200, 3)
+    assert display.min() == 0 and display.max() == 255
+
+
+def test_auto_window_of_flat_image():
+    low, high = auto_window(np.full((8, 8), 0.5, np.float32))
+    assert low == 0.5 and 0.5 < high < 0.5 + 1e-6
+    assert auto_window(np.full((8, 8), 7, np.int16)) == (7, 8)
+
+
+@pytest.mark.parametrize('dtype', [np.int16, np.int32, np.uint32, np.float64])
+def test_window_rows_matches_reference(dtype):
+    image = np.arange(-30000, 30000, 100).reshape(20, 30).astype(dtype) if dtype != np.uint32 else \
+        np.arange(0, 60000, 100).reshape(20, 30).astype(dtype)
+    low, high = -1000, 25000
+    reference = np.clip((image.astype(np.float64) - low) * (255.0 / (high - low)), 0, 255)
+    display = window_rows(image, low, high, rows=7)
+    assert display.dtype == np.uint8
+    # half-way values may round either way
+    assert np.abs(display - reference).max() <= 0.5 + 1e-6
+
+
+def test_int16_window_does_not_overflow():
+    image = np.array([[-32768, 0, 32767]], np.int16)
+    np.testing.assert_array_equal(to_display(image, (-32768, 32767))[..., 0], [[0, 128, 255]])
@@ -0,0 +1,95 @@
+import glob
+import os
+import os.path as osp
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.augment import RotationAugmenter
+from utils.tile_writers import create_tile_writer
+from utils.tiling import TilingPolicy, export_signature, export_tiles
+
+CLASS_NAMES = ('a', 'b')
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(0, 256, (300, 400, 3)).astype(np.uint8)
+
+
+def mask():
+    classes = np.zeros((300, 400), np.uint8)
+    classes[50:120, 60:200] = 1
+    classes[200:260, 250:380] = 2
+    return classes
+
+
+def export(image, classes, split_dir, incremental=True, augment=False, source=None):
+    writer = create_tile_writer('files', str(split_dir), 'img', labels=(*CLASS_NAMES, 'normal'),
+                                incremental=incremental)
+    augmenter = RotationAugmenter(64) if augment else None
+    counts = export_tiles(image, classes, TilingPolicy(patch_size=64, stride=48), writer, augmenter, key='img',
+                          class_names=CLASS_NAMES, source=source)
+    writer.close()
+    return counts, writer
+
+
+def listing(split_dir):
+    return sorted(osp.relpath(path, split_dir) for path in glob.glob(osp.join(str(split_dir), '*', '*.png')))
+
+
+def test_unchanged_export_writes_nothing(tmp_path, image):
+    first, _ = export(image, mask(), tmp_path)
+    mtimes = {path: os.stat(tmp_path / path).st_mtime_ns for path in listing(tmp_path)}
+
+    again, writer = export(image, mask(), tmp_path)
+    assert again == first
+    assert writer.reused == 0
+    assert {path: os.stat(tmp_path / path).st_mtime_ns for path in listing(tmp_path)} == mtimes
+
+
+@pytest.mark.parametrize('augment', [False, True])
+def test_edited_export_matches_fresh_export(tmp_path, image, augment):
+    export(image, mask(), tmp_path / 'inc', augment=augment)
+    edited = mask()
+    edited[50:120, 60:120] = 0
+    edited[150:180, 300:390] = 2
+
+    counts, _ = export(image, edited, tmp_path / 'inc', augment=augment)
+    fresh, _ = export(image, edited, tmp_path / 'fresh', incremental=False, augment=augment)
+    assert counts == fresh
+    assert listing(tmp_path / 'inc') == listing(tmp_path / 'fresh')
+    for path in listing(tmp_path / 'fresh'):
+        np.testing.assert_array_equal(cv2.imread(str(tmp_path / 'inc' / path)),
+                                      cv2.imread(str(tmp_path / 'fresh' / path)))
+
+
+def test_deleted_tiles_are_written_again(tmp_path, image):
+    export(image, mask(), tmp_path)
+    files = listing(tmp_path)
+    for path in files[:3]:
+        os.remove(tmp_path / path)
+
+    export(image, mask(), tmp_path)
+    assert listing(tmp_path) == files
+
+
+def test_settings_change_rewrites_everything(tmp_path, image):
+    export(image, mask(), tmp_path)
+    _, writer = export(image, mask(), tmp_path, augment=True)
+    assert writer.reused == 0
+    assert any(path.endswith('-090.png') for path in listing(tmp_path))
+
+
+def test_signature_uses_file_stamp(tmp_path, image):
+    source = tmp_path / 'img.png'
+    cv2.imwrite(str(source), image)
+    policy = TilingPolicy()
+    signature = export_signature(image, policy, source=str(source))
+    # the pixels are not read when the file is known
+    assert export_signature(np.zeros(1, np.uint8), policy, source=str(source)) == signature
+
+    os.utime(source, ns=(0, 0))
+    assert export_signature(image, policy, source=str(source)) != signature
+    assert export_signature(image, policy) != export_signature(image[::-1], policy)
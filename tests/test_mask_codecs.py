@@ -0,0 +1,66 @@
+import os.path as osp
+
+import numpy as np
+import pytest
+
+from utils.mask_codecs import (MASK_CODECS, RleMaskCodec, classes_to_rgb, convert_mask_file, create_mask_path,
+                               load_mask, rgb_to_classes, save_mask)
+
+
+def binary_mask():
+    classes = np.zeros((37, 53), dtype=np.uint8)
+    classes[5:20, 10:30] = 1
+    classes[0, 0] = 1
+    return classes
+
+
+def multi_class_mask():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 4, (41, 29)).astype(np.uint8)
+
+
+@pytest.mark.parametrize('codec', sorted(MASK_CODECS))
+@pytest.mark.parametrize('make_mask', [binary_mask, multi_class_mask])
+def test_round_trip(tmp_path, codec, make_mask):
+    classes = make_mask()
+    mask_file = save_mask(str(tmp_path / 'a-m.png'), classes, codec)
+    assert mask_file.endswith(MASK_CODECS[codec].extension)
+    np.testing.assert_array_equal(load_mask(mask_file), classes)
+
+
+def test_rle_starts_with_background_run():
+    classes = np.ones((2, 2), dtype=np.uint8)
+    rle = RleMaskCodec.encode(classes)
+    assert rle == {'size': [2, 2], 'counts': [0, 4]}
+    np.testing.assert_array_equal(RleMaskCodec.decode(rle), classes)
+
+
+def test_rgb_classes_round_trip():
+    classes = multi_class_mask()
+    np.testing.assert_array_equal(rgb_to_classes(classes_to_rgb(classes)), classes)
+
+
+def test_load_missing_mask(tmp_path):
+    assert load_mask(str(tmp_path / 'missing-m.png')) is None
+
+
+def test_create_mask_path_uses_codec_extension():
+    assert create_mask_path('/data/a.jpg', '/masks', 'rle') == osp.join('/masks', 'a-m.json')
+
+
+def test_convert_mask_file(tmp_path):
+    classes = multi_class_mask()
+    mask_file = save_mask(str(tmp_path / 'a-m.png'), classes, 'png')
+    old_file, new_file = convert_mask_file(mask_file, 'npz', remove=True)
+    assert old_file == mask_file and not osp.exists(mask_file)
+    np.testing.assert_array_equal(load_mask(new_file), classes)
+
+
+def test_convert_reports_corrupt_file(tmp_path):
+    from convert_masks import convert_one
+
+    mask_file = tmp_path / 'bad-m.json'
+    mask_file.write_text('{"size": [2,')
+    old_file, new_file, error = convert_one(str(mask_file), 'png1', False)
+    assert old_file == str(mask_file) and new_file is None
+    assert error.startswith('JSONDecodeError')
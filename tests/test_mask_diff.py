@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from utils.mask_diff import AGREE_EMPTY, AGREE_LABELED, ONLY_CURRENT, ONLY_REFERENCE, OTHER_CLASS, MaskDiff, diff_codes
+
+
+def masks():
+    current = np.zeros((100, 120), np.uint8)
+    reference = np.zeros((100, 120), np.uint8)
+    current[10:30, 10:30] = 1       # 400 px
+    reference[20:40, 10:30] = 1     # 400 px, 200 shared
+    return current, reference
+
+
+def test_codes():
+    current = np.array([[0, 1, 0, 1, 1]], np.uint8)
+    reference = np.array([[0, 0, 2, 1, 2]], np.uint8)
+    assert diff_codes(current, reference).tolist() == [[AGREE_EMPTY, ONLY_CURRENT, ONLY_REFERENCE, AGREE_LABELED,
+                                                        OTHER_CLASS]]
+
+
+def test_iou_and_dice():
+    diff = MaskDiff(*masks(), tile_size=16)
+    assert diff.iou == pytest.approx(200 / 600)
+    assert diff.dice == pytest.approx(400 / 800)
+    assert diff.disagreeing_pixels == 400
+
+
+def test_empty_masks_agree():
+    empty = np.zeros((10, 10), np.uint8)
+    diff = MaskDiff(empty, empty)
+    assert diff.iou == 1.0 and diff.dice == 1.0
+    assert len(diff.disagreement_tiles()) == 0
+
+
+def test_size_mismatch():
+    with pytest.raises(ValueError):
+        MaskDiff(np.zeros((10, 10), np.uint8), np.zeros((10, 11), np.uint8))
+
+
+def test_updates_match_full_recount():
+    rng = np.random.default_rng(0)
+    current = np.zeros((300, 250), np.uint8)
+    reference = (rng.random((300, 250)) > 0.99).astype(np.uint8)
+    diff = MaskDiff(current, reference, tile_size=64)
+    for _ in range(30):
+        y0, x0 = rng.integers(0, 280), rng.integers(0, 230)
+        region = rng.integers(0, 3, (rng.integers(1, 40), rng.integers(1, 40))).astype(np.uint8)
+        diff.update(x0, y0, region)
+        current[y0:y0+region.shape[0], x0:x0+region.shape[1]] = region
+
+    full = MaskDiff(current, reference, tile_size=64)
+    for name in ('intersection', 'current_area', 'reference_area', 'disagreement'):
+        np.testing.assert_array_equal(getattr(diff, name), getattr(full, name))
+    assert diff.iou == full.iou
+
+
+def test_stale_tiles_skip_empty_and_clear_erased():
+    current, reference = masks()
+    current[70:80, 70:80] = 1
+    diff = MaskDiff(current, reference, tile_size=32)
+    # only the tiles with labeled pixels are painted at first
+    assert diff.stale_tiles() == [(0, 0, 32, 32), (0, 32, 32, 64), (64, 64, 96, 96)]
+    assert diff.stale_tiles() == []
+
+    # a painted tile whose labels are erased is painted once more, to clear it
+    diff.update(70, 70, np.zeros((10, 10), np.uint8))
+    assert diff.stale_tiles() == [(64, 64, 96, 96)]
+    diff.update(70, 70, np.zeros((10, 10), np.uint8))
+    assert diff.stale_tiles() == []
+
+
+def test_disagreement_tiles_in_reading_order():
+    current, reference = masks()
+    diff = MaskDiff(current, reference, tile_size=16)
+    tiles = diff.disagreement_tiles()
+    assert list(tiles) == sorted(tiles)
+    x0, y0, x1, y1 = diff.tile_rect(tiles[0])
+    assert (x0, y0) == (0, 0) and (x1 - x0, y1 - y0) == (16, 16)
@@ -0,0 +1,66 @@
+import numpy as np
+
+from utils.cache import LRUCache
+from utils.memory import MemoryBudget, array_buffers
+
+
+def test_array_buffers_count_views_once():
+    base = np.zeros(1000, np.uint8)
+    buffers = array_buffers(base, base[:10], [base[5:], None])
+    assert buffers == [(id(base), 1000)] * 3
+
+
+def test_shared_buffers_are_counted_once():
+    memory = MemoryBudget()
+    data = np.zeros(1000, np.uint8)
+    memory.register('a', array_buffers(data), 'images')
+    memory.register('b', array_buffers(data[:10]), 'canvas')
+    assert memory.total() == 1000
+    assert memory.usage() == {'images': 1000}
+
+    memory.release('a')
+    assert memory.usage() == {'canvas': 1000}
+
+
+def test_least_recently_used_is_evicted():
+    memory = MemoryBudget(2500)
+    evicted = []
+    arrays = {key: np.zeros(1000, np.uint8) for key in 'abc'}
+    for key in 'ab':
+        memory.register(key, array_buffers(arrays[key]), 'images', evict=lambda key=key: evicted.append(key))
+    memory.touch('a')
+    memory.register('c', array_buffers(arrays['c']), 'images', evict=lambda: evicted.append('c'))
+    assert evicted == ['b']
+    assert memory.total() == 2000
+
+
+def test_entries_without_evict_are_kept():
+    memory = MemoryBudget(1500)
+    evicted = []
+    current, other = np.zeros(1000, np.uint8), np.zeros(1000, np.uint8)
+    memory.register('current', array_buffers(current), 'images')
+    memory.register('other', array_buffers(other), 'images', evict=lambda: evicted.append(1))
+    # the entry being registered is never the one evicted
+    assert evicted == [] and memory.over_budget
+
+
+def test_listeners_are_notified():
+    memory = MemoryBudget()
+    calls = []
+    memory.add_listener(lambda: calls.append(1))
+    memory.register('a', [], 'images')
+    memory.release('a')
+    memory.release('a')
+    assert len(calls) == 2
+
+
+def test_cache_entries_are_evicted_by_the_budget():
+    memory = MemoryBudget(2500)
+    cache = LRUCache(10, memory=memory, category='images', buffers=array_buffers)
+    for key in 'abc':
+        cache.put(key, np.zeros(1000, np.uint8))
+    assert 'a' not in cache and len(cache) == 2
+    assert memory.usage() == {'images': 2000}
+
+    cache.pop('b')
+    assert memory.total() == 1000
@@ -0,0 +1,23 @@
+from qa_report import Summary, class_areas
+
+
+def record(areas):
+    return {
+        'image': 'a.png', 'status': 'ok', 'mask_width': 10, 'mask_height': 10,
+        'labeled_pixels': sum(areas.values()), 'components': len(areas), 'class_areas': areas,
+    }
+
+
+def test_unknown_classes_count_once_per_image():
+    summary = Summary(['scratch', 'dent'])
+    summary.add(record({1: 4, 5: 3, 6: 2}))
+    summary.add(record({6: 1}))
+    classes = summary.to_dict(1.0)['classes']
+    assert classes['<unknown>'] == {'pixels': 6, 'images': 2}
+    assert classes['scratch'] == {'pixels': 4, 'images': 1}
+    assert classes['dent'] == {'pixels': 0, 'images': 0}
+
+
+def test_class_areas():
+    assert class_areas(record({2: 5, 3: 1, 9: 2}), 2) == [3, 0, 5]
+    assert 'unknown' not in str(Summary(['scratch']).to_dict(1.0)['classes'])
@@ -0,0 +1,37 @@
+import numpy as np
+
+from utils.stats import LabelStats
+
+
+def make_stats():
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (40, 60, 3)).astype(np.uint8)
+    classes = rng.integers(0, 3, (40, 60)).astype(np.uint8)
+    return LabelStats(image, classes)
+
+
+def test_counts_and_histogram():
+    stats = make_stats()
+    assert stats.histogram.sum() == 40 * 60
+    np.testing.assert_array_equal(stats.counts[:3], np.bincount(stats.classes.ravel(), minlength=3))
+    assert stats.labeled == int((stats.classes > 0).sum())
+    assert stats.labeled_fraction == stats.labeled / (40 * 60)
+
+
+def test_update_matches_recount():
+    stats = make_stats()
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        y0, x0 = rng.integers(0, 30), rng.integers(0, 50)
+        region = rng.integers(0, 4, (rng.integers(1, 10), rng.integers(1, 10))).astype(np.uint8)
+        stats.update(x0, y0, region)
+    np.testing.assert_array_equal(stats.counts, np.bincount(stats.classes.ravel(), minlength=256))
+
+
+def test_copy_is_independent():
+    stats = make_stats()
+    counts = stats.counts.copy()
+    working = stats.copy()
+    working.update(0, 0, np.full((5, 5), 2, np.uint8))
+    np.testing.assert_array_equal(stats.counts, counts)
+    assert working.histogram is stats.histogram
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from utils.superpixels import SuperpixelIndex, compute_superpixels, load_superpixels
+
+
+def grid_labels():
+    # 4 square superpixels of 10x10
+    labels = np.zeros((20, 20), np.int32)
+    labels[:10, 10:] = 1
+    labels[10:, :10] = 2
+    labels[10:, 10:] = 3
+    return labels
+
+
+def test_bboxes():
+    index = SuperpixelIndex(grid_labels())
+    assert index.bboxes.tolist() == [[0, 10, 0, 10], [0, 10, 10, 20], [10, 20, 0, 10], [10, 20, 10, 20]]
+
+
+def test_labels_under_stroke():
+    index = SuperpixelIndex(grid_labels())
+    assert index.labels_under_stroke((2, 2), (5, 2), 1).tolist() == [0]
+    assert index.labels_under_stroke((2, 2), (15, 2), 1).tolist() == [0, 1]
+    assert len(index.labels_under_stroke((-50, -50), (-40, -40), 1)) == 0
+
+
+def test_select_covers_the_hit_superpixels():
+    index = SuperpixelIndex(grid_labels())
+    (y0, x0), selection = index.select(np.array([1, 3]))
+    assert (y0, x0) == (0, 10) and selection.shape == (20, 10)
+    assert selection.all()
+
+    (y0, x0), selection = index.select(np.array([0, 3]))
+    assert (y0, x0) == (0, 0) and selection.sum() == 200
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        compute_superpixels(np.zeros((8, 8, 3), np.uint8), method='watershed')
+
+
+def test_superpixels_are_cached(tmp_path):
+    pytest.importorskip('skimage')
+    image = np.random.default_rng(0).integers(0, 256, (40, 50, 3)).astype(np.uint8)
+    mask_path = str(tmp_path / 'a-m.png')
+    first = load_superpixels(image, mask_path, n_segments=20)
+    cached = load_superpixels(image, mask_path, n_segments=20)
+    np.testing.assert_array_equal(first.labels, cached.labels)
+    np.testing.assert_array_equal(first.bboxes, cached.bboxes)
@@ -0,0 +1,110 @@
+import os
+import os.path as osp
+
+import numpy as np
+import pytest
+
+from utils.tile_index import TileIndex, exact_hash, open_index, perceptual_hash
+from utils.tile_writers import FileTileWriter
+
+
+def patch(seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (32, 32, 3)).astype(np.uint8)
+
+
+def test_exact_hash_depends_on_shape_and_dtype():
+    data = np.zeros(16, np.uint8)
+    assert exact_hash(data) == exact_hash(data.copy())
+    assert exact_hash(data) != exact_hash(data.reshape(4, 4))
+    assert exact_hash(data) != exact_hash(data.astype(np.uint16)[:8])
+
+
+def test_perceptual_hash_ignores_small_noise():
+    base = np.tile(np.arange(0, 256, 8, dtype=np.uint8), (32, 1))
+    noisy = np.clip(base.astype(int) + np.random.default_rng(0).integers(-1, 2, base.shape), 0, 255).astype(np.uint8)
+    assert perceptual_hash(base) == perceptual_hash(noisy)
+    assert perceptual_hash(base) != perceptual_hash(base[:, ::-1])
+
+
+def test_unknown_hash_method(tmp_path):
+    with pytest.raises(ValueError):
+        TileIndex(open_index(str(tmp_path)), 'md5')
+
+
+def test_find_returns_existing_file(tmp_path):
+    index = TileIndex(open_index(str(tmp_path)))
+    key, existing = index.find(patch(), 'normal')
+    assert existing is None
+
+    path = tmp_path / 'a.png'
+    path.write_bytes(b'')
+    index.add(key, 'normal', str(path))
+    assert index.find(patch(), 'normal') == (key, str(path))
+    assert index.find(patch(), 'defect')[1] is None
+
+    # an indexed file that was deleted is not a duplicate anymore
+    os.remove(path)
+    assert index.find(patch(), 'normal')[1] is None
+
+
+def write_tiles(split_dir, dedup):
+    writer = FileTileWriter(str(split_dir), 'img', dedup=dedup)
+    writer.write(patch(0), 'normal', 10, 10)
+    writer.write(patch(0), 'normal', 10, 50)
+    writer.write(patch(1), 'normal', 50, 10)
+    writer.close()
+    return writer
+
+
+def test_dedup_skip(tmp_path):
+    writer = write_tiles(tmp_path, 'skip')
+    assert writer.duplicates == 1
+    assert sorted(os.listdir(tmp_path / 'normal')) == ['img-0010-0010-000.png', 'img-0050-0010-000.png']
+
+
+def test_dedup_link(tmp_path):
+    writer = write_tiles(tmp_path, 'link')
+    assert writer.duplicates == 1
+    first, second = (str(tmp_path / 'normal' / f'img-0010-{x:04d}-000.png') for x in (10, 50))
+    assert osp.samefile(first, second)
+
+
+def test_dedup_across_exports(tmp_path):
+    write_tiles(tmp_path, 'skip')
+    # the same tiles again are found under their own names, nothing is counted twice
+    assert write_tiles(tmp_path, 'skip').duplicates == 1
+
+
+def test_dedup_relabel(tmp_path):
+    write_tiles(tmp_path, 'skip')
+    # the same pixels under another label are written there, and the old label file is removed
+    writer = FileTileWriter(str(tmp_path), 'img', dedup='skip')
+    writer.write(patch(0), 'defect', 10, 10)
+    writer.close()
+    assert writer.duplicates == 0
+    assert os.listdir(tmp_path / 'defect') == ['img-0010-0010-000.png']
+    assert sorted(os.listdir(tmp_path / 'normal')) == ['img-0050-0010-000.png']
+
+
+@pytest.mark.parametrize('dedup', ['skip', 'link'])
+def test_dedup_across_images_and_labels(tmp_path, dedup):
+    first = FileTileWriter(str(tmp_path), 'a', dedup=dedup)
+    first.write(patch(0), 'normal', 10, 10)
+    first.close()
+
+    second = FileTileWriter(str(tmp_path), 'b', dedup=dedup)
+    second.write(patch(0), 'defect', 10, 10)
+    second.write(patch(0), 'normal', 50, 50)
+    second.close()
+    assert second.duplicates == 1
+    assert os.listdir(tmp_path / 'defect') == ['b-0010-0010-000.png']
+    assert not osp.samefile(tmp_path / 'defect' / 'b-0010-0010-000.png', tmp_path / 'normal' / 'a-0010-0010-000.png')
+
+
+def test_old_index_is_rebuilt(tmp_path):
+    connection = open_index(str(tmp_path))
+    connection.execute('DROP TABLE tiles')
+    connection.execute('CREATE TABLE tiles (hash TEXT PRIMARY KEY, path TEXT)')
+    connection.commit()
+    connection.close()
+    assert write_tiles(tmp_path, 'skip').duplicates == 1
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from utils.tiling import TilingPolicy, extract_tile, plan_tiles, tile_class, tile_origins
+
+
+def test_unknown_border_mode():
+    with pytest.raises(ValueError):
+        TilingPolicy(border='wrap')
+
+
+@pytest.mark.parametrize('border, expected', [
+    ('pad', [0, 48, 96, 144, 192]),
+    ('keep', [0, 48, 96, 144, 192]),
+    ('drop', [0, 48]),
+    ('shift', [0, 48, 72]),
+])
+def test_tile_origins(border, expected):
+    assert tile_origins(200, 128, 48, border).tolist() == expected
+
+
+def test_tile_origins_smaller_than_patch():
+    assert tile_origins(100, 128, 48, 'shift').tolist() == [0]
+    assert tile_origins(100, 128, 48, 'drop').tolist() == []
+
+
+@pytest.mark.parametrize('border', ['pad', 'shift', 'drop'])
+def test_extracted_tiles_have_patch_size(border):
+    image = np.arange(200 * 150 * 3, dtype=np.uint32).reshape(200, 150, 3).astype(np.uint8)
+    policy = TilingPolicy(patch_size=64, stride=48, border=border)
+    plan = plan_tiles(np.zeros((200, 150), np.uint8), policy)
+    for origin in plan.origins:
+        assert extract_tile(image, origin, policy).shape == (64, 64, 3)
+
+
+def test_keep_border_keeps_partial_tiles():
+    policy = TilingPolicy(patch_size=64, stride=48, border='keep')
+    image = np.zeros((100, 100), np.uint8)
+    plan = plan_tiles(image, policy)
+    last = plan.origins.tolist().index([96, 96])
+    assert plan.sizes[last].tolist() == [4, 4]
+    assert extract_tile(image, plan.origins[last], policy).shape == (4, 4)
+
+
+def test_pad_fills_with_zeros():
+    image = np.full((100, 100), 7, np.uint8)
+    patch = extract_tile(image, (96, 0), TilingPolicy(patch_size=64, border='pad'))
+    assert patch[:4].min() == 7 and patch[4:].max() == 0
+
+
+def test_plan_labels_and_fractions():
+    classes = np.zeros((128, 256), np.uint8)
+    classes[:64, :64] = 1
+    plan = plan_tiles(classes, TilingPolicy(patch_size=128, stride=128, border='drop'))
+    assert plan.labels.tolist() == ['defect', 'normal']
+    assert plan.defect_fractions.tolist() == [0.25, 0.0]
+    assert plan.counts() == {'defect': 1, 'normal': 1}
+
+
+def test_min_defect_fraction_drops_sparse_tiles():
+    classes = np.zeros((128, 128), np.uint8)
+    classes[0, 0] = 1
+    plan = plan_tiles(classes, TilingPolicy(patch_size=128, stride=128, min_defect_fraction=0.01))
+    assert not plan.keep.any()
+
+
+def test_normal_selection_is_reproducible():
+    classes = np.zeros((512, 512), np.uint8)
+    policy = TilingPolicy(patch_size=64, stride=32, normal_ratio=0.5, seed=3)
+    first = plan_tiles(classes, policy, key='a').keep
+    np.testing.assert_array_equal(first, plan_tiles(classes, policy, key='a').keep)
+    assert 0 < first.sum() < len(first)
+
+
+def test_tile_class_majority():
+    classes = np.zeros((10, 10), np.uint8)
+    classes[:2] = 1
+    classes[5:] = 2
+    assert tile_class(classes, 0, 0, 10, 10, ('a', 'b')) == 'b'
@@ -0,0 +1,83 @@
+import math
+
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+class RotationAugmenter:
+    def __init__(self, patch_size, defect_step=15, normal_step=60, workers=None, chunk_size=64):
+        self.patch_size = patch_size
+        self.half_patch_size = patch_size // 2
+        self.radius = int(math.ceil(patch_size / math.sqrt(2))) + 1
+        self.steps = {'defect': defect_step, 'normal': normal_step}
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.rot90_codes = ((90, cv2.ROTATE_90_CLOCKWISE), (180, cv2.ROTATE_180), (270, cv2.ROTATE_90_COUNTERCLOCKWISE))
+
+        # the rotation window always has the same size, so one matrix per angle is enough
+        r = self.radius
+        self.matrices = {
+            step: [(k, cv2.getRotationMatrix2D((r, r), k, 1.0)) for k in range(step, 360, step)]
+            for step in set(self.steps.values())
+        }
+
+    def _crop(self, warped):
+        r, h = self.radius, self.half_patch_size
+        return warped[r-h:r-h+self.patch_size, r-h:r-h+self.patch_size]
+
+    def _label(self, mask_patch, policy):
+        defect_fraction = mask_patch.mean()
+        if defect_fraction == 0:
+            return 'normal', 0.0
+        if defect_fraction >= policy.min_defect_fraction:
+            return 'defect', defect_fraction
+        return None, defect_fraction
+
+    def _augment_tile(self, stacked, origin, label, policy):
+        height, width = stacked.shape[:2]
+        r = self.radius
+        cy, cx = origin[0] + self.half_patch_size, origin[1] + self.half_patch_size
+
+        results = []
+        if r <= cy < height - r and r <= cx < width - r:
+            window = stacked[cy-r:cy+r, cx-r:cx+r]
+            for angle, matrix in self.matrices[self.steps[label]]:
+                # image and mask are warped in a single pass as one multi-channel array
+                warped = self._crop(cv2.warpAffine(window, matrix, (2 * r, 2 * r)))
+                results.append((angle, warped[:, :, :-1], warped[:, :, -1] >= 128))
+        else:
+            i, j = origin
+            tile = stacked[i:i+self.patch_size, j:j+self.patch_size]
+            if tile.shape[:2] != (self.patch_size, self.patch_size):
+                return []
+            for angle, code in self.rot90_codes:
+                rotated = cv2.rotate(np.ascontiguousarray(tile), code)
+                results.append((angle, rotated[:, :, :-1], rotated[:, :, -1] >= 128))
+
+        augmented = []
+        for angle, patch, mask_patch in results:
+            new_label, defect_fraction = self._label(mask_patch, policy)
+            if new_label is not None:
+                augmented.append((angle, np.ascontiguousarray(patch), new_label, defect_fraction))
+        return augmented
+
+    def _augment_chunk(self, stacked, origins, labels, policy):
+        return [self._augment_tile(stacked, origin, label, policy) for origin, label in zip(origins, labels)]
+
+    def augment(self, image, labeled, origins, labels, policy):
+        # yields, in tile order, the list of (angle, patch, label, defect_fraction) of every tile
+        channels = image if image.ndim == 3 else image[:, :, None]
+        stacked = np.dstack([channels, labeled.astype(image.dtype) * 255])
+
+        chunks = [
+            (origins[k:k+self.chunk_size], labels[k:k+self.chunk_size])
+            for k in range(0, len(origins), self.chunk_size)
+        ]
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = [pool.submit(self._augment_chunk, stacked, o, l, policy) for o, l in chunks]
+            for future in futures:
+                yield from future.result()
@@ -0,0 +1,67 @@
+import functools
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    # with a memory budget, every item is registered as an evictable entry sized by buffers(value)
+    def __init__(self, capacity, memory=None, category='cache', buffers=None):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory = memory
+        self.category = category
+        self.buffers = buffers
+
+    def memory_key(self, key):
+        return (self.category, key)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                return default
+            self.items.move_to_end(key)
+            value = self.items[key]
+        if self.memory is not None:
+            self.memory.touch(self.memory_key(key))
+        return value
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        evicted = []
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.capacity:
+                evicted.append(self.items.popitem(last=False)[0])
+
+        if self.memory is not None:
+            for old_key in evicted:
+                self.memory.release(self.memory_key(old_key))
+            # registered outside the lock, the budget may call back into pop
+            self.memory.register(self.memory_key(key), self.buffers(value), self.category,
+                                 evict=functools.partial(self.pop, key))
+
+    def pop(self, key, default=None):
+        with self.lock:
+            value = self.items.pop(key, default)
+        if self.memory is not None:
+            self.memory.release(self.memory_key(key))
+        return value
+
+    def clear(self):
+        with self.lock:
+            keys = list(self.items)
+            self.items.clear()
+        if self.memory is not None:
+            for key in keys:
+                self.memory.release(self.memory_key(key))
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.items
+
+    def __len__(self):
+        return len(self.items)
@@ -1,14 +1,58 @@
+import copy
 import yaml
 import shutil
+import functools
 
 import os.path as osp
 
 
+CONFIG_SCHEMA = {
+    'brush_size': (int, lambda v: 1 <= v <= 20),
+    'superpixel_method': (str, lambda v: v in ('slic', 'felzenszwalb')),
+    'mask_dir': (str, None),
+    'mask_codec': (str, lambda v: v in ('png', 'png1', 'rle', 'npz')),
+    'classes': (list, lambda v: 1 <= len(v) <= 254 and len(set(v)) == len(v)
+                and all(isinstance(n, str) and n and n != 'normal' for n in v)),
+    'split_dir': (str, None),
+    'max_recent_files': (int, lambda v: v >= 0),
+    'session_file': (str, None),
+    'thumbnail_dir': (str, None),
+    'thumbnail_size': (int, lambda v: 32 <= v <= 1024),
+    'split': (dict, None),
+    'stride': (int, lambda v: 1 <= v <= 100),
+    'patch_size': (int, lambda v: 50 <= v <= 256),
+    'min_defect_fraction': ((int, float), lambda v: 0.0 <= v <= 1.0),
+    'normal_ratio': ((int, float), lambda v: 0.0 <= v <= 1.0),
+    'border': (str, lambda v: v in ('pad', 'shift', 'drop', 'keep')),
+    'seed': (int, lambda v: v >= 0),
+    'output_mode': (str, lambda v: v in ('files', 'shards')),
+    'file_format': (str, lambda v: v in ('png', 'webp', 'npy')),
+    'shard_format': (str, lambda v: v in ('png', 'webp', 'npy')),
+    'augment': (bool, None),
+    'dedup': (str, lambda v: v in ('none', 'skip', 'link')),
+    'dedup_hash': (str, lambda v: v in ('exact', 'perceptual')),
+    'incremental': (bool, None),
+    'performance': (dict, None),
+    'image_cache_size': (int, lambda v: v >= 0),
+    'memory_budget_mb': (int, lambda v: v >= 0),
+    'prefetch_depth': (int, lambda v: v >= 0),
+    'workers': (int, lambda v: v >= 0),
+    'compression_level': (int, lambda v: 0 <= v <= 9),
+    'render_quality': (str, lambda v: v in ('high', 'fast')),
+    'render_backend': (str, lambda v: v in ('qpainter', 'opengl')),
+}
+
+USER_CONFIG_FILE = osp.join(osp.expanduser('~'), '.masklabelingrc')
+
+
 def update_dict(target_dict, new_dict, validate_item=None):
     for key, value in new_dict.items():
         if validate_item:
             validate_item(key, value)
-        
+
+        if key not in target_dict:
+            raise ValueError(f'Unexpected config key: {key}')
+
         if isinstance(target_dict[key], dict) and isinstance(value, dict):
             update_dict(target_dict[key], value, validate_item=validate_item)
         else:
@@ -16,21 +60,38 @@ def update_dict(target_dict, new_dict, validate_item=None):
 
 
 def validate_item(key, value):
-    pass
+    if key not in CONFIG_SCHEMA:
+        raise ValueError(f'Unexpected config key: {key}')
+
+    expected_type, check = CONFIG_SCHEMA[key]
+    # bool is a subclass of int, but a flag is never a valid number here
+    if not isinstance(value, expected_type) or (isinstance(value, bool) and expected_type is not bool):
+        raise ValueError(f'Invalid type for config key {key}: {value!r}')
+    if check is not None and not check(value):
+        raise ValueError(f'Invalid value for config key {key}: {value!r}')
 
 
-def get_default_config():
-    config_file = osp.join(osp.abspath(__file__), "default_config.yaml")
+@functools.lru_cache(maxsize=None)
+def _load_yaml_file(config_file, mtime):
     with open(config_file) as f:
-        config = yaml.safe_load(f)
+        return yaml.safe_load(f) or {}
+
 
-    # save default config to ~/.labelmerc
-    user_config_file = osp.join(osp.abspath(__file__), "user_config.yaml")
-    if not osp.exists(user_config_file):
+def load_yaml_file(config_file):
+    # parsed once per file version, callers get their own copy
+    return copy.deepcopy(_load_yaml_file(config_file, osp.getmtime(config_file)))
+
+
+def get_default_config(save=True):
+    config_file = osp.join(osp.dirname(osp.abspath(__file__)), "default_config.yaml")
+    config = load_yaml_file(config_file)
+
+    # save default config to ~/.masklabelingrc
+    if save and not osp.exists(USER_CONFIG_FILE):
         try:
-            shutil.copy(config_file, user_config_file)
+            shutil.copy(config_file, USER_CONFIG_FILE)
         except Exception:
-            print("Failed to save config: {}".format(user_config_file))
+            print("Failed to save config: {}".format(USER_CONFIG_FILE))
 
     return config
 
@@ -39,17 +100,24 @@ def get_config(config_file_or_yaml=None, config_from_args=None):
     # 1. default config
     config = get_default_config()
 
-    # 2. specified as file or yaml
+    # 2. user config
+    if osp.exists(USER_CONFIG_FILE):
+        try:
+            update_dict(config, load_yaml_file(USER_CONFIG_FILE), validate_item=validate_item)
+        except (ValueError, yaml.YAMLError) as e:
+            print("Ignoring invalid user config {}: {}".format(USER_CONFIG_FILE, e))
+            config = get_default_config()
+
+    # 3. specified as file or yaml
     if config_file_or_yaml is not None:
         config_from_yaml = yaml.safe_load(config_file_or_yaml)
         if not isinstance(config_from_yaml, dict):
-            with open(config_from_yaml) as f:
-                config_from_yaml = yaml.safe_load(f)
-        
+            config_from_yaml = load_yaml_file(config_from_yaml)
+
         update_dict(config, config_from_yaml, validate_item=validate_item)
 
-    # 3. command line argument or specified config file
+    # 4. command line argument or specified config file
     if config_from_args is not None:
         update_dict(config, config_from_args, validate_item=validate_item)
 
-    return config
\ No newline at end of file
+    return config
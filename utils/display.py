@@ -0,0 +1,94 @@
+import functools
+
+from utils.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+def read_image(image_path):
+    # native bit depth, alpha dropped, color images in RGB order
+    image = cv2.imread(image_path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_ANYCOLOR)
+    if image is not None and image.ndim == 3:
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    return image
+
+
+@functools.lru_cache(maxsize=16)
+def window_lut(low, high, levels):
+    values = np.arange(levels, dtype=np.float32)
+    lut = np.clip((values - low) * (255.0 / max(high - low, 1)), 0, 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def min_window_width(dtype, low, high):
+    # one step for integer images; float images can be narrower than one unit
+    if np.issubdtype(dtype, np.integer):
+        return 1
+    return np.finfo(np.float32).eps * max(abs(low), abs(high), 1.0)
+
+
+def auto_window(image, saturation=0.005):
+    if image.dtype == np.uint8:
+        return None
+
+    # every 4th row and column is plenty for the percentiles, and avoids a full-size copy
+    sample = image[::4, ::4].ravel()
+    if image.dtype == np.uint16:
+        cdf = np.cumsum(np.bincount(sample, minlength=1 << 16))
+        low = int(np.searchsorted(cdf, cdf[-1] * saturation))
+        high = int(np.searchsorted(cdf, cdf[-1] * (1 - saturation)))
+    else:
+        low, high = (float(v) for v in np.percentile(sample, (100 * saturation, 100 * (1 - saturation))))
+    return low, max(high, low + min_window_width(image.dtype, low, high))
+
+
+def to_display(image, window=None):
+    # 8-bit RGB for the canvas; 8-bit color images are shown as they are, without a copy
+    if window is None and image.dtype == np.uint8:
+        display = image
+    elif image.dtype in (np.uint8, np.uint16):
+        low, high = window if window is not None else (0, 255)
+        display = np.take(window_lut(low, high, np.iinfo(image.dtype).max + 1), image)
+    else:
+        display = window_rows(image, *window)
+
+    if display.ndim == 2:
+        display = cv2.cvtColor(display, cv2.COLOR_GRAY2RGB)
+    return display
+
+
+def window_rows(image, low, high, rows=256):
+    # saturating (image - low) * scale straight into the uint8 output, a band of rows at a time; only dtypes OpenCV
+    # does not handle (uint32, uint64) go through a float32 copy of one band
+    scale = 255.0 / max(high - low, min_window_width(image.dtype, low, high))
+    display = np.empty(image.shape, np.uint8)
+    for y in range(0, image.shape[0], rows):
+        band = image[y:y + rows]
+        if band.dtype in (np.uint32, np.uint64):
+            band = band.astype(np.float32)
+        cv2.addWeighted(band, scale, band, 0, -low * scale, dst=display[y:y + rows], dtype=cv2.CV_8U)
+    return display
+
+
+def build_pyramid(image, min_size=512):
+    # levels 1..n, each half the size of the previous one; level k pixel (y, x) covers the
+    # 2^k x 2^k block at (y << k, x << k), so edits can be propagated block by block
+    levels = []
+    while max(image.shape[:2]) >= 2 * min_size:
+        height, width = image.shape[0] // 2, image.shape[1] // 2
+        image = cv2.resize(image[:2 * height, :2 * width], (width, height), interpolation=cv2.INTER_AREA)
+        levels.append(image)
+    return levels
+
+
+def update_pyramid(levels, region, x0, y0, x1, y1):
+    # region is the level 0 area [y0, y1) x [x0, x1); every bound must be a multiple of 2^len(levels)
+    # or the image border
+    for level in levels:
+        x0, y0, x1, y1 = x0 // 2, y0 // 2, x1 // 2, y1 // 2
+        if x1 <= x0 or y1 <= y0:
+            return
+        region = cv2.resize(region[:2 * (y1 - y0), :2 * (x1 - x0)], (x1 - x0, y1 - y0), interpolation=cv2.INTER_AREA)
+        level[y0:y1, x0:x1] = region
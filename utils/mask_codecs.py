@@ -0,0 +1,211 @@
+import os
+import json
+import functools
+
+import os.path as osp
+
+from utils.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+MASK_SUFFIX = '-m'
+
+
+MAX_CLASSES = 254
+
+# channel 0 of every color identifies the class, so legacy green masks (channel 0 == 0) decode to class 1
+CLASS_COLORS = (
+    (0, 255, 0), (230, 25, 75), (60, 120, 216), (245, 130, 48), (145, 30, 180),
+    (70, 240, 240), (240, 50, 230), (210, 245, 60), (128, 128, 0), (250, 190, 212),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def class_palette():
+    # (256, 3) RGB colors indexed by class, class 0 is the white background
+    palette = np.full((256, 3), 255, dtype=np.uint8)
+    palette[1:len(CLASS_COLORS) + 1] = CLASS_COLORS
+
+    unused = sorted(set(range(255)) - {color[0] for color in CLASS_COLORS})
+    for k in range(len(CLASS_COLORS) + 1, MAX_CLASSES + 1):
+        palette[k] = (unused[k - len(CLASS_COLORS) - 1], (k * 97) % 256, (k * 181) % 256)
+    palette.flags.writeable = False
+    return palette
+
+
+@functools.lru_cache(maxsize=None)
+def class_lut():
+    # channel 0 value -> class index, unknown colors are background
+    lut = np.zeros(256, dtype=np.uint8)
+    lut[class_palette()[1:MAX_CLASSES + 1, 0]] = np.arange(1, MAX_CLASSES + 1)
+    lut.flags.writeable = False
+    return lut
+
+
+@functools.lru_cache(maxsize=None)
+def gray_luts():
+    # gray masks: 255 is background and 0 is class 1, as in the bilevel format; other classes keep their index
+    encode = np.arange(256, dtype=np.uint8)
+    encode[0], encode[1] = 255, 0
+    decode = np.arange(256, dtype=np.uint8)
+    decode[255], decode[0] = 0, 1
+    return encode, decode
+
+
+def rgb_to_classes(mask):
+    return np.take(class_lut(), mask[:, :, 0])
+
+
+def classes_to_rgb(classes):
+    return np.take(class_palette(), classes, axis=0)
+
+
+def write_png(path, image, params=()):
+    # cv2 reports a failed write by returning False
+    if not cv2.imwrite(path, image, list(params)):
+        raise OSError(f'Could not write {path}')
+
+
+class PngMaskCodec:
+    name = 'png'
+    extension = '.png'
+
+    def save(self, path, classes):
+        write_png(path, cv2.cvtColor(classes_to_rgb(classes), cv2.COLOR_RGB2BGR))
+
+    def load(self, path):
+        mask = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if mask is None:
+            return None
+        if mask.ndim == 2:
+            return np.take(gray_luts()[1], mask)
+        # channel 0 of the RGB mask is the last channel of the BGR(A) image
+        return np.take(class_lut(), mask[:, :, 2])
+
+
+class BilevelPngMaskCodec(PngMaskCodec):
+    name = 'png1'
+
+    def save(self, path, classes):
+        if classes.max(initial=0) <= 1:
+            # labeled pixels are black, so legacy readers checking channel 0 == 0 still work
+            gray = np.where(classes, 0, 255).astype(np.uint8)
+            write_png(path, gray, [cv2.IMWRITE_PNG_BILEVEL, 1, cv2.IMWRITE_PNG_COMPRESSION, 9])
+        else:
+            write_png(path, np.take(gray_luts()[0], classes), [cv2.IMWRITE_PNG_COMPRESSION, 9])
+
+
+class RleMaskCodec:
+    name = 'rle'
+    extension = '.json'
+
+    @staticmethod
+    def encode(classes):
+        # COCO uncompressed RLE: column-major run lengths, starting with a background run;
+        # multi-class masks store the class of every run in 'values'
+        flat = classes.ravel(order='F')
+        changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+        bounds = np.concatenate(([0], changes, [flat.size]))
+        counts = np.diff(bounds)
+        if flat.size and flat.max() > 1:
+            return {'size': list(classes.shape), 'counts': counts.tolist(), 'values': flat[bounds[:-1]].tolist()}
+        if flat.size and flat[0]:
+            counts = np.concatenate(([0], counts))
+        return {'size': list(classes.shape), 'counts': counts.tolist()}
+
+    @staticmethod
+    def decode(rle):
+        height, width = rle['size']
+        counts = np.asarray(rle['counts'], dtype=np.int64)
+        if 'values' in rle:
+            values = np.asarray(rle['values'], dtype=np.uint8)
+        else:
+            values = (np.arange(len(counts)) % 2).astype(np.uint8)
+        flat = np.repeat(values, counts)
+        return flat.reshape((height, width), order='F')
+
+    def save(self, path, classes):
+        with open(path, 'w') as f:
+            json.dump(self.encode(classes), f, separators=(',', ':'))
+
+    def load(self, path):
+        with open(path, 'r') as f:
+            return self.decode(json.load(f))
+
+
+class NpzMaskCodec:
+    name = 'npz'
+    extension = '.npz'
+
+    def save(self, path, classes):
+        if classes.max(initial=0) <= 1:
+            np.savez_compressed(path, shape=np.array(classes.shape), bits=np.packbits(classes.astype(bool)))
+        else:
+            np.savez_compressed(path, shape=np.array(classes.shape), classes=classes.astype(np.uint8))
+
+    def load(self, path):
+        with np.load(path) as data:
+            if 'classes' in data:
+                return data['classes']
+            height, width = data['shape']
+            return np.unpackbits(data['bits'], count=height * width).reshape(height, width)
+
+
+MASK_CODECS = {codec.name: codec for codec in (PngMaskCodec(), BilevelPngMaskCodec(), RleMaskCodec(), NpzMaskCodec())}
+
+# used to detect the format of an existing mask file
+MASK_EXTENSIONS = {'.png': MASK_CODECS['png'], '.json': MASK_CODECS['rle'], '.npz': MASK_CODECS['npz']}
+
+
+def get_mask_codec(name):
+    if name not in MASK_CODECS:
+        raise ValueError(f'Unknown mask codec: {name}')
+    return MASK_CODECS[name]
+
+
+def create_mask_path(filename, mask_dir=None, codec='png1'):
+    mask_file = f'{osp.splitext(filename)[0]}{MASK_SUFFIX}{get_mask_codec(codec).extension}'
+    if mask_dir:
+        mask_file = osp.join(mask_dir, osp.basename(mask_file))
+    return mask_file
+
+
+def find_mask_file(mask_path):
+    # returns the most recently written mask with the same stem, whatever its format
+    stem = osp.splitext(mask_path)[0]
+    candidates = [stem + ext for ext in MASK_EXTENSIONS if osp.exists(stem + ext)]
+    if not candidates:
+        return None
+    return max(candidates, key=osp.getmtime)
+
+
+def load_mask(mask_path):
+    mask_file = find_mask_file(mask_path)
+    if mask_file is None:
+        return None
+    return MASK_EXTENSIONS[osp.splitext(mask_file)[1].lower()].load(mask_file)
+
+
+def save_mask(mask_path, classes, codec='png1'):
+    codec = get_mask_codec(codec)
+    mask_file = osp.splitext(mask_path)[0] + codec.extension
+
+    mask_dir = osp.dirname(mask_file)
+    if mask_dir and not osp.exists(mask_dir):
+        os.makedirs(mask_dir, exist_ok=True)
+
+    codec.save(mask_file, classes)
+    return mask_file
+
+
+def convert_mask_file(mask_file, codec='png1', remove=False):
+    classes = MASK_EXTENSIONS[osp.splitext(mask_file)[1].lower()].load(mask_file)
+    if classes is None:
+        return mask_file, None
+
+    new_file = save_mask(mask_file, classes, codec)
+    if remove and osp.abspath(new_file) != osp.abspath(mask_file):
+        os.remove(mask_file)
+    return mask_file, new_file
@@ -0,0 +1,111 @@
+from utils.lazy import lazy_import
+from utils.mask_codecs import load_mask
+
+np = lazy_import('numpy')
+
+
+# per-pixel codes of the comparison and their overlay colors, RGBA
+AGREE_EMPTY, ONLY_CURRENT, ONLY_REFERENCE, AGREE_LABELED, OTHER_CLASS = range(5)
+DIFF_COLORS = (
+    (0, 0, 0, 0),
+    (255, 0, 0, 170),       # labeled only in the current mask
+    (0, 80, 255, 170),      # labeled only in the reference mask
+    (0, 255, 0, 50),
+    (255, 200, 0, 170),     # labeled in both, with different classes
+)
+
+
+def diff_codes(classes, reference):
+    codes = (classes > 0).view(np.uint8) + 2 * (reference > 0).view(np.uint8)
+    codes[(codes == AGREE_LABELED) & (classes != reference)] = OTHER_CLASS
+    return codes
+
+
+class MaskDiff:
+    # agreement between the mask being edited and a reference mask, counted per tile so edits only recount their tiles
+    def __init__(self, classes, reference, tile_size=256):
+        if classes.shape != reference.shape:
+            raise ValueError(f'Mask sizes differ: {classes.shape} and {reference.shape}')
+
+        self.classes = classes.copy()
+        self.reference = reference
+        self.tile_size = tile_size
+
+        height, width = classes.shape
+        shape = (-(-height // tile_size), -(-width // tile_size))
+        self.intersection = np.zeros(shape, dtype=np.int64)
+        self.current_area = np.zeros(shape, dtype=np.int64)
+        self.reference_area = np.zeros(shape, dtype=np.int64)
+        self.disagreement = np.zeros(shape, dtype=np.int64)
+        # tiles whose overlay is out of date, and tiles whose overlay is not fully transparent
+        self.stale = np.ones(shape, dtype=bool)
+        self.painted = np.zeros(shape, dtype=bool)
+        self.count_tiles(0, 0, *shape)
+
+    def count_tiles(self, r0, c0, r1, c1):
+        t = self.tile_size
+        codes = diff_codes(self.classes[r0*t:r1*t, c0*t:c1*t], self.reference[r0*t:r1*t, c0*t:c1*t])
+        rows = np.arange(0, codes.shape[0], t)
+        cols = np.arange(0, codes.shape[1], t)
+
+        def per_tile(selected):
+            return np.add.reduceat(np.add.reduceat(selected.view(np.uint8), rows, axis=0, dtype=np.int64), cols, axis=1)
+
+        labeled_in_both = (codes == AGREE_LABELED) | (codes == OTHER_CLASS)
+        self.intersection[r0:r1, c0:c1] = per_tile(labeled_in_both)
+        self.current_area[r0:r1, c0:c1] = per_tile(labeled_in_both | (codes == ONLY_CURRENT))
+        self.reference_area[r0:r1, c0:c1] = per_tile(labeled_in_both | (codes == ONLY_REFERENCE))
+        self.disagreement[r0:r1, c0:c1] = per_tile((codes != AGREE_EMPTY) & (codes != AGREE_LABELED))
+
+    def update(self, x0, y0, region):
+        height, width = region.shape
+        self.classes[y0:y0+height, x0:x0+width] = region
+
+        t = self.tile_size
+        r0, c0, r1, c1 = y0 // t, x0 // t, -(-(y0 + height) // t), -(-(x0 + width) // t)
+        self.count_tiles(r0, c0, r1, c1)
+        self.stale[r0:r1, c0:c1] = True
+
+    def stale_tiles(self):
+        # rects of the tiles to paint again; tiles unlabeled in both masks are transparent and skipped if already so
+        empty = (self.current_area == 0) & (self.reference_area == 0)
+        tiles = np.flatnonzero(self.stale & (self.painted | ~empty))
+        self.painted[self.stale] = ~empty[self.stale]
+        self.stale[:] = False
+        return [self.tile_rect(index) for index in tiles]
+
+    def overlay(self, x0=0, y0=0, x1=None, y1=None):
+        codes = diff_codes(self.classes[y0:y1, x0:x1], self.reference[y0:y1, x0:x1])
+        return np.take(np.array(DIFF_COLORS, dtype=np.uint8), codes, axis=0)
+
+    def disagreement_tiles(self):
+        # flat indices of the tiles with disagreements, in reading order
+        return np.flatnonzero(self.disagreement)
+
+    def tile_rect(self, index):
+        t = self.tile_size
+        row, col = divmod(int(index), self.disagreement.shape[1])
+        height, width = self.classes.shape
+        return col * t, row * t, min((col + 1) * t, width), min((row + 1) * t, height)
+
+    @property
+    def iou(self):
+        intersection = int(self.intersection.sum())
+        union = int(self.current_area.sum() + self.reference_area.sum()) - intersection
+        return intersection / union if union else 1.0
+
+    @property
+    def dice(self):
+        total = int(self.current_area.sum() + self.reference_area.sum())
+        return 2 * int(self.intersection.sum()) / total if total else 1.0
+
+    @property
+    def disagreeing_pixels(self):
+        return int(self.disagreement.sum())
+
+
+def load_mask_diff(classes, reference_path):
+    reference = load_mask(reference_path)
+    if reference is None:
+        return None
+    return MaskDiff(classes, reference)
@@ -0,0 +1,105 @@
+import time
+import threading
+
+
+def array_buffers(*arrays):
+    # (buffer id, size) of every array, nested lists such as pyramids included; views count as their base array
+    buffers = []
+    for array in arrays:
+        if array is None:
+            continue
+        if isinstance(array, (list, tuple)):
+            buffers += array_buffers(*array)
+            continue
+        base = array if array.base is None else array.base
+        buffers.append((id(base), getattr(base, 'nbytes', array.nbytes)))
+    return buffers
+
+
+class MemoryBudget:
+    # every large buffer is registered under a key; when the total goes over the budget, entries that can be
+    # dropped are evicted, least recently used first. A buffer shared by several entries is counted once.
+    def __init__(self, budget=0):
+        self.budget = budget
+        self.entries = {}       # key -> [buffers, category, evict, last used]
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.over_budget = False
+
+    def register(self, key, buffers, category, evict=None):
+        with self.lock:
+            self.entries[key] = [list(buffers), category, evict, time.monotonic()]
+        self.enforce(keep=key)
+        self.notify()
+
+    def release(self, key):
+        with self.lock:
+            found = self.entries.pop(key, None) is not None
+        if found:
+            self.notify()
+
+    def touch(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries[key][3] = time.monotonic()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def _unique(self, entries):
+        buffers = {}
+        for entry in entries:
+            for buffer_id, nbytes in entry[0]:
+                buffers[buffer_id] = nbytes
+        return buffers
+
+    def total(self):
+        with self.lock:
+            return sum(self._unique(self.entries.values()).values())
+
+    def usage(self):
+        # bytes per category; a shared buffer is charged to the first entry that registered it
+        with self.lock:
+            usage, seen = {}, set()
+            for buffers, category, _, _ in self.entries.values():
+                for buffer_id, nbytes in buffers:
+                    if buffer_id not in seen:
+                        seen.add(buffer_id)
+                        usage[category] = usage.get(category, 0) + nbytes
+            return usage
+
+    def _gain(self, key):
+        # bytes that evicting the entry actually frees
+        others = self._unique(entry for k, entry in self.entries.items() if k != key)
+        return sum(nbytes for buffer_id, nbytes in self.entries[key][0] if buffer_id not in others)
+
+    def enforce(self, keep=None):
+        if self.budget <= 0:
+            return
+
+        while True:
+            with self.lock:
+                total = self.total()
+                if total <= self.budget:
+                    self.over_budget = False
+                    return
+                candidates = sorted(
+                    (entry[3], key) for key, entry in self.entries.items()
+                    if entry[2] is not None and key != keep and self._gain(key) > 0
+                )
+                if not candidates:
+                    if not self.over_budget:
+                        print(f'Memory budget of {self.budget / 2 ** 20:.0f} MB exceeded: '
+                              f'{total / 2 ** 20:.0f} MB in use, nothing left to evict')
+                    self.over_budget = True
+                    return
+
+                key = candidates[0][1]
+                buffers, category, evict, _ = self.entries.pop(key)
+
+            print(f'Memory budget: evicted {category} {key[-1]} ({sum(n for _, n in buffers) / 2 ** 20:.1f} MB)')
+            evict()
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+import functools
+
+from collections import deque
+
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+class TraceWriter:
+    # Chrome trace-event format; the closing bracket is optional, so events can be appended as they come
+    def __init__(self, trace_file, max_events=100000):
+        self.trace_file = trace_file
+        self.max_events = max_events
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self._open()
+
+    def _open(self):
+        self.file = open(self.trace_file, 'w')
+        self.file.write('[\n')
+        self.count = 0
+
+    def write(self, name, start, duration, args=None):
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': start * 1e6,
+            'dur': duration * 1e6,
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+
+        with self.lock:
+            if self.count >= self.max_events:
+                # keep the previous window as .1 and start a new one
+                self.file.close()
+                os.replace(self.trace_file, self.trace_file + '.1')
+                self._open()
+            self.file.write(json.dumps(event) + ',\n')
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class Profiler:
+    def __init__(self, history=600):
+        self.enabled = False
+        self.history = history
+        self.durations = {}
+        self.pixels = {}
+        self.calls = {}
+        self.trace = None
+
+    def enable(self, trace_file=None):
+        if trace_file and self.trace is None:
+            self.trace = TraceWriter(trace_file)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def record(self, name, start, duration, pixels=None):
+        if name not in self.durations:
+            self.durations[name] = deque(maxlen=self.history)
+            self.calls[name] = deque(maxlen=self.history)
+            self.pixels[name] = deque(maxlen=self.history)
+
+        self.durations[name].append(duration)
+        self.calls[name].append(start)
+        if pixels is not None:
+            self.pixels[name].append(pixels)
+
+        if self.trace is not None:
+            self.trace.write(name, start, duration, None if pixels is None else {'pixels': pixels})
+
+    def rate(self, name, window=1.0):
+        calls = self.calls.get(name)
+        if not calls:
+            return 0.0
+        now = time.perf_counter()
+        return sum(1 for t in calls if now - t <= window) / window
+
+    def percentiles(self, name, q=(50, 99)):
+        durations = self.durations.get(name)
+        if not durations:
+            return [0.0] * len(q)
+        return list(np.percentile(np.fromiter(durations, dtype=np.float64), q))
+
+    def last_pixels(self, name):
+        pixels = self.pixels.get(name)
+        return pixels[-1] if pixels else 0
+
+    def summary(self):
+        return {
+            name: {'calls': len(durations), 'p50': p50, 'p99': p99}
+            for name, durations in self.durations.items()
+            for p50, p99 in [self.percentiles(name)]
+        }
+
+
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        lines = [f'{name:<16} {duration * 1000:8.1f} ms' for name, duration in self.phases]
+        lines.append(f'{"total":<16} {(self.last - self.start) * 1000:8.1f} ms')
+        return '\n'.join(lines)
+
+
+profiler = Profiler()
+startup = StartupTimer()
+
+
+def timed(name, pixels=None):
+    # when the profiler is disabled the wrapper only checks a flag and calls through
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return fn(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                profiler.record(name, start, duration, pixels(*args) if pixels else None)
+        return wrapper
+    return decorator
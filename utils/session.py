@@ -0,0 +1,146 @@
+import os
+import time
+import sqlite3
+import threading
+
+import os.path as osp
+
+
+IMAGE_FIELDS = ('zoom_mode', 'zoom_value', 'scroll_h', 'scroll_v', 'brightness', 'contrast', 'saved')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    zoom_mode INTEGER,
+    zoom_value INTEGER,
+    scroll_h INTEGER,
+    scroll_v INTEGER,
+    brightness INTEGER,
+    contrast INTEGER,
+    saved REAL,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS recent (path TEXT PRIMARY KEY, opened REAL);
+CREATE INDEX IF NOT EXISTS recent_opened ON recent (opened);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class SessionStore:
+    # rows are read one image at a time; writes are coalesced and flushed by a background thread
+    def __init__(self, session_file, flush_interval=0.5):
+        self.session_file = session_file
+        self.flush_interval = flush_interval
+
+        session_dir = osp.dirname(session_file)
+        if session_dir and not osp.exists(session_dir):
+            os.makedirs(session_dir, exist_ok=True)
+
+        self.reader = sqlite3.connect(session_file, check_same_thread=False)
+        self.reader.execute('PRAGMA journal_mode=WAL')
+        self.reader.executescript(SCHEMA)
+        self.reader.commit()
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        self.pending_images = {}
+        self.flushing_images = {}
+        self.pending_recent = {}
+        self.pending_settings = {}
+
+        self.thread = threading.Thread(target=self._run, name='session-writer', daemon=True)
+        self.thread.start()
+
+    def update_image(self, path, **fields):
+        with self.lock:
+            self.pending_images.setdefault(path, {}).update(fields)
+        self.wake.set()
+
+    def add_recent(self, path):
+        with self.lock:
+            self.pending_recent[path] = time.time()
+        self.wake.set()
+
+    def set_setting(self, key, value):
+        with self.lock:
+            self.pending_settings[key] = value
+        self.wake.set()
+
+    def get_image(self, path):
+        row = self.reader.execute(
+            f'SELECT {", ".join(IMAGE_FIELDS)} FROM images WHERE path = ?', (path,)
+        ).fetchone()
+        state = {} if row is None else {k: v for k, v in zip(IMAGE_FIELDS, row) if v is not None}
+
+        with self.lock:
+            state.update(self.flushing_images.get(path, {}))
+            state.update(self.pending_images.get(path, {}))
+        return state
+
+    def recent_files(self, limit):
+        rows = self.reader.execute('SELECT path FROM recent ORDER BY opened DESC LIMIT ?', (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_setting(self, key, default=None):
+        with self.lock:
+            if key in self.pending_settings:
+                return self.pending_settings[key]
+        row = self.reader.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def _flush(self, connection):
+        with self.lock:
+            images, self.pending_images = self.pending_images, {}
+            self.flushing_images = images
+            recent, self.pending_recent = self.pending_recent, {}
+            settings, self.pending_settings = self.pending_settings, {}
+
+        if not (images or recent or settings):
+            return
+
+        now = time.time()
+        with connection:
+            for path, fields in images.items():
+                names = [name for name in IMAGE_FIELDS if name in fields]
+                connection.execute(
+                    f'INSERT INTO images (path, {", ".join(names)}, updated) '
+                    f'VALUES (?, {", ".join("?" * len(names))}, ?) '
+                    f'ON CONFLICT(path) DO UPDATE SET '
+                    f'{", ".join(f"{n} = excluded.{n}" for n in names)}, updated = excluded.updated',
+                    (path, *[fields[n] for n in names], now),
+                )
+            connection.executemany(
+                'INSERT INTO recent (path, opened) VALUES (?, ?) '
+                'ON CONFLICT(path) DO UPDATE SET opened = excluded.opened',
+                recent.items(),
+            )
+            connection.executemany(
+                'INSERT INTO settings (key, value) VALUES (?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                settings.items(),
+            )
+
+        with self.lock:
+            self.flushing_images = {}
+
+    def _run(self):
+        connection = sqlite3.connect(self.session_file)
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            if not self.closed:
+                # let a burst of scroll/zoom updates collapse into one transaction
+                time.sleep(self.flush_interval)
+            self._flush(connection)
+            if self.closed:
+                break
+        connection.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+        self.reader.close()
@@ -0,0 +1,41 @@
+from utils.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+class LabelStats:
+    # luminance histogram of the display image and per-class pixel counts of the mask
+    def __init__(self, image, classes):
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        self.histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+        self.classes = classes
+        self.counts = np.bincount(classes.ravel(), minlength=256)
+
+    def copy(self):
+        # the histogram never changes, the classes and counts follow the edits
+        stats = LabelStats.__new__(LabelStats)
+        stats.histogram = self.histogram
+        stats.classes = self.classes.copy()
+        stats.counts = self.counts.copy()
+        return stats
+
+    def update(self, x0, y0, region):
+        # only the pixels of the edited rectangle are counted again
+        height, width = region.shape
+        old = self.classes[y0:y0+height, x0:x0+width]
+        self.counts -= np.bincount(old.ravel(), minlength=256)
+        self.counts += np.bincount(region.ravel(), minlength=256)
+        old[...] = region
+
+    @property
+    def total(self):
+        return self.classes.size
+
+    @property
+    def labeled(self):
+        return int(self.total - self.counts[0])
+
+    @property
+    def labeled_fraction(self):
+        return self.labeled / max(self.total, 1)
@@ -0,0 +1,90 @@
+import os
+
+import os.path as osp
+
+from utils.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+SUPERPIXEL_METHODS = ('slic', 'felzenszwalb')
+
+
+class SuperpixelIndex:
+    def __init__(self, labels, bboxes=None):
+        self.labels = labels
+        self.bboxes = self.compute_bboxes(labels) if bboxes is None else bboxes
+
+    @staticmethod
+    def compute_bboxes(labels):
+        from scipy import ndimage
+
+        # bboxes[k] = (y0, y1, x0, x1) of the superpixel k, end exclusive
+        slices = ndimage.find_objects(labels + 1)
+        bboxes = np.zeros((len(slices), 4), dtype=np.int32)
+        for k, s in enumerate(slices):
+            if s is not None:
+                bboxes[k] = s[0].start, s[0].stop, s[1].start, s[1].stop
+        return bboxes
+
+    def labels_under_stroke(self, p1, p2, thickness):
+        height, width = self.labels.shape
+        r = thickness // 2 + 1
+
+        x0 = max(int(min(p1[0], p2[0])) - r, 0)
+        x1 = min(int(max(p1[0], p2[0])) + r + 1, width)
+        y0 = max(int(min(p1[1], p2[1])) - r, 0)
+        y1 = min(int(max(p1[1], p2[1])) + r + 1, height)
+        if x0 >= x1 or y0 >= y1:
+            return np.zeros(0, dtype=self.labels.dtype)
+
+        stroke = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.line(stroke, (int(p1[0]) - x0, int(p1[1]) - y0), (int(p2[0]) - x0, int(p2[1]) - y0),
+                 1, max(thickness, 1), lineType=cv2.LINE_8)
+        return np.unique(self.labels[y0:y1, x0:x1][stroke > 0])
+
+    def select(self, hit_labels):
+        # returns ((y0, x0), boolean selection) covering the union bbox of hit_labels
+        boxes = self.bboxes[hit_labels]
+        y0, x0 = boxes[:, 0].min(), boxes[:, 2].min()
+        y1, x1 = boxes[:, 1].max(), boxes[:, 3].max()
+        selection = np.isin(self.labels[y0:y1, x0:x1], hit_labels)
+        return (int(y0), int(x0)), selection
+
+
+def compute_superpixels(image, method='slic', n_segments=2000, compactness=10.0, scale=100.0, sigma=0.8, min_size=50):
+    if method == 'slic':
+        from skimage.segmentation import slic
+        labels = slic(image, n_segments=n_segments, compactness=compactness, start_label=0)
+    elif method == 'felzenszwalb':
+        from skimage.segmentation import felzenszwalb
+        labels = felzenszwalb(image, scale=scale, sigma=sigma, min_size=min_size)
+    else:
+        raise ValueError(f'Unknown superpixel method: {method}')
+    return SuperpixelIndex(labels.astype(np.int32))
+
+
+def create_superpixel_path(mask_path, method):
+    return f'{osp.splitext(mask_path)[0]}-sp-{method}.npz'
+
+
+def load_superpixels(image, mask_path, method='slic', **kwargs):
+    cache_file = create_superpixel_path(mask_path, method)
+    height, width = image.shape[:2]
+
+    if osp.exists(cache_file):
+        try:
+            with np.load(cache_file) as data:
+                if tuple(data['labels'].shape) == (height, width):
+                    return SuperpixelIndex(data['labels'], data['bboxes'])
+        except (OSError, KeyError, ValueError):
+            pass
+
+    index = compute_superpixels(image, method=method, **kwargs)
+
+    cache_dir = osp.dirname(cache_file)
+    if cache_dir and not osp.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    np.savez_compressed(cache_file, labels=index.labels, bboxes=index.bboxes)
+    return index
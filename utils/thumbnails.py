@@ -0,0 +1,63 @@
+import os
+import hashlib
+import tempfile
+
+import os.path as osp
+
+from utils.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+
+
+class ThumbnailCache:
+    # thumbnails are keyed by path, mtime and size, so an edited image never shows a stale preview
+    def __init__(self, cache_dir, size=256):
+        self.cache_dir = cache_dir
+        self.size = size
+
+    def thumbnail_file(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        key = f'{osp.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.size}'
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return osp.join(self.cache_dir, digest[:2], f'{digest}.jpg')
+
+    def get(self, path):
+        thumbnail_file = self.thumbnail_file(path)
+        if thumbnail_file is not None and osp.exists(thumbnail_file):
+            return thumbnail_file
+        return None
+
+    def build(self, path):
+        thumbnail_file = self.thumbnail_file(path)
+        if thumbnail_file is None:
+            return None
+        if osp.exists(thumbnail_file):
+            return thumbnail_file
+
+        # JPEG decoders can skip straight to 1/8 resolution; other formats decode and shrink
+        image = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_8)
+        if image is None or min(image.shape[:2]) < self.size // 4:
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+
+        height, width = image.shape[:2]
+        scale = min(self.size / max(height, width), 1.0)
+        if scale < 1.0:
+            image = cv2.resize(image, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                               interpolation=cv2.INTER_AREA)
+
+        os.makedirs(osp.dirname(thumbnail_file), exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(suffix='.jpg', dir=osp.dirname(thumbnail_file))
+        os.close(fd)
+        try:
+            cv2.imwrite(tmp_file, image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            os.replace(tmp_file, thumbnail_file)
+        finally:
+            if osp.exists(tmp_file):
+                os.remove(tmp_file)
+        return thumbnail_file
@@ -0,0 +1,70 @@
+import io
+
+from utils.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+TILE_FORMATS = ('png', 'webp', 'npy')
+
+
+class PngEncoder:
+    extension = 'png'
+
+    def __init__(self, compression_level=3):
+        self.params = [cv2.IMWRITE_PNG_COMPRESSION, compression_level]
+
+    def encode(self, patch):
+        ok, encoded = cv2.imencode('.png', patch, self.params)
+        if not ok:
+            raise ValueError('PNG encoding failed')
+        return encoded.tobytes()
+
+
+class WebpEncoder:
+    extension = 'webp'
+
+    def __init__(self, compression_level=3):
+        # a quality above 100 selects the lossless mode of libwebp
+        self.params = [cv2.IMWRITE_WEBP_QUALITY, 101]
+
+    def encode(self, patch):
+        # OpenCV would silently reduce 16-bit tiles to 8 bits
+        if patch.dtype != np.uint8:
+            raise ValueError(f'WebP tiles must be 8-bit, got {patch.dtype}')
+        ok, encoded = cv2.imencode('.webp', patch, self.params)
+        if not ok:
+            raise ValueError('WebP encoding failed')
+        return encoded.tobytes()
+
+
+class NpyEncoder:
+    # uncompressed, loaded with np.load without an image decoder; channels stay in BGR order like the other formats
+    extension = 'npy'
+
+    def __init__(self, compression_level=3):
+        pass
+
+    def encode(self, patch):
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(patch), allow_pickle=False)
+        return buffer.getvalue()
+
+
+TILE_ENCODERS = {
+    'png': PngEncoder,
+    'webp': WebpEncoder,
+    'npy': NpyEncoder,
+}
+
+
+def create_tile_encoder(tile_format='png', compression_level=3):
+    if tile_format not in TILE_ENCODERS:
+        raise ValueError(f'Unknown tile format: {tile_format}')
+    return TILE_ENCODERS[tile_format](compression_level)
+
+
+def write_tile(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
@@ -0,0 +1,157 @@
+import os
+import json
+import hashlib
+import sqlite3
+
+import os.path as osp
+
+from utils.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+INDEX_FILE = '.tile-index.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tiles (hash TEXT, label TEXT, path TEXT, PRIMARY KEY (hash, label));
+CREATE TABLE IF NOT EXISTS exports (source TEXT PRIMARY KEY, signature TEXT);
+CREATE TABLE IF NOT EXISTS exported_tiles (
+    source TEXT,
+    y INTEGER,
+    x INTEGER,
+    mask_hash TEXT,
+    files TEXT,
+    PRIMARY KEY (source, y, x)
+);
+"""
+
+
+def exact_hash(patch):
+    header = f'{patch.shape}{patch.dtype.str}'.encode()
+    data = np.ascontiguousarray(patch)
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(header + data.tobytes())
+    digest = hashlib.blake2b(header, digest_size=16)
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def perceptual_hash(patch, hash_size=8):
+    # dHash: sign of the horizontal gradient of a 9x8 thumbnail, robust to noise and re-encoding
+    gray = patch if patch.ndim == 2 else cv2.cvtColor(np.ascontiguousarray(patch), cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return 'p' + np.packbits(bits).tobytes().hex()
+
+
+TILE_HASHES = {
+    'exact': exact_hash,
+    'perceptual': perceptual_hash,
+}
+
+
+def open_index(split_dir):
+    # one connection per writer, shared by the tile index and the export state
+    os.makedirs(split_dir, exist_ok=True)
+    connection = sqlite3.connect(osp.join(split_dir, INDEX_FILE))
+    connection.execute('PRAGMA journal_mode=WAL')
+    if 'label' not in {row[1] for row in connection.execute('PRAGMA table_info(tiles)')}:
+        # indexes written before tiles were keyed by label are rebuilt from the next export
+        connection.execute('DROP TABLE IF EXISTS tiles')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class TileIndex:
+    # persistent map from tile content hash and label to the first file written with that content under that label;
+    # the same pixels under another label are not a duplicate
+    def __init__(self, connection, hash_method='exact'):
+        if hash_method not in TILE_HASHES:
+            raise ValueError(f'Unknown tile hash: {hash_method}')
+
+        self.hash = TILE_HASHES[hash_method]
+        self.connection = connection
+
+    def find(self, patch, label):
+        key = self.hash(patch)
+        row = self.connection.execute('SELECT path FROM tiles WHERE hash = ? AND label = ?', (key, label)).fetchone()
+        if row is None or not osp.exists(row[0]):
+            return key, None
+        return key, row[0]
+
+    def add(self, key, label, path):
+        self.connection.execute(
+            'INSERT INTO tiles (hash, label, path) VALUES (?, ?, ?) '
+            'ON CONFLICT(hash, label) DO UPDATE SET path = excluded.path',
+            (key, label, osp.abspath(path)),
+        )
+
+
+class ExportState:
+    # mask hash and written (label, angle, extension) files of every tile position from the last export of an image;
+    # the extension is None for duplicates that were skipped
+    def __init__(self, connection, source, signature, exists=None):
+        self.connection = connection
+        self.source = source
+        self.signature = signature
+        self.exists = exists
+
+        row = connection.execute('SELECT signature FROM exports WHERE source = ?', (source,)).fetchone()
+        # files can only be reused when the image and the tiling settings are the same as last time
+        self.reusable = row is not None and row[0] == signature
+        self.previous = {
+            (y, x): (mask_hash, [tuple(f) for f in json.loads(files)])
+            for y, x, mask_hash, files in connection.execute(
+                'SELECT y, x, mask_hash, files FROM exported_tiles WHERE source = ?', (source,)
+            )
+        }
+        self.current = {}
+
+    def unchanged(self, y, x, mask_hash):
+        previous = self.previous.get((y, x))
+        if not self.reusable or previous is None or previous[0] != mask_hash:
+            return None
+        # files deleted from the split directory since then are written again; skipped duplicates have no file
+        if self.exists is not None and not all(self.exists(y, x, *f) for f in previous[1] if f[2] is not None):
+            return None
+        self.current[(y, x)] = previous
+        return previous[1]
+
+    def record(self, y, x, mask_hash):
+        self.current[(y, x)] = (mask_hash, [])
+
+    def add_file(self, y, x, label, angle, extension):
+        self.current[(y, x)][1].append((label, angle, extension))
+
+    def previous_label(self, y, x, angle):
+        if not self.reusable or (y, x) not in self.previous:
+            return None
+        for label, previous_angle, _ in self.previous[(y, x)][1]:
+            if previous_angle == angle:
+                return label
+        return None
+
+    def stale_files(self):
+        current = {(y, x, *f) for (y, x), (_, files) in self.current.items() for f in files}
+        for (y, x), (_, files) in self.previous.items():
+            for label, angle, extension in files:
+                if (y, x, label, angle, extension) not in current:
+                    yield y, x, label, angle, extension
+
+    def save(self):
+        self.connection.execute('DELETE FROM exported_tiles WHERE source = ?', (self.source,))
+        self.connection.executemany(
+            'INSERT INTO exported_tiles (source, y, x, mask_hash, files) VALUES (?, ?, ?, ?, ?)',
+            ((self.source, y, x, mask_hash, json.dumps(files)) for (y, x), (mask_hash, files) in self.current.items()),
+        )
+        self.connection.execute(
+            'INSERT INTO exports (source, signature) VALUES (?, ?) '
+            'ON CONFLICT(source) DO UPDATE SET signature = excluded.signature',
+            (self.source, self.signature),
+        )
@@ -0,0 +1,222 @@
+import io
+import os
+import glob
+import json
+import shutil
+import tarfile
+
+import os.path as osp
+
+from utils.tile_index import TileIndex, ExportState, open_index
+from utils.tile_encoders import create_tile_encoder, write_tile
+
+
+TILE_LABELS = ('defect', 'normal')
+
+
+def tile_labels(class_names):
+    # class names first and 'normal' last, so a single 'defect' class keeps the original label indices
+    return (*class_names, 'normal')
+
+
+def tile_name(base_file, y, x, angle=0):
+    return f'{base_file}-{y:04d}-{x:04d}-{angle:03d}'
+
+
+class FileTileWriter:
+    def __init__(self, split_dir, base_file, source=None, compression_level=3, labels=TILE_LABELS, tile_format='png',
+                 dedup='none', dedup_hash='exact', incremental=False):
+        self.split_dir = split_dir
+        self.base_file = base_file
+        self.source = source
+        self.encoder = create_tile_encoder(tile_format, compression_level)
+        self.labels = labels
+
+        self.connection = open_index(split_dir) if dedup != 'none' or incremental else None
+
+        # duplicates of an already exported tile are skipped or hard-linked instead of encoded again
+        self.dedup = dedup
+        self.index = TileIndex(self.connection, dedup_hash) if dedup != 'none' else None
+        self.duplicates = 0
+
+        # tiles of an unchanged image keep their files from the last export, see export_tiles
+        self.incremental = incremental
+        self.state = None
+        self.reused = 0
+
+        for label in self.labels:
+            os.makedirs(osp.join(self.split_dir, label), exist_ok=True)
+
+    def start(self, signature):
+        # files written in another format are not reused
+        self.state = ExportState(self.connection, self.base_file, f'{signature}:{self.encoder.extension}',
+                                 exists=self.file_exists)
+        return self.state
+
+    def file_exists(self, y, x, label, angle, extension):
+        return osp.exists(self.tile_path(label, y, x, angle, extension))
+
+    def tile_path(self, label, y, x, angle, extension=None):
+        name = f'{tile_name(self.base_file, y, x, angle)}.{extension or self.encoder.extension}'
+        return osp.abspath(osp.join(self.split_dir, label, name))
+
+    def write(self, patch, label, y, x, angle=0, defect_fraction=0.0):
+        split_file = self.tile_path(label, y, x, angle)
+        extension = self.encoder.extension
+
+        if self.state is not None:
+            previous_label = self.state.previous_label(y, x, angle)
+            if previous_label is not None:
+                previous_file = self.tile_path(previous_label, y, x, angle)
+                if osp.exists(previous_file):
+                    # same pixels as last time, at most the label folder changes
+                    if previous_file != split_file:
+                        os.replace(previous_file, split_file)
+                    self.reused += 1
+                    self.state.add_file(y, x, label, angle, extension)
+                    return
+
+        # a tile whose label changed since an earlier export is not left behind in its old label folder
+        self.remove_other_labels(label, y, x, angle)
+
+        if self.index is not None:
+            key, existing = self.index.find(patch, label)
+            if existing is not None and existing != split_file and existing.endswith(f'.{extension}'):
+                self.duplicates += 1
+                if self.dedup == 'link':
+                    self.link(existing, split_file)
+                else:
+                    if osp.exists(split_file):
+                        # a tile exported earlier under this name no longer has this content
+                        os.remove(split_file)
+                    extension = None
+            elif existing != split_file:
+                write_tile(split_file, self.encoder.encode(patch))
+                self.index.add(key, label, split_file)
+        else:
+            write_tile(split_file, self.encoder.encode(patch))
+
+        if self.state is not None:
+            self.state.add_file(y, x, label, angle, extension)
+
+    def remove_other_labels(self, label, y, x, angle):
+        for other_label in self.labels:
+            if other_label != label:
+                other_file = self.tile_path(other_label, y, x, angle)
+                if osp.exists(other_file):
+                    os.remove(other_file)
+
+    def link(self, existing, split_file):
+        if osp.exists(split_file) and osp.samefile(existing, split_file):
+            return
+        tmp_file = split_file + '.tmp'
+        try:
+            os.link(existing, tmp_file)
+        except OSError:
+            # hard links need the same file system
+            shutil.copyfile(existing, tmp_file)
+        os.replace(tmp_file, split_file)
+
+    def close(self):
+        if self.state is not None:
+            for y, x, label, angle, extension in self.state.stale_files():
+                if extension is None:
+                    continue
+                stale_file = self.tile_path(label, y, x, angle, extension)
+                if osp.exists(stale_file):
+                    os.remove(stale_file)
+            self.state.save()
+
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+
+
+class ShardTileWriter:
+    # WebDataset layout: every tile is stored as {key}.png (or .webp, .npy), {key}.cls and {key}.json inside tar shards
+    incremental = False
+
+    def __init__(self, split_dir, base_file, source=None, compression_level=3, labels=TILE_LABELS, tile_format='png',
+                 max_tiles_per_shard=10000):
+        self.shard_dir = osp.join(split_dir, 'shards')
+        self.base_file = base_file
+        self.source = source or base_file
+        self.encoder = create_tile_encoder(tile_format, compression_level)
+        self.labels = labels
+        self.max_tiles_per_shard = max_tiles_per_shard
+        self.duplicates = 0
+
+        os.makedirs(self.shard_dir, exist_ok=True)
+
+        self.shard_files = []
+        self.shard = None
+        self.shard_count = 0
+        self.manifest = open(osp.join(self.shard_dir, f'{base_file}-manifest.jsonl'), 'w')
+
+    def _open_shard(self):
+        if self.shard is not None:
+            self.shard.close()
+
+        shard_file = osp.join(self.shard_dir, f'{self.base_file}-{len(self.shard_files):05d}.tar')
+        self.shard_files.append(shard_file)
+        self.shard = tarfile.open(shard_file, 'w')
+        self.shard_count = 0
+
+    def _add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self.shard.addfile(info, io.BytesIO(data))
+
+    def write(self, patch, label, y, x, angle=0, defect_fraction=0.0):
+        if self.shard is None or self.shard_count >= self.max_tiles_per_shard:
+            self._open_shard()
+
+        key = tile_name(self.base_file, y, x, angle)
+        record = {
+            'key': key,
+            'shard': osp.basename(self.shard_files[-1]),
+            'source': self.source,
+            'y': y,
+            'x': x,
+            'angle': angle,
+            'height': patch.shape[0],
+            'width': patch.shape[1],
+            'label': label,
+            'defect_fraction': round(float(defect_fraction), 6),
+        }
+
+        self._add(f'{key}.{self.encoder.extension}', self.encoder.encode(patch))
+        self._add(f'{key}.cls', str(self.labels.index(label)).encode())
+        self._add(f'{key}.json', json.dumps(record).encode())
+
+        self.manifest.write(json.dumps(record) + '\n')
+        self.shard_count += 1
+
+    def close(self):
+        if self.shard is not None:
+            self.shard.close()
+            self.shard = None
+        self.manifest.close()
+
+        # drop shards left over from a previous, larger export of the same image
+        pattern = osp.join(self.shard_dir, f'{glob.escape(self.base_file)}-[0-9][0-9][0-9][0-9][0-9].tar')
+        for shard_file in glob.glob(pattern):
+            if shard_file not in self.shard_files:
+                os.remove(shard_file)
+
+
+TILE_WRITERS = {
+    'files': FileTileWriter,
+    'shards': ShardTileWriter,
+}
+
+
+def create_tile_writer(output_mode, split_dir, base_file, source=None, compression_level=3, labels=TILE_LABELS,
+                       tile_format='png', dedup='none', dedup_hash='exact', incremental=False):
+    if output_mode not in TILE_WRITERS:
+        raise ValueError(f'Unknown tile output mode: {output_mode}')
+    if output_mode == 'files':
+        # shards are rewritten on every export, so only loose files are deduplicated or updated in place
+        return FileTileWriter(split_dir, base_file, source, compression_level, labels, tile_format, dedup, dedup_hash,
+                              incremental)
+    return TILE_WRITERS[output_mode](split_dir, base_file, source, compression_level, labels, tile_format)
@@ -0,0 +1,187 @@
+import os
+import json
+import zlib
+
+import os.path as osp
+
+from utils.lazy import lazy_import
+from utils.tile_index import exact_hash
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+BORDER_MODES = ('pad', 'shift', 'drop', 'keep')
+
+
+class TilingPolicy:
+    def __init__(self, patch_size=128, stride=48, min_defect_fraction=0.0, normal_ratio=1.0, border='pad', seed=0):
+        if border not in BORDER_MODES:
+            raise ValueError(f'Unknown border mode: {border}')
+
+        self.patch_size = patch_size
+        self.stride = stride
+        self.min_defect_fraction = min_defect_fraction
+        self.normal_ratio = normal_ratio
+        self.border = border
+        self.seed = seed
+
+    def rng(self, key=''):
+        # one stream per image so that the selection does not depend on the export order
+        return np.random.default_rng([self.seed, zlib.crc32(key.encode())])
+
+
+class TilePlan:
+    def __init__(self, origins, sizes, defect_fractions, labels, keep):
+        self.origins = origins                      # (n, 2) top-left (i, j) of every tile
+        self.sizes = sizes                          # (n, 2) height/width of the image area covered
+        self.defect_fractions = defect_fractions    # (n,) labeled pixels / patch area
+        self.labels = labels                        # (n,) 'defect' or 'normal'
+        self.keep = keep                            # (n,) tiles that should be written
+
+    def __len__(self):
+        return len(self.origins)
+
+    def kept(self):
+        return np.flatnonzero(self.keep)
+
+    def counts(self):
+        kept = self.labels[self.keep]
+        return {label: int((kept == label).sum()) for label in ('defect', 'normal')}
+
+
+def tile_origins(length, patch_size, stride, border):
+    starts = np.arange(0, length, stride)
+    if border == 'drop':
+        starts = starts[starts + patch_size <= length]
+    elif border == 'shift':
+        starts = np.unique(np.minimum(starts, max(length - patch_size, 0)))
+    return starts
+
+
+def plan_tiles(classes, policy, key=''):
+    height, width = classes.shape
+    size = policy.patch_size
+
+    ys = tile_origins(height, size, policy.stride, policy.border)
+    xs = tile_origins(width, size, policy.stride, policy.border)
+    oy, ox = np.meshgrid(ys, xs, indexing='ij')
+    oy, ox = oy.ravel(), ox.ravel()
+
+    ey = np.minimum(oy + size, height)
+    ex = np.minimum(ox + size, width)
+
+    # per-tile labeled-pixel counts from a single summed-area table
+    sat = cv2.integral((classes > 0).view(np.uint8), sdepth=cv2.CV_64F)
+    counts = sat[ey, ex] - sat[oy, ex] - sat[ey, ox] + sat[oy, ox]
+
+    sizes = np.stack([ey - oy, ex - ox], axis=1)
+    area = sizes[:, 0] * sizes[:, 1] if policy.border == 'keep' else np.full(len(oy), size * size)
+    defect_fractions = counts / np.maximum(area, 1)
+
+    is_defect = (counts > 0) & (defect_fractions >= policy.min_defect_fraction)
+    # tiles with a few labeled pixels below the threshold are neither clean defects nor normal
+    is_normal = counts == 0
+
+    keep = is_defect | (is_normal & (policy.rng(key).random(len(oy)) < policy.normal_ratio))
+    labels = np.where(is_defect, 'defect', 'normal')
+
+    return TilePlan(np.stack([oy, ox], axis=1), sizes, defect_fractions, labels, keep)
+
+
+def extract_tile(image, origin, policy):
+    i, j = origin
+    size = policy.patch_size
+    patch = image[i:i+size, j:j+size]
+
+    if policy.border == 'keep' or patch.shape[:2] == (size, size):
+        return patch
+
+    pad = [(0, size - patch.shape[0]), (0, size - patch.shape[1])] + [(0, 0)] * (patch.ndim - 2)
+    return np.pad(patch, pad, mode='constant')
+
+
+def tile_class(classes, y0, x0, y1, x1, class_names):
+    # route a defect tile to the class with the most pixels in it
+    hist = np.bincount(classes[max(y0, 0):y1, max(x0, 0):x1].ravel(), minlength=len(class_names) + 1)
+    return class_names[int(np.argmax(hist[1:len(class_names) + 1]))]
+
+
+def image_stamp(image, source=None):
+    # the path, size and modification time of the image file stand for its pixels; only an image without a file is hashed
+    if source is not None and osp.isfile(source):
+        stat = os.stat(source)
+        return f'{osp.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}'
+    return exact_hash(image)
+
+
+def export_signature(image, policy, augmenter=None, class_names=('defect',), source=None):
+    # everything but the mask that decides which files an export writes
+    settings = [policy.patch_size, policy.stride, policy.min_defect_fraction, policy.normal_ratio, policy.border,
+                policy.seed, list(class_names)]
+    if augmenter is not None:
+        settings += [augmenter.radius, augmenter.steps]
+    return f'{image_stamp(image, source)}:{json.dumps(settings)}'
+
+
+def tile_mask_hashes(classes, origins, patch_size, radius=0):
+    # the mask pixels that decide the labels of a tile, and of its rotations when radius is set
+    half_patch_size = patch_size // 2
+    hashes = []
+    for i, j in origins.tolist():
+        cy, cx = i + half_patch_size, j + half_patch_size
+        y0, x0 = max(min(i, cy - radius), 0), max(min(j, cx - radius), 0)
+        y1, x1 = max(i + patch_size, cy + radius), max(j + patch_size, cx + radius)
+        hashes.append(exact_hash(classes[y0:y1, x0:x1]))
+    return hashes
+
+
+def export_tiles(image, classes, policy, writer, augmenter=None, key='', class_names=('defect',), source=None):
+    size = policy.patch_size
+    half_patch_size = size // 2
+    plan = plan_tiles(classes, policy, key)
+
+    counts = dict.fromkeys((*class_names, 'normal'), 0)
+    dirty = np.ones(len(plan), dtype=bool)
+    if writer.incremental:
+        # positions whose mask pixels did not change since the last export keep their files
+        state = writer.start(export_signature(image, policy, augmenter, class_names, source))
+        radius = 0 if augmenter is None else augmenter.radius
+        hashes = tile_mask_hashes(classes, plan.origins, size, radius)
+        for k, (i, j) in enumerate(plan.origins.tolist()):
+            files = state.unchanged(i + half_patch_size, j + half_patch_size, hashes[k])
+            if files is None:
+                state.record(i + half_patch_size, j + half_patch_size, hashes[k])
+                continue
+            dirty[k] = False
+            for label, *_ in files:
+                counts[label] += 1
+    kept = np.flatnonzero(plan.keep & dirty)
+
+    tile_labels = {}
+    for k in kept:
+        i, j = plan.origins[k]
+        label = 'normal'
+        if plan.labels[k] == 'defect':
+            label = tile_class(classes, i, j, i + size, j + size, class_names)
+        tile_labels[k] = label
+
+        patch = extract_tile(image, (i, j), policy)
+        writer.write(patch, label, int(i) + half_patch_size, int(j) + half_patch_size, 0, plan.defect_fractions[k])
+        counts[label] += 1
+
+    if augmenter is not None:
+        augmented = augmenter.augment(image, classes > 0, plan.origins[kept], plan.labels[kept], policy)
+        for k, tiles in zip(kept, augmented):
+            i, j = plan.origins[k]
+            cy, cx = int(i) + half_patch_size, int(j) + half_patch_size
+            for angle, patch, label, defect_fraction in tiles:
+                if label == 'defect':
+                    label = tile_labels[k]
+                    if label == 'normal':
+                        # a rotation can bring labeled pixels from around a normal tile into view
+                        r = augmenter.radius
+                        label = tile_labels[k] = tile_class(classes, cy - r, cx - r, cy + r, cx + r, class_names)
+                writer.write(patch, label, cy, cx, angle, defect_fraction)
+                counts[label] += 1
+    return counts
@@ -1,12 +1,20 @@
+import math
+
 from re import A
 from widgets.utils import *
 
 from PyQt5.QtWidgets import QWidget, QApplication
-from PyQt5.QtGui import QPixmap, QPainter, QImage, QCursor, QPen, QBrush
-from PyQt5.QtCore import QPoint, Qt, QSize
+from PyQt5.QtGui import QPixmap, QPainter, QImage, QCursor, QPen, QBrush, QColor
+from PyQt5.QtCore import QPoint, Qt, QRect
+
+from utils.lazy import lazy_import
+from utils.profiling import timed
+from utils.mask_codecs import class_palette
+from utils.display import build_pyramid, update_pyramid
+from utils.memory import array_buffers
 
-import cv2
-import numpy as np
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
 
 
 class ListPoints:
@@ -61,6 +69,7 @@ class Canvas(QWidget):
     zoom_request = QtCore.pyqtSignal(int, QtCore.QPoint)
     scroll_request = QtCore.pyqtSignal(int, int)
     location_request = QtCore.pyqtSignal(int, int)
+    mask_edited = QtCore.pyqtSignal(int, int, int, int)
 
     NONE_MODE, BRUSH_MODE, ERASER_MODE = 0, 1, 2
     DRAWING_MODE, SPLITTING_MODE = 0, 1
@@ -73,7 +82,6 @@ class Canvas(QWidget):
         self.image = None
         self.pixmap = None
         self.mask_pixmap = None
-        self.splitting_pixmap = None
         self.painter = QPainter()
         self.cursor = CURSOR_DEFAULT
         
@@ -82,6 +90,27 @@ class Canvas(QWidget):
         self.cursor_pos = QPoint(0, 0)
 
         self.drawing = False
+        self.render_quality = 'high'
+        self.segment_brush = False
+        self.superpixels = None
+        self.label_class = 1
+
+        # optional OpenGL viewport that draws the image and mask instead of paintEvent
+        self.gl_view = None
+
+        # MemoryBudget the pixmaps and pyramids are accounted in
+        self.memory = None
+
+        # downscaled copies of the image and mask for zoom levels below 50%
+        self.image_levels = None
+        self.mask_levels = None
+        self.pending_mask_rect = QRect()
+        self.level_pixmap = None
+
+        # comparison with a reference mask, drawn over the image and mask
+        self.diff_pixmap = None
+        self.diff_level_pixmap = None
+        self.diff_focus = None
 
         self.update_brush_size(brush_size)
         self.last_point = QPoint()
@@ -121,27 +150,43 @@ class Canvas(QWidget):
             self.scroll_request.emit(delta.y(), Qt.Vertical)
         ev.accept()
 
+    @timed('paintEvent')
     def paintEvent(self, event):
         if not self.pixmap:
             return super().paintEvent(event)
         
         self.painter.begin(self)
 
-        self.painter.setRenderHint(QPainter.Antialiasing)
-        self.painter.setRenderHint(QPainter.HighQualityAntialiasing)
-        self.painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        if self.render_quality == 'high':
+            self.painter.setRenderHint(QPainter.Antialiasing)
+            self.painter.setRenderHint(QPainter.HighQualityAntialiasing)
+            self.painter.setRenderHint(QPainter.SmoothPixmapTransform)
 
         self.painter.scale(self.scale, self.scale)
 
         if self.app_mode == self.DRAWING_MODE:
-            self.drawing_mode_painter_event()
+            self.drawing_mode_painter_event(event.rect())
         else:
             self.splitting_mode_painter_event()
 
         self.painter.end()
 
-    def drawing_mode_painter_event(self):
-        self.painter.drawPixmap(0, 0, self.join_pixmap())
+    def drawing_mode_painter_event(self, exposed):
+        # with OpenGL the viewport underneath already shows the image and mask
+        if not self.gl_active():
+            level = self.pyramid_level()
+            if level > 0:
+                self.painter.save()
+                self.painter.scale(1 << level, 1 << level)
+                self.painter.drawPixmap(0, 0, self.join_level(level))
+                self.painter.restore()
+            else:
+                rect = self.image_rect(exposed)
+                if not rect.isEmpty():
+                    self.painter.drawPixmap(rect.topLeft(), self.join_pixmap(rect))
+
+        if self.diff_pixmap is not None:
+            self.draw_diff()
 
         if self.drawing_mode != self.NONE_MODE:
             x, y = int(self.cursor_pos.x()), int(self.cursor_pos.y())
@@ -156,10 +201,32 @@ class Canvas(QWidget):
             self.painter.setPen(p)
             self.painter.drawEllipse(x - self.half_brush_size, y - self.half_brush_size, self.brush_size, self.brush_size)
 
+    def draw_diff(self):
+        level = self.pyramid_level()
+        if level > 0:
+            if self.diff_level_pixmap is None or self.diff_level_pixmap[0] != level:
+                size = self.diff_pixmap.size() / (1 << level)
+                self.diff_level_pixmap = (level, self.diff_pixmap.scaled(size, transformMode=Qt.SmoothTransformation))
+                self.account('diff_level', self.diff_level_pixmap[1], evict=self.drop_diff_level_pixmap)
+            self.painter.save()
+            self.painter.scale(1 << level, 1 << level)
+            self.painter.drawPixmap(0, 0, self.diff_level_pixmap[1])
+            self.painter.restore()
+        else:
+            self.painter.drawPixmap(0, 0, self.diff_pixmap)
+
+        if self.diff_focus is not None:
+            pen = QPen(Qt.yellow, 2, Qt.DashLine)
+            pen.setCosmetic(True)
+            self.painter.setPen(pen)
+            self.painter.setBrush(Qt.NoBrush)
+            self.painter.drawRect(self.diff_focus)
+
     def splitting_mode_painter_event(self):
         list_pairs = self.points.pairs()
 
-        self.painter.drawPixmap(0, 0, self.pixmap)
+        if not self.gl_active():
+            self.painter.drawPixmap(0, 0, self.pixmap)
 
         pen = QPen(Qt.red, 3, Qt.SolidLine)
         pen.setCosmetic(True)
@@ -186,6 +253,10 @@ class Canvas(QWidget):
 
             if self.app_mode == self.SPLITTING_MODE:
                 self.points.check_select_pos(self.last_point)
+            elif self.drawing_mode != self.NONE_MODE and self.segment_brush and self.superpixels is not None:
+                self.dirty_callback()
+                self.paint_segments(self.last_point, self.last_point)
+                self.update()
 
     def mouseReleaseEvent(self, event):
         if event.button == Qt.LeftButton:
@@ -205,17 +276,51 @@ class Canvas(QWidget):
 
         self.update()
 
+    @timed('drawing_mode_mouse_move_event')
     def drawing_mode_mouse_move_event(self, ev):
         if ev.buttons() == Qt.LeftButton and self.drawing and self.drawing_mode != self.NONE_MODE:
             self.dirty_callback()
 
-            color = Qt.green if self.drawing_mode == self.BRUSH_MODE else Qt.white
+            if self.segment_brush and self.superpixels is not None:
+                self.paint_segments(self.last_point, self.cursor_pos)
+                self.last_point = self.cursor_pos
+                return
 
             painter = QPainter(self.mask_pixmap)
-            painter.setPen(QPen(color, self.brush_size, Qt.SolidLine, join=Qt.RoundJoin))
+            painter.setPen(QPen(QColor(*self.brush_color()), self.brush_size, Qt.SolidLine, join=Qt.RoundJoin))
             painter.drawLine(self.last_point, self.cursor_pos)
+            painter.end()
+
+            # the square pen cap reaches half_brush_size * sqrt(2) past the end points
+            r = self.brush_size + 1
+            self.mask_changed(
+                min(self.last_point.x(), self.cursor_pos.x()) - r, min(self.last_point.y(), self.cursor_pos.y()) - r,
+                max(self.last_point.x(), self.cursor_pos.x()) + r, max(self.last_point.y(), self.cursor_pos.y()) + r,
+            )
             self.last_point = self.cursor_pos
 
+    def brush_color(self):
+        # the mask is painted with exact palette colors, without antialiasing, so it decodes back to classes
+        if self.drawing_mode != self.BRUSH_MODE:
+            return (255, 255, 255)
+        return tuple(int(c) for c in class_palette()[self.label_class])
+
+    def paint_segments(self, p1, p2):
+        hit = self.superpixels.labels_under_stroke((p1.x(), p1.y()), (p2.x(), p2.y()), self.brush_size)
+        if len(hit) == 0:
+            return
+
+        (y0, x0), selection = self.superpixels.select(hit)
+        height, width = selection.shape
+
+        overlay = np.zeros((height, width, 4), dtype=np.uint8)
+        overlay[selection] = (*self.brush_color(), 255)
+
+        painter = QPainter(self.mask_pixmap)
+        painter.drawImage(x0, y0, QImage(overlay.data, width, height, 4 * width, QImage.Format_RGBA8888))
+        painter.end()
+        self.mask_changed(x0, y0, x0 + width, y0 + height)
+
     def splitting_mode_mouse_move_event(self, ev):
         if self.points.selected_point >= 0 and not self.out_of_pixmap(self.cursor_pos):
             self.points.update_location(self.cursor_pos)
@@ -236,6 +341,11 @@ class Canvas(QWidget):
 
     def update_image(self, image):
         self.image = image
+        if self.image_levels is not None:
+            self.image_levels = build_pyramid(image)
+            self.account('levels', [self.image_levels, self.mask_levels])
+            self.drop_level_pixmap()
+        self.image_changed()
         self.update()
         self.update_cursor()
 
@@ -243,16 +353,151 @@ class Canvas(QWidget):
         self.image = image
         self.pixmap = pixmap
         self.mask_pixmap = mask_pixmap
+        self.account('pixmap', pixmap)
+        self.account('mask', mask_pixmap)
+        self.set_superpixels(None)
+        self.clear_pyramid()
 
-        splitting_qimage = QImage(QSize(self.image.shape[1], self.image.shape[0]), QImage.Format_RGB888)
-        splitting_qimage.fill(Qt.white)
-        self.splitting_pixmap = QPixmap.fromImage(splitting_qimage)
-
+        self.image_changed()
         self.update()
         self.update_cursor()
 
+    def set_diff_overlay(self, size):
+        # transparent until the tiles of the comparison are painted into it
+        self.diff_pixmap = None
+        if size is not None:
+            self.diff_pixmap = QPixmap(*size)
+            self.diff_pixmap.fill(Qt.transparent)
+        self.account('diff', self.diff_pixmap)
+        self.drop_diff_level_pixmap()
+        self.diff_focus = None
+        self.update()
+
+    def update_diff_overlay(self, tiles):
+        # (x0, y0, RGBA overlay) of the tiles that changed
+        if self.diff_pixmap is None:
+            return
+        painter = QPainter(self.diff_pixmap)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painted = False
+        for x0, y0, overlay in tiles:
+            height, width = overlay.shape[:2]
+            painter.drawImage(x0, y0, QImage(overlay.data, width, height, 4 * width, QImage.Format_RGBA8888))
+            painted = True
+        painter.end()
+        if painted:
+            self.drop_diff_level_pixmap()
+            self.update()
+
+    def paste_mask(self, x0, y0, mask):
+        height, width, _ = mask.shape
+        painter = QPainter(self.mask_pixmap)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawImage(x0, y0, QImage(mask.data, width, height, 3 * width, QImage.Format_RGB888))
+        painter.end()
+        self.mask_changed(x0, y0, x0 + width, y0 + height)
+        self.update()
+
+    def set_diff_focus(self, rect):
+        self.diff_focus = rect
+        self.update()
+
+    def set_superpixels(self, superpixels):
+        self.superpixels = superpixels
+        self.account('superpixels', None if superpixels is None else [superpixels.labels, superpixels.bboxes])
+
+    def clear_pyramid(self):
+        self.image_levels = None
+        self.mask_levels = None
+        self.pending_mask_rect = QRect()
+        self.account('levels', None)
+        self.drop_level_pixmap()
+
+    def set_pyramid(self, image_levels, mask_levels):
+        # the mask levels are edited in place, the cached ones must stay as loaded
+        self.image_levels = image_levels
+        self.mask_levels = [level.copy() for level in mask_levels]
+        self.account('levels', [self.image_levels, self.mask_levels])
+        self.drop_level_pixmap()
+
+        # strokes made while the pyramid was being built
+        rect, self.pending_mask_rect = self.pending_mask_rect, QRect()
+        if not rect.isNull():
+            self.update_mask_levels(rect.left(), rect.top(), rect.right() + 1, rect.bottom() + 1)
+        self.update()
+
+    def pyramid_level(self):
+        if not self.image_levels or self.scale >= 0.5:
+            return 0
+        return min(int(math.log2(1 / self.scale)), len(self.image_levels))
+
+    def mask_changed(self, x0, y0, x1, y1):
+        self.update_mask_levels(x0, y0, x1, y1)
+        self.mask_edited.emit(int(x0), int(y0), int(x1), int(y1))
+        if self.gl_view is not None:
+            self.gl_view.set_mask_dirty(QRect(int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+
+    def gl_active(self):
+        return self.gl_view is not None and self.gl_view.ready()
+
+    def image_changed(self):
+        if self.gl_view is not None:
+            self.gl_view.set_image_dirty()
+
+    def update_mask_levels(self, x0, y0, x1, y1):
+        if self.mask_pixmap is None:
+            return
+        if self.mask_levels is None:
+            self.pending_mask_rect |= QRect(int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+            return
+        if not self.mask_levels:
+            return
+
+        # align the rect to the coarsest level, so every level gets whole blocks
+        step = 1 << len(self.mask_levels)
+        width, height = self.mask_pixmap.width(), self.mask_pixmap.height()
+        x0, y0 = max(int(x0) // step * step, 0), max(int(y0) // step * step, 0)
+        x1, y1 = min(-(-int(x1) // step) * step, width), min(-(-int(y1) // step) * step, height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        region = self.qpixmap2image(self.mask_pixmap.copy(QRect(x0, y0, x1 - x0, y1 - y0)))
+        update_pyramid(self.mask_levels, region, x0, y0, x1, y1)
+        self.drop_level_pixmap()
+
+    def join_level(self, level):
+        if self.level_pixmap is None or self.level_pixmap[0] != level:
+            dst = cv2.addWeighted(self.image_levels[level - 1], 0.8, self.mask_levels[level - 1], 0.2, 0)
+            self.level_pixmap = (level, self.image2qpixmap(dst))
+            self.account('level_pixmap', self.level_pixmap[1], evict=self.drop_level_pixmap)
+        return self.level_pixmap[1]
+
+    def drop_level_pixmap(self):
+        self.level_pixmap = None
+        self.account('level_pixmap', None)
+
+    def drop_diff_level_pixmap(self):
+        self.diff_level_pixmap = None
+        self.account('diff_level', None)
+
+    def account(self, name, buffer, evict=None):
+        # buffer is a QPixmap or a list of arrays, None releases the entry; only caches pass evict
+        if self.memory is None:
+            return
+        key = ('canvas', name)
+        if buffer is None:
+            self.memory.release(key)
+            return
+        if isinstance(buffer, QPixmap):
+            buffers = [(key, buffer.width() * buffer.height() * buffer.depth() // 8)]
+        else:
+            buffers = array_buffers(buffer)
+        self.memory.register(key, buffers, 'canvas', evict)
+
     def update_app_mode(self, app_mode):
         self.app_mode = app_mode
+        if self.gl_view is not None:
+            self.gl_view.update()
         self.update()
         self.update_cursor()
 
@@ -265,7 +510,14 @@ class Canvas(QWidget):
         self.image = None
         self.pixmap = None
         self.mask_pixmap = None
-        self.splitting_pixmap = None
+        self.diff_pixmap = None
+        self.diff_focus = None
+        for name in ('pixmap', 'mask', 'diff'):
+            self.account(name, None)
+        self.drop_diff_level_pixmap()
+        self.set_superpixels(None)
+        self.clear_pyramid()
+        self.image_changed()
         self.update()
         self.update_cursor()
 
@@ -280,6 +532,14 @@ class Canvas(QWidget):
     def transform_position(self, point):
         return point / self.scale
 
+    def image_rect(self, rect):
+        # widget rect -> image rect, with a margin for the smooth scaling at the edges
+        x0 = max(int(rect.left() / self.scale) - 2, 0)
+        y0 = max(int(rect.top() / self.scale) - 2, 0)
+        x1 = min(int(math.ceil((rect.right() + 1) / self.scale)) + 2, self.image.shape[1])
+        y1 = min(int(math.ceil((rect.bottom() + 1) / self.scale)) + 2, self.image.shape[0])
+        return QRect(x0, y0, max(x1 - x0, 0), max(y1 - y0, 0))
+
     def overrideCursor(self, cursor):
         self.restore_cursor()
         self.cursor = cursor
@@ -293,6 +553,10 @@ class Canvas(QWidget):
         bytesPerLine = 3 * width
         return QPixmap.fromImage(QImage(image.data, width, height, bytesPerLine, QImage.Format_RGB888))
 
+    def rgba2qpixmap(self, image):
+        height, width, _ = image.shape
+        return QPixmap.fromImage(QImage(image.data, width, height, 4 * width, QImage.Format_RGBA8888))
+
     def qpixmap2image(self, pixmap):
         qimage = pixmap.toImage()
         return self.qimage2image(qimage)
@@ -306,11 +570,10 @@ class Canvas(QWidget):
         arr = np.frombuffer(ptr, np.uint8).reshape((height, width, 4))
         return cv2.cvtColor(arr[:, :, :3], cv2.COLOR_BGR2RGB)
 
-    def join_pixmap(self):
-        if self.app_mode == self.DRAWING_MODE:
-            mask = self.qpixmap2image(self.mask_pixmap)
-            dst = cv2.addWeighted(self.image, 0.8, mask, 0.2, 0)
-        else:
-            mask = self.qpixmap2image(self.splitting_pixmap)
-            dst = cv2.addWeighted(self.image, 0.45, mask, 0.55, 0)
+    # mask pixmap -> RGBA array, blended RGB array, RGB array -> pixmap, only for the exposed part of the image
+    @timed('join_pixmap', pixels=lambda self, rect: rect.width() * rect.height())
+    def join_pixmap(self, rect):
+        x0, y0 = rect.x(), rect.y()
+        mask = self.qpixmap2image(self.mask_pixmap.copy(rect))
+        dst = cv2.addWeighted(self.image[y0:y0+rect.height(), x0:x0+rect.width()], 0.8, mask, 0.2, 0)
         return self.image2qpixmap(dst)
\ No newline at end of file
@@ -1,5 +1,3 @@
-import json
-
 from PyQt5.QtWidgets import QWidget, QFileDialog, QScrollArea, QVBoxLayout, QLabel
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import Qt
@@ -32,7 +30,9 @@ class ScrollAreaPreview(QScrollArea):
 
 
 class FileDialogPreview(QFileDialog):
-    def __init__(self, *args, **kwargs):
+    MAX_TEXT_PREVIEW = 64 * 1024
+
+    def __init__(self, *args, thumbnail_loader=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.setOption(self.DontUseNativeDialog, True)
 
@@ -48,22 +48,50 @@ class FileDialogPreview(QFileDialog):
         self.layout().addLayout(box, 1, 3, 1, 1)
         self.currentChanged.connect(self.on_change)
 
+        self.current_path = None
+        self.thumbnail_loader = thumbnail_loader
+        if self.thumbnail_loader is not None:
+            self.thumbnail_loader.ready.connect(self.on_thumbnail_ready)
+
+    def done(self, result):
+        # the loader outlives the dialog
+        if self.thumbnail_loader is not None:
+            self.thumbnail_loader.ready.disconnect(self.on_thumbnail_ready)
+            self.thumbnail_loader = None
+        super().done(result)
+
     def on_change(self, path):
+        self.current_path = path
         if path.lower().endswith(".json"):
-            with open(path, "r") as f:
-                data = json.load(f)
-                self.label_preview.setText(json.dumps(data, indent=4, sort_keys=False))
+            # only the head of the file is shown, large label files are never parsed here
+            with open(path, "r", errors="replace") as f:
+                text = f.read(self.MAX_TEXT_PREVIEW)
+            self.label_preview.setText(text)
             self.label_preview.label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
             self.label_preview.setHidden(False)
-        else:
-            pixmap = QPixmap(path)
-            if pixmap.isNull():
+        elif self.thumbnail_loader is not None:
+            thumbnail_file = self.thumbnail_loader.cached(path)
+            if thumbnail_file is not None:
+                self.show_pixmap(QPixmap(thumbnail_file))
+            else:
                 self.label_preview.clear()
                 self.label_preview.setHidden(True)
-            else:
-                self.label_preview.setPixmap(
-                    pixmap.scaled(self.label_preview.width() - 30, self.label_preview.height() - 30,
-                        Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                )
-                self.label_preview.label.setAlignment(Qt.AlignCenter)
-                self.label_preview.setHidden(False)
\ No newline at end of file
+                self.thumbnail_loader.request(path)
+        else:
+            self.show_pixmap(QPixmap(path))
+
+    def on_thumbnail_ready(self, path, thumbnail_file):
+        if path == self.current_path:
+            self.show_pixmap(QPixmap(thumbnail_file))
+
+    def show_pixmap(self, pixmap):
+        if pixmap.isNull():
+            self.label_preview.clear()
+            self.label_preview.setHidden(True)
+        else:
+            self.label_preview.setPixmap(
+                pixmap.scaled(self.label_preview.width() - 30, self.label_preview.height() - 30,
+                    Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            )
+            self.label_preview.label.setAlignment(Qt.AlignCenter)
+            self.label_preview.setHidden(False)
@@ -0,0 +1,27 @@
+from PyQt5 import QtCore
+from PyQt5.QtGui import QGuiApplication
+
+
+class FrameDispatcher(QtCore.QObject):
+    # keeps only the latest call per key and runs them together, at most once per display frame
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pending = {}
+
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 60.0
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.setInterval(max(int(1000 / max(refresh_rate, 1.0)), 1))
+        self.timer.timeout.connect(self.flush)
+
+    def post(self, key, fn, *args):
+        self.pending[key] = (fn, args)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        for fn, args in pending.values():
+            fn(*args)
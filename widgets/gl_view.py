@@ -0,0 +1,183 @@
+from PyQt5 import QtCore
+from PyQt5.QtWidgets import QOpenGLWidget
+from PyQt5.QtGui import (QImage, QPalette, QVector2D, QOpenGLContext, QOpenGLShader, QOpenGLShaderProgram,
+                         QOpenGLTexture, QOpenGLVersionProfile)
+
+
+VERTEX_SHADER = """
+attribute highp vec2 position;
+attribute highp vec2 texcoord;
+varying highp vec2 v_texcoord;
+
+void main() {
+    gl_Position = vec4(position, 0.0, 1.0);
+    v_texcoord = texcoord;
+}
+"""
+
+FRAGMENT_SHADER = """
+uniform sampler2D image;
+uniform sampler2D mask;
+uniform mediump float mask_weight;
+varying highp vec2 v_texcoord;
+
+void main() {
+    gl_FragColor = mix(texture2D(image, v_texcoord), texture2D(mask, v_texcoord), mask_weight);
+}
+"""
+
+TEXCOORDS = [QVector2D(0, 0), QVector2D(1, 0), QVector2D(1, 1), QVector2D(0, 1)]
+
+
+def opengl_available():
+    return QOpenGLContext().create()
+
+
+class GLView(QOpenGLWidget):
+    # scroll area viewport: draws the canvas image and mask from textures, the canvas on top only draws overlays
+    def __init__(self, canvas, parent=None):
+        super().__init__(parent)
+        self.canvas = canvas
+        self.gl = None
+        self.program = None
+        self.active = False
+        self.max_texture_size = 0
+
+        self.image_texture = None
+        self.mask_texture = None
+        self.image_dirty = True
+        self.mask_rect = QtCore.QRect()
+
+        # scrolling moves the canvas and zooming resizes it
+        canvas.installEventFilter(self)
+
+    def ready(self):
+        pixmap = self.canvas.pixmap
+        return self.active and pixmap is not None and max(pixmap.width(), pixmap.height()) <= self.max_texture_size
+
+    def set_image_dirty(self):
+        self.image_dirty = True
+        self.update()
+
+    def set_mask_dirty(self, rect):
+        self.mask_rect |= rect
+        self.update()
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QtCore.QEvent.Move, QtCore.QEvent.Resize):
+            self.update()
+        return False
+
+    def initializeGL(self):
+        self.context().aboutToBeDestroyed.connect(self.cleanup)
+
+        profile = QOpenGLVersionProfile()
+        profile.setVersion(2, 0)
+        self.gl = self.context().versionFunctions(profile)
+        if self.gl is None:
+            print('OpenGL 2.0 is not available, falling back to QPainter rendering')
+            return
+        self.gl.initializeOpenGLFunctions()
+
+        max_texture_size = self.gl.glGetIntegerv(self.gl.GL_MAX_TEXTURE_SIZE)
+        self.max_texture_size = max_texture_size[0] if isinstance(max_texture_size, tuple) else max_texture_size
+
+        self.program = QOpenGLShaderProgram(self)
+        if not (self.program.addShaderFromSourceCode(QOpenGLShader.Vertex, VERTEX_SHADER)
+                and self.program.addShaderFromSourceCode(QOpenGLShader.Fragment, FRAGMENT_SHADER)
+                and self.program.link()):
+            print(f'Failed to build the canvas shader, falling back to QPainter rendering:\n{self.program.log()}')
+            return
+
+        self.active = True
+        # the canvas stops drawing the image itself
+        self.canvas.update()
+
+    def create_texture(self, image):
+        texture = QOpenGLTexture(image.convertToFormat(QImage.Format_RGBA8888), QOpenGLTexture.DontGenerateMipMaps)
+        texture_filter = QOpenGLTexture.Linear if self.canvas.render_quality == 'high' else QOpenGLTexture.Nearest
+        texture.setMinMagFilters(texture_filter, texture_filter)
+        texture.setWrapMode(QOpenGLTexture.ClampToEdge)
+        return texture
+
+    def delete_textures(self):
+        for texture in (self.image_texture, self.mask_texture):
+            if texture is not None:
+                texture.destroy()
+        self.image_texture = None
+        self.mask_texture = None
+
+    def upload_textures(self):
+        canvas = self.canvas
+        if self.image_dirty or self.image_texture is None:
+            self.delete_textures()
+            height, width = canvas.image.shape[:2]
+            image = QImage(canvas.image.data, width, height, 3 * width, QImage.Format_RGB888)
+            self.image_texture = self.create_texture(image)
+            self.mask_texture = self.create_texture(canvas.mask_pixmap.toImage())
+            self.image_dirty = False
+            self.mask_rect = QtCore.QRect()
+            return
+
+        # after a stroke only the touched part of the mask is sent to the GPU
+        rect = self.mask_rect & canvas.mask_pixmap.rect()
+        self.mask_rect = QtCore.QRect()
+        if rect.isEmpty():
+            return
+
+        region = canvas.mask_pixmap.copy(rect).toImage().convertToFormat(QImage.Format_RGBA8888)
+        bits = region.constBits()
+        bits.setsize(region.byteCount())
+
+        self.mask_texture.bind()
+        self.gl.glTexSubImage2D(self.gl.GL_TEXTURE_2D, 0, rect.x(), rect.y(), rect.width(), rect.height(),
+                                self.gl.GL_RGBA, self.gl.GL_UNSIGNED_BYTE, bits.asstring())
+        self.mask_texture.release()
+
+    def paintGL(self):
+        if self.gl is None:
+            return
+
+        gl = self.gl
+        color = self.palette().color(QPalette.Window)
+        gl.glClearColor(color.redF(), color.greenF(), color.blueF(), 1.0)
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        if not self.ready() or self.canvas.image is None:
+            return
+
+        self.upload_textures()
+
+        # the image covers the canvas from its top-left corner, in viewport coordinates
+        canvas = self.canvas
+        x, y = canvas.x(), canvas.y()
+        width, height = canvas.pixmap.width() * canvas.scale, canvas.pixmap.height() * canvas.scale
+        left, right = 2 * x / self.width() - 1, 2 * (x + width) / self.width() - 1
+        top, bottom = 1 - 2 * y / self.height(), 1 - 2 * (y + height) / self.height()
+        positions = [QVector2D(left, top), QVector2D(right, top), QVector2D(right, bottom), QVector2D(left, bottom)]
+
+        # same blend as Canvas.join_pixmap; the split view shows the plain image
+        mask_weight = 0.2 if canvas.app_mode == canvas.DRAWING_MODE else 0.0
+
+        self.program.bind()
+        self.image_texture.bind(0)
+        self.mask_texture.bind(1)
+        self.program.setUniformValue('image', 0)
+        self.program.setUniformValue('mask', 1)
+        self.program.setUniformValue('mask_weight', float(mask_weight))
+        self.program.enableAttributeArray('position')
+        self.program.enableAttributeArray('texcoord')
+        self.program.setAttributeArray('position', positions)
+        self.program.setAttributeArray('texcoord', TEXCOORDS)
+
+        gl.glDrawArrays(gl.GL_TRIANGLE_FAN, 0, 4)
+
+        self.program.disableAttributeArray('position')
+        self.program.disableAttributeArray('texcoord')
+        self.mask_texture.release(1)
+        self.image_texture.release(0)
+        self.program.release()
+
+    def cleanup(self):
+        self.makeCurrent()
+        self.delete_textures()
+        self.doneCurrent()
@@ -0,0 +1,102 @@
+from PyQt5 import QtCore
+from PyQt5 import QtWidgets
+from PyQt5.QtGui import QPixmap, QPainter, QColor, QPen
+
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+class InspectorWidget(QtWidgets.QWidget):
+    HISTOGRAM_WIDTH, HISTOGRAM_HEIGHT = 256, 80
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.stats = None
+        self.class_names = ()
+        self.luminance = None
+        self.diff = None
+
+        self.value_label = QtWidgets.QLabel('-')
+        self.value_label.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse)
+        self.histogram_label = QtWidgets.QLabel()
+        self.histogram_label.setFixedSize(self.HISTOGRAM_WIDTH, self.HISTOGRAM_HEIGHT)
+        self.counts_label = QtWidgets.QLabel('-')
+        self.diff_label = QtWidgets.QLabel()
+        self.diff_label.hide()
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.value_label)
+        layout.addWidget(self.histogram_label)
+        layout.addWidget(self.counts_label)
+        layout.addWidget(self.diff_label)
+        layout.addStretch()
+
+        self.histogram_pixmap = None
+
+    def set_stats(self, stats, class_names):
+        self.stats = stats
+        self.class_names = class_names
+        self.histogram_pixmap = None if stats is None else self.draw_histogram(stats.histogram)
+        self.refresh_histogram()
+        self.refresh_counts()
+
+    def draw_histogram(self, histogram):
+        # log scale, so that a few dominant gray levels do not flatten the rest
+        heights = np.log1p(histogram)
+        heights = (heights / max(heights.max(), 1) * self.HISTOGRAM_HEIGHT).astype(int)
+
+        pixmap = QPixmap(self.HISTOGRAM_WIDTH, self.HISTOGRAM_HEIGHT)
+        pixmap.fill(QtCore.Qt.white)
+        painter = QPainter(pixmap)
+        painter.setPen(QColor(90, 90, 90))
+        for x, height in enumerate(heights.tolist()):
+            if height:
+                painter.drawLine(x, self.HISTOGRAM_HEIGHT - 1, x, self.HISTOGRAM_HEIGHT - height)
+        painter.end()
+        return pixmap
+
+    def refresh_histogram(self):
+        if self.histogram_pixmap is None:
+            self.histogram_label.clear()
+            return
+
+        pixmap = QPixmap(self.histogram_pixmap)
+        if self.luminance is not None:
+            painter = QPainter(pixmap)
+            painter.setPen(QPen(QtCore.Qt.red, 1))
+            painter.drawLine(self.luminance, 0, self.luminance, self.HISTOGRAM_HEIGHT - 1)
+            painter.end()
+        self.histogram_label.setPixmap(pixmap)
+
+    def refresh_counts(self):
+        if self.stats is None:
+            self.counts_label.setText('-')
+            return
+
+        lines = [f'labeled {self.stats.labeled:,} px ({self.stats.labeled_fraction:.2%})']
+        if len(self.class_names) > 1:
+            for k, name in enumerate(self.class_names, start=1):
+                lines.append(f'  {name}: {int(self.stats.counts[k]):,} px')
+        self.counts_label.setText('\n'.join(lines))
+
+    def set_diff(self, diff):
+        self.diff = diff
+        self.refresh_diff()
+
+    def refresh_diff(self):
+        if self.diff is None:
+            self.diff_label.hide()
+            return
+
+        tiles = len(self.diff.disagreement_tiles())
+        self.diff_label.setText(f'IoU {self.diff.iou:.4f}, Dice {self.diff.dice:.4f}\n'
+                                f'disagree {self.diff.disagreeing_pixels:,} px in {tiles} tiles')
+        self.diff_label.show()
+
+    def set_value(self, x, y, raw, display):
+        # display is the 8-bit RGB value shown on the canvas, raw the value stored in the file
+        r, g, b = display
+        self.value_label.setText(f'({x}, {y})\nraw {raw}\nRGB ({r}, {g}, {b})')
+        self.luminance = min(int(0.299 * r + 0.587 * g + 0.114 * b + 0.5), 255)
+        self.refresh_histogram()
@@ -1,10 +1,14 @@
 from PyQt5 import QtWidgets
 
+from utils.tiling import BORDER_MODES, TilingPolicy
+
 
 class OutputBlock(QtWidgets.QWidget):
-    def __init__(self, mask_dir, split_dir, mask_dir_callback, split_dir_callback, parent=None):
+    def __init__(self, mask_dir, split_dir, mask_dir_callback, split_dir_callback, split_config=None, parent=None):
         super().__init__(parent)
 
+        split_config = split_config or {}
+
         self.mask_dir_label = QtWidgets.QLabel('Mask Directory:')
 
         self.mask_dir_combobox = self.createComboBox(mask_dir)
@@ -22,12 +26,42 @@ class OutputBlock(QtWidgets.QWidget):
         self.stride_label = QtWidgets.QLabel('Stride:')
         self.stride_spinbox = QtWidgets.QSpinBox(self)
         self.stride_spinbox.setRange(1, 100)
-        self.stride_spinbox.setValue(48)
+        self.stride_spinbox.setValue(split_config.get('stride', 48))
 
         self.size_label = QtWidgets.QLabel('Size:')
         self.size_spinbox = QtWidgets.QSpinBox(self)
         self.size_spinbox.setRange(50, 256)
-        self.size_spinbox.setValue(128)
+        self.size_spinbox.setValue(split_config.get('patch_size', 128))
+
+        self.min_defect_label = QtWidgets.QLabel('Min Defect Area (%):')
+        self.min_defect_spinbox = QtWidgets.QDoubleSpinBox(self)
+        self.min_defect_spinbox.setRange(0.0, 100.0)
+        self.min_defect_spinbox.setDecimals(2)
+        self.min_defect_spinbox.setValue(100.0 * split_config.get('min_defect_fraction', 0.0))
+
+        self.normal_ratio_label = QtWidgets.QLabel('Normal Tiles Kept (%):')
+        self.normal_ratio_spinbox = QtWidgets.QSpinBox(self)
+        self.normal_ratio_spinbox.setRange(0, 100)
+        self.normal_ratio_spinbox.setValue(int(round(100 * split_config.get('normal_ratio', 1.0))))
+
+        self.border_label = QtWidgets.QLabel('Border:')
+        self.border_combobox = QtWidgets.QComboBox(self)
+        self.border_combobox.addItems(BORDER_MODES)
+        self.border_combobox.setCurrentText(split_config.get('border', 'pad'))
+
+        self.seed_label = QtWidgets.QLabel('Seed:')
+        self.seed_spinbox = QtWidgets.QSpinBox(self)
+        self.seed_spinbox.setRange(0, 2 ** 31 - 1)
+        self.seed_spinbox.setValue(split_config.get('seed', 0))
+
+        self.augment_checkbox = QtWidgets.QCheckBox('Rotation augmentation', self)
+        self.augment_checkbox.setChecked(split_config.get('augment', False))
+
+        self.output_mode_label = QtWidgets.QLabel('Output:')
+        self.output_mode_combobox = QtWidgets.QComboBox(self)
+        self.output_mode_combobox.addItem('Loose files', 'files')
+        self.output_mode_combobox.addItem('Tar shards + manifest', 'shards')
+        self.output_mode_combobox.setCurrentIndex(self.output_mode_combobox.findData(split_config.get('output_mode', 'files')))
 
         formLayout = QtWidgets.QGridLayout()
         formLayout.addWidget(self.mask_dir_label, 0, 0)
@@ -42,6 +76,20 @@ class OutputBlock(QtWidgets.QWidget):
         formLayout.addWidget(self.stride_spinbox, 2, 1)
         formLayout.addWidget(self.size_label, 2, 2)
         formLayout.addWidget(self.size_spinbox, 2, 3)
+
+        formLayout.addWidget(self.min_defect_label, 3, 0)
+        formLayout.addWidget(self.min_defect_spinbox, 3, 1)
+        formLayout.addWidget(self.normal_ratio_label, 3, 2)
+        formLayout.addWidget(self.normal_ratio_spinbox, 3, 3)
+
+        formLayout.addWidget(self.border_label, 4, 0)
+        formLayout.addWidget(self.border_combobox, 4, 1)
+        formLayout.addWidget(self.seed_label, 4, 2)
+        formLayout.addWidget(self.seed_spinbox, 4, 3)
+
+        formLayout.addWidget(self.output_mode_label, 5, 0)
+        formLayout.addWidget(self.output_mode_combobox, 5, 1)
+        formLayout.addWidget(self.augment_checkbox, 5, 2, 1, 2)
         self.setLayout(formLayout)
 
         self.mask_dir_callback = mask_dir_callback
@@ -73,6 +121,19 @@ class OutputBlock(QtWidgets.QWidget):
             self.split_dir_combobox.setCurrentText(dir_path)
             self.split_dir_callback(dir_path)
 
+    def tiling_policy(self):
+        return TilingPolicy(
+            patch_size=self.size_spinbox.value(),
+            stride=self.stride_spinbox.value(),
+            min_defect_fraction=self.min_defect_spinbox.value() / 100.0,
+            normal_ratio=self.normal_ratio_spinbox.value() / 100.0,
+            border=self.border_combobox.currentText(),
+            seed=self.seed_spinbox.value(),
+        )
+
+    def output_mode(self):
+        return self.output_mode_combobox.currentData()
+
     @staticmethod
     def createComboBox(text):
         comboBox = QtWidgets.QComboBox()
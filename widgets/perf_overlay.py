@@ -0,0 +1,45 @@
+from PyQt5 import QtCore
+from PyQt5 import QtWidgets
+
+from utils.profiling import profiler
+
+
+class PerfOverlay(QtWidgets.QLabel):
+    TIMED_CALLS = ('join_pixmap', 'drawing_mode_mouse_move_event', 'load_file', 'save_file_call', 'split_images')
+
+    def __init__(self, parent=None, interval=500):
+        super().__init__(parent)
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet(
+            'QLabel { background-color: rgba(0, 0, 0, 160); color: white; font-family: monospace; padding: 4px; }'
+        )
+        self.move(8, 8)
+        self.hide()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+
+    def set_active(self, value):
+        if value:
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.timer.start()
+        else:
+            self.timer.stop()
+            self.hide()
+
+    def refresh(self):
+        p50, p99 = profiler.percentiles('paintEvent')
+        lines = [
+            f'FPS {profiler.rate("paintEvent"):5.1f}   paint p50 {p50 * 1000:6.1f} ms  p99 {p99 * 1000:6.1f} ms',
+            f'converted {profiler.last_pixels("join_pixmap") / 1e6:6.2f} Mpx/frame',
+        ]
+        for name in self.TIMED_CALLS:
+            if name in profiler.durations:
+                p50, p99 = profiler.percentiles(name)
+                lines.append(f'{name:<30} p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms')
+
+        self.setText('\n'.join(lines))
+        self.adjustSize()
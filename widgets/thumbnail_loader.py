@@ -0,0 +1,48 @@
+import functools
+
+from PyQt5 import QtCore
+
+from widgets.workers import run_in_background
+
+
+class ThumbnailLoader(QtCore.QObject):
+    ready = QtCore.pyqtSignal(str, str)     # image path, thumbnail file
+
+    def __init__(self, cache, max_threads=2, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.workers = {}
+
+    def cached(self, path):
+        return self.cache.get(path)
+
+    def request(self, path):
+        thumbnail_file = self.cache.get(path)
+        if thumbnail_file is not None:
+            self.ready.emit(path, thumbnail_file)
+            return
+        if path in self.workers:
+            return
+
+        self.workers[path] = run_in_background(
+            self.cache.build, path, pool=self.pool,
+            on_result=functools.partial(self.on_built, path),
+            on_error=functools.partial(self.on_failed, path),
+        )
+
+    def request_many(self, paths):
+        # drop requests that have not started yet, the caller only needs what is on screen now
+        self.pool.clear()
+        self.workers.clear()
+        for path in paths:
+            self.request(path)
+
+    def on_built(self, path, thumbnail_file):
+        self.workers.pop(path, None)
+        if thumbnail_file is not None:
+            self.ready.emit(path, thumbnail_file)
+
+    def on_failed(self, path, message):
+        self.workers.pop(path, None)
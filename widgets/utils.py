@@ -1,4 +1,8 @@
-from PyQt5 import QtCore
+import functools
+
+import os.path as osp
+
+from PyQt5 import QtCore, QtGui
 
 
 CURSOR_DEFAULT = QtCore.Qt.ArrowCursor
@@ -7,4 +11,12 @@ CURSOR_DRAW = QtCore.Qt.CrossCursor
 CURSOR_MOVE = QtCore.Qt.ClosedHandCursor
 CURSOR_GRAB = QtCore.Qt.OpenHandCursor
 
-MOVE_SPEED = 5.0
\ No newline at end of file
+MOVE_SPEED = 5.0
+
+ICON_DIR = osp.join(osp.dirname(osp.dirname(osp.abspath(__file__))), 'icons')
+
+
+@functools.lru_cache(maxsize=None)
+def new_icon(name):
+    # QIcon only reads the file when the icon is first painted
+    return QtGui.QIcon(osp.join(ICON_DIR, f'{name}.png'))
@@ -0,0 +1,93 @@
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, QSize
+
+
+class WindowLevelDialog(QtWidgets.QDialog):
+    # low and high ends of the display window, in native pixel values; the sliders split [minimum, maximum] in STEPS,
+    # and the window is never narrower than min_width
+    STEPS = 1000
+
+    def __init__(self, minimum, maximum, window, auto_window, callback, min_width=1, parent=None):
+        super().__init__(parent)
+        self.setModal(True)
+        self.setWindowTitle("Window/Level")
+
+        self.min_width = min_width
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum + min_width)
+        self.original_window = window
+        self.auto_window = auto_window
+        self.callback = callback
+
+        self.slider_low = self._create_slider()
+        self.slider_high = self._create_slider()
+        self.low_label = QtWidgets.QLabel()
+        self.high_label = QtWidgets.QLabel()
+
+        self.cancel_button = QtWidgets.QPushButton('Cancel', self)
+        self.cancel_button.clicked.connect(self.on_click_cancel)
+
+        self.reset_button = QtWidgets.QPushButton('Auto', self)
+        self.reset_button.clicked.connect(self.on_click_reset)
+
+        self.ok_button = QtWidgets.QPushButton('OK', self)
+        self.ok_button.clicked.connect(self.close)
+
+        formLayout = QtWidgets.QGridLayout()
+        formLayout.addWidget(QtWidgets.QLabel('Low:'), 0, 0)
+        formLayout.addWidget(self.slider_low, 0, 1)
+        formLayout.addWidget(self.low_label, 0, 2)
+
+        formLayout.addWidget(QtWidgets.QLabel('High:'), 1, 0)
+        formLayout.addWidget(self.slider_high, 1, 1)
+        formLayout.addWidget(self.high_label, 1, 2)
+
+        formLayout.addWidget(self.cancel_button, 2, 0)
+        formLayout.addWidget(self.reset_button, 2, 1)
+        formLayout.addWidget(self.ok_button, 2, 2)
+        self.setLayout(formLayout)
+
+        self.setFixedSize(QSize(360, 120))
+        self.set_window(window, notify=False)
+
+    def window(self):
+        low, high = self.to_value(self.slider_low.value()), self.to_value(self.slider_high.value())
+        return low, max(high, low + self.min_width)
+
+    def set_window(self, window, notify=True):
+        for slider, value in zip((self.slider_low, self.slider_high), window):
+            slider.blockSignals(True)
+            slider.setValue(self.to_step(value))
+            slider.blockSignals(False)
+        self.show_window()
+        if notify:
+            self.callback(self.window())
+
+    def on_click_cancel(self):
+        self.set_window(self.original_window)
+        self.close()
+
+    def on_click_reset(self):
+        self.set_window(self.auto_window)
+
+    def on_value_changed(self):
+        self.show_window()
+        self.callback(self.window())
+
+    def show_window(self):
+        low, high = self.window()
+        self.low_label.setText(f'{low:g}')
+        self.high_label.setText(f'{high:g}')
+
+    def to_value(self, step):
+        value = self.minimum + (self.maximum - self.minimum) * step / self.STEPS
+        return round(value) if isinstance(self.minimum, int) else value
+
+    def to_step(self, value):
+        return round((value - self.minimum) * self.STEPS / (self.maximum - self.minimum))
+
+    def _create_slider(self):
+        slider = QtWidgets.QSlider(Qt.Horizontal)
+        slider.setRange(0, self.STEPS)
+        slider.valueChanged.connect(self.on_value_changed)
+        return slider
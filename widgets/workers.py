@@ -0,0 +1,35 @@
+import traceback
+
+from PyQt5 import QtCore
+
+
+class WorkerSignals(QtCore.QObject):
+    result = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(str)
+
+
+class Worker(QtCore.QRunnable):
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception:
+            self.signals.error.emit(traceback.format_exc())
+        else:
+            self.signals.result.emit(result)
+
+
+def run_in_background(fn, *args, on_result=None, on_error=None, pool=None, **kwargs):
+    worker = Worker(fn, *args, **kwargs)
+    if on_result is not None:
+        worker.signals.result.connect(on_result)
+    if on_error is not None:
+        worker.signals.error.connect(on_error)
+    (pool or QtCore.QThreadPool.globalInstance()).start(worker)
+    return worker